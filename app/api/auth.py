@@ -1,18 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import RedirectResponse
 from app.core.config import settings
-from app.core.db import save_store, init_db, mark_shipping_created, get_store
+from app.core.log import get_logger
+from app.core.security import verify_api_key
+from app.core.http import http_clients
+from app.core import async_db
 from app.services import tiendanube
-from app.services.notifier import notify_new_store
-import httpx
+from app.services.onboarding import onboarding
+
+log = get_logger(__name__)
 
 router = APIRouter(prefix="/auth")
 
 TIENDANUBE_AUTH_URL = "https://www.tiendanube.com/apps/authorize"
-TIENDANUBE_TOKEN_URL = "https://www.tiendanube.com/apps/authorize/token"
-
-# initialize database
-init_db()
+TIENDANUBE_TOKEN_URL = settings.TIENDANUBE_TOKEN_URL
 
 
 @router.get("/install")
@@ -38,8 +39,8 @@ async def install_app():
 @router.get("/callback")
 async def auth_callback(code: str = None, error: str = None):
     """
-    Exchange OAuth code for access token, persist store,
-    and automatically create PickNShip shipping method
+    Exchange OAuth code for access token, persist store and start the
+    onboarding pipeline (store info, shipping method, webhooks, notification)
     """
     if error:
         raise HTTPException(status_code=400, detail=f"OAuth error: {error}")
@@ -50,22 +51,21 @@ async def auth_callback(code: str = None, error: str = None):
         "Content-Type": "application/json",
         "User-Agent": f"Pick'NShip ({settings.PICKNSHIP_EMAIL})"
     }
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                TIENDANUBE_TOKEN_URL,
-                json={
-                    "client_id": settings.TIENDANUBE_CLIENT_ID,
-                    "client_secret": settings.TIENDANUBE_CLIENT_SECRET,
-                    "grant_type": "authorization_code",
-                    "code": code,
-                    "redirect_uri": settings.TIENDANUBE_REDIRECT_URI,
-                },
-                headers=headers,
-                timeout=20.0,
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Token request failed: {str(e)}")
+    client = http_clients.get("tiendanube")
+    try:
+        response = await client.post(
+            TIENDANUBE_TOKEN_URL,
+            json={
+                "client_id": settings.TIENDANUBE_CLIENT_ID,
+                "client_secret": settings.TIENDANUBE_CLIENT_SECRET,
+                "grant_type": "authorization_code",
+                "code": code,
+                "redirect_uri": settings.TIENDANUBE_REDIRECT_URI,
+            },
+            headers=headers,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Token request failed: {str(e)}")
 
     if response.status_code != 200:
         raise HTTPException(
@@ -77,54 +77,24 @@ async def auth_callback(code: str = None, error: str = None):
         data = response.json()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse token JSON: {str(e)}")
-    print(f"[DEBUG] Token response data: {data}")
+    log.debug("Token response", data=data)
     access_token = data.get("access_token")
     user_id = data.get("user_id") or data.get("store_id") or data.get("store")
 
     if not access_token or not user_id:
         raise HTTPException(status_code=400, detail={"msg": "Token response missing fields", "raw": data})
     
-    try:
-        store_info = await tiendanube.get_store_info(
-            store_id=user_id,
-            access_token=access_token
-        )
-        print(f"[DEBUG] Store info: {store_info}")
-        store_data = {
-            "name": store_info.get("name", {}).get("es") or store_info.get("name", {}).get("en") or "",
-            "domain": store_info.get("url_with_protocol", ""),
-            "email": store_info.get("email", "")
-        }
-    except Exception as e:
-        print(f"[WARNING] Could not fetch store info: {str(e)}")
-        store_data = {
-            "name": "",
-            "domain": "",
-            "email": ""
-        }
-
-    # Persist store in database
-    is_new_store = save_store(store_id=user_id, access_token=access_token, store=store_data, shipping_created=False)
-    print(f"[STORES] Tienda nueva: {is_new_store}")
-
-    # Automatically create PickNShip shipping method
-    try:
-        await tiendanube.create_picknship_shipping_method(store_id=user_id, access_token=access_token)
-        await tiendanube.register_order_webhooks(store_id=user_id, access_token=access_token)
-        mark_shipping_created(user_id)
-    except Exception as e:
-        print(f"[WARNING] Setup failed: {str(e)}")
-
-    # Notify of new installation
-    if is_new_store:
-        await notify_new_store(
-            {
-                "store_id": str(user_id),
-                "name": store_data["name"],
-                "domain": store_data["domain"],
-                "email": store_data["email"]
-            }
-        )
+    # Persist store in database (keeping known store info on reinstalls;
+    # store_info refreshes it in the background)
+    existing = await async_db.get_store(user_id) or {}
+    store_data = {k: existing.get(k, "") for k in ("name", "domain", "email")}
+    is_new_store = await async_db.save_store(store_id=user_id, access_token=access_token, store=store_data, shipping_created=False)
+    log.info("Store saved", store_id=user_id, is_new=is_new_store)
+
+    # Shipping method, webhooks and notification continue after the redirect.
+    # Give store_info a moment so the success page can link to the store.
+    await onboarding.begin(user_id, access_token, is_new_store)
+    await onboarding.wait_step(user_id, "store_info", settings.ONBOARDING_REDIRECT_WAIT_SECONDS)
 
     return RedirectResponse(
     url=f"{settings.BACKEND_URL}/success?store_id={user_id}",
@@ -132,18 +102,46 @@ async def auth_callback(code: str = None, error: str = None):
     )
 
 
+@router.get("/onboarding/{store_id}", dependencies=[Depends(verify_api_key)])
+async def onboarding_status(store_id: str):
+    """
+    Per-step onboarding status for a store.
+    """
+    status = await onboarding.status(store_id)
+    if not status["steps"]:
+        raise HTTPException(status_code=404, detail="No onboarding recorded for this store")
+    return status
+
+
+@router.post("/onboarding/{store_id}/retry", dependencies=[Depends(verify_api_key)], status_code=202)
+async def retry_onboarding(store_id: str):
+    """
+    Resume onboarding: runs only the steps that are not done yet.
+    """
+    store = await async_db.get_store(store_id)
+    if not store:
+        raise HTTPException(status_code=404, detail="Store not found")
+    if await async_db.get_onboarding_steps(store_id):
+        onboarding.start(store_id, store["access_token"])
+    else:
+        # installed before onboarding was tracked: run the setup steps, no notification
+        await onboarding.begin(store_id, store["access_token"], is_new=False)
+    return await onboarding.status(store_id)
+
+
 @router.post("/shipping/retry/{store_id}")
 async def retry_shipping(store_id: str):
     """
     Manually retry creating PickNShip shipping method for a store.
     """
-    store = get_store(store_id)
+    store = await async_db.get_store(store_id)
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
 
     try:
         await tiendanube.create_picknship_shipping_method(store_id=store_id, access_token=store["access_token"])
-        mark_shipping_created(store_id)
+        await async_db.set_onboarding_step(store_id, "shipping_method", "done")
+        await async_db.mark_shipping_created(store_id)
         return {"message": "PickNShip shipping method created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create shipping method: {str(e)}")
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.core.security import verify_api_key
+from app.core.metrics import registry
+
+router = APIRouter()
+
+@router.get("/metrics", dependencies=[Depends(verify_api_key)], response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus metrics (text format): route latency, upstream calls, SQLite timings
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
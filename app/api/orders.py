@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from app.core.security import verify_api_key
-from app.core.db import list_orders
+from app.core.db import list_orders_page, iter_orders, decode_cursor
+from app.core.serialization import ndjson_lines
+from app.services.export import FORMATS, export_orders
 
 router = APIRouter(
     prefix="/orders",
@@ -8,5 +12,60 @@ router = APIRouter(
 )
 
 @router.get("/")
-def get_orders():
-    return list_orders()
\ No newline at end of file
+def get_orders(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    store_id: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    List orders, newest first.
+    - JSON: one page (default 100); the next page cursor is in the X-Next-Cursor header
+    - NDJSON: streams every matching order (or up to `limit`)
+    """
+    filters = {
+        "store_id": store_id,
+        "status": status,
+        "created_from": created_from,
+        "created_to": created_to,
+    }
+    try:
+        if cursor:
+            decode_cursor(cursor)
+        if format == "ndjson":
+            rows = iter_orders(limit=limit, cursor=cursor, **filters)
+            return StreamingResponse(ndjson_lines(rows), media_type="application/x-ndjson")
+
+        orders, next_cursor = list_orders_page(limit=limit or 100, cursor=cursor, **filters)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return orders
+
+
+@router.get("/export")
+def export(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    store_id: Optional[List[str]] = Query(None),
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+):
+    """
+    Download every matching order as CSV or Parquet (pyarrow needed), streamed
+    from one consistent snapshot. shipping_address is flattened into columns.
+    """
+    try:
+        stream = export_orders(format, store_ids=store_id, created_from=created_from, created_to=created_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        stream,
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'},
+    )
@@ -0,0 +1,86 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field, model_validator
+from app.core.security import verify_api_key
+from app.core import async_db
+from app.core.db import replace_store_pricing
+from app.services.pricing import pricing_engine
+
+router = APIRouter(prefix="/pricing", dependencies=[Depends(verify_api_key)])
+
+
+class Band(BaseModel):
+    min_km: float = Field(ge=0)
+    max_km: float
+    max_inclusive: bool = False
+    price: float = Field(ge=0)
+    reference: str = Field(min_length=1)
+
+    @model_validator(mode="after")
+    def _check_range(self):
+        if self.max_km <= self.min_km:
+            raise ValueError(f"band {self.reference}: max_km must be greater than min_km")
+        return self
+
+
+class Zone(BaseModel):
+    postal_from: int = Field(ge=0)
+    postal_to: int = Field(ge=0)
+    price: float = Field(ge=0)
+    reference: str = Field(min_length=1)
+
+    @model_validator(mode="after")
+    def _check_range(self):
+        if self.postal_to < self.postal_from:
+            raise ValueError(f"zone {self.reference}: postal_to must not be less than postal_from")
+        return self
+
+
+class StorePricing(BaseModel):
+    bands: List[Band] = []
+    zones: List[Zone] = []
+
+    @model_validator(mode="after")
+    def _check_overlaps(self):
+        # the engine bisects on the range start, so overlapping ranges would misprice
+        bands = sorted(self.bands, key=lambda b: b.min_km)
+        for prev, band in zip(bands, bands[1:]):
+            if band.min_km < prev.max_km or (prev.max_inclusive and band.min_km == prev.max_km):
+                raise ValueError(f"bands {prev.reference} and {band.reference} overlap")
+        zones = sorted(self.zones, key=lambda z: z.postal_from)
+        for prev, zone in zip(zones, zones[1:]):
+            if zone.postal_from <= prev.postal_to:
+                raise ValueError(f"zones {prev.reference} and {zone.reference} overlap")
+        return self
+
+
+def _store_key(store_id: str):
+    return None if store_id == "default" else store_id
+
+
+@router.get("/{store_id}")
+async def get_pricing(store_id: str):
+    """
+    Effective pricing for a store ("default" for the defaults)
+    """
+    return pricing_engine.describe(_store_key(store_id))
+
+
+@router.put("/{store_id}")
+async def put_pricing(store_id: str, pricing: StorePricing):
+    """
+    Replace a store's price overrides; empty lists restore the defaults.
+    The defaults themselves need at least one band and one zone.
+    Running workers pick the change up on their next reload.
+    """
+    if _store_key(store_id) is None and not (pricing.bands and pricing.zones):
+        # stores without overrides would get no rates at all
+        raise HTTPException(status_code=422, detail="default pricing needs at least one band and one zone")
+    await async_db.run_db(
+        replace_store_pricing,
+        _store_key(store_id),
+        [b.model_dump() for b in pricing.bands],
+        [z.model_dump() for z in pricing.zones],
+    )
+    await async_db.run_db(pricing_engine.reload)
+    return pricing_engine.describe(_store_key(store_id))
@@ -1,26 +1,76 @@
-from fastapi import APIRouter, Request
-from datetime import datetime
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, Request, Depends
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+from app.core.breaker import CircuitBreaker
 from app.core.config import settings
-import httpx
+from app.core.log import get_logger
+from app.core.security import verify_api_key
+from app.core.cache import TTLCache
+from app.core.http import http_clients
+from app.core.metrics import DISTANCE_CACHE_LOOKUPS, RATES_DEADLINE_EXCEEDED, RATES_DISTANCE_LOOKUPS
+from app.core import async_db
+from app.core.db import load_origin_geocodes
+from app.services.pricing import pricing_engine, normalize_postal_code
+from app.services.rate_grid import rate_grid
+import asyncio
+import csv
+import math
+import re
+import time
 import urllib.parse
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+log = get_logger(__name__)
+
 router = APIRouter()
 
 # Google Maps configuration
 GOOGLE_MAPS_API_KEY = settings.GOOGLE_MAPS_API_KEY
+GOOGLE_MAPS_API_URL = settings.GOOGLE_MAPS_API_URL
+# Top-level Distance Matrix / Geocoding statuses that mean Google is failing (not the request)
+GOOGLE_ERROR_STATUSES = ("UNKNOWN_ERROR", "OVER_QUERY_LIMIT", "OVER_DAILY_LIMIT")
+
+google_breaker = CircuitBreaker(
+    "google",
+    failure_rate=settings.GOOGLE_BREAKER_FAILURE_RATE,
+    min_calls=settings.GOOGLE_BREAKER_MIN_CALLS,
+    window_seconds=settings.GOOGLE_BREAKER_WINDOW_SECONDS,
+    open_seconds=settings.GOOGLE_BREAKER_OPEN_SECONDS,
+    half_open_calls=settings.GOOGLE_BREAKER_HALF_OPEN_CALLS,
+    slow_call_seconds=settings.GOOGLE_BREAKER_SLOW_CALL_SECONDS,
+    enabled=settings.GOOGLE_BREAKER_ENABLED,
+)
 
-# Price tiers (ARS)
-PRICE_TIER_LT_3KM = 3000
-PRICE_TIER_3_TO_5KM = 5000
-PRICE_TIER_5_TO_10KM = 10000
+
+async def google_get(url: str) -> Optional[Dict[str, Any]]:
+    """
+    GET a Google Maps API URL through the circuit breaker.
+    Returns the JSON body, or None when the breaker is open or the call failed.
+    """
+    if not google_breaker.allow():
+        return None
+    start = time.monotonic()
+    try:
+        resp = await http_clients.get("google").get(url)
+        data = resp.json()
+    except asyncio.CancelledError:
+        google_breaker.release()
+        raise
+    except Exception:
+        google_breaker.record(False, time.monotonic() - start)
+        return None
+    ok = resp.status_code < 500 and data.get("status") not in GOOGLE_ERROR_STATUSES
+    google_breaker.record(ok, time.monotonic() - start)
+    return data
 
 # --- ZIP code fallback for quick check before full addresses ---
-CABA_ZIPCODES = [str(z) for z in range(1000, 1430)] + [f"C{z}" for z in range(1000, 1430)]
+# Price tiers and covered postal codes live in the pricing engine (app/services/pricing.py)
 def is_caba(postal_code: str) -> bool:
-    if not postal_code:
-        return False
-    return postal_code.strip().upper() in CABA_ZIPCODES
+    return pricing_engine.quote_postal_code(None, postal_code) is not None
 
 
 def build_address_str(addr: Dict[str, Any]) -> str:
@@ -31,84 +81,397 @@ def build_address_str(addr: Dict[str, Any]) -> str:
             parts.append(str(addr.get(key)))
     return ", ".join(parts)
 
+
+def normalize_address_str(address: str) -> str:
+    """Normalize an address string so equivalent addresses share a cache key."""
+    address = re.sub(r"\s+", " ", address.strip().lower())
+    return re.sub(r"\s*,\s*", ", ", address)
+
+
+class DistanceCache:
+    """
+    Two-tier cache for Distance Matrix results:
+    in-process LRU with TTL in front of the SQLite `distance_cache` table.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, db_ttl: float):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.db_ttl = db_ttl
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get(self, origin: str, destination: str) -> Optional[float]:
+        key = (origin, destination)
+        distance_km = self.memory.get(key)
+        if distance_km is not None:
+            self.memory_hits += 1
+            return distance_km
+
+        distance_km = await async_db.get_cached_distance(origin, destination, self.db_ttl)
+        if distance_km is not None:
+            self.db_hits += 1
+            self.memory.set(key, distance_km)
+            return distance_km
+
+        self.misses += 1
+        return None
+
+    async def set(self, origin: str, destination: str, distance_km: float):
+        self.memory.set((origin, destination), distance_km)
+        await async_db.save_cached_distance(origin, destination, distance_km)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "memory_size": len(self.memory),
+        }
+
+
+distance_cache = DistanceCache(
+    maxsize=settings.DISTANCE_CACHE_SIZE,
+    ttl=settings.DISTANCE_CACHE_TTL_SECONDS,
+    db_ttl=settings.DISTANCE_CACHE_DB_TTL_SECONDS,
+)
+
+
 async def get_distance_km(origin: Dict[str, Any], destination: Dict[str, Any]) -> Optional[float]:
     """Call Google Distance Matrix API and return distance in km."""
     if not GOOGLE_MAPS_API_KEY or not origin or not destination:
         return None
 
     origin_str = build_address_str(origin)
-    print(f"[DEBUG] Origin address string: {origin_str}")
     destination_str = build_address_str(destination)
-    print(f"[DEBUG] Destination address string: {destination_str}")
     if not origin_str or not destination_str:
         return None
 
+    origin_key = normalize_address_str(origin_str)
+    destination_key = normalize_address_str(destination_str)
+    cached = await distance_cache.get(origin_key, destination_key)
+    if cached is not None:
+        DISTANCE_CACHE_LOOKUPS.inc(result="hit")
+        return cached
+    DISTANCE_CACHE_LOOKUPS.inc(result="miss")
+    # skip the batching window too while Google is failing
+    if google_breaker.rejecting():
+        return None
+
+    return await distance_batcher.lookup(origin_str, origin_key, destination_str, destination_key)
+
+
+async def fetch_distance_matrix(origin_str: str, destination_strs: List[str]) -> List[Optional[float]]:
+    """
+    One Distance Matrix request for one origin and many destinations.
+    Returns the distance in km per destination (None where Google has no route,
+    or for all of them when the call failed or the breaker is open).
+    """
     params = {
         "origins": origin_str,
-        "destinations": destination_str,
+        "destinations": "|".join(destination_strs),
         "key": GOOGLE_MAPS_API_KEY,
         "units": "metric"
     }
-    url = "https://maps.googleapis.com/maps/api/distancematrix/json?" + urllib.parse.urlencode(params, safe=",")
+    url = f"{GOOGLE_MAPS_API_URL}/distancematrix/json?" + urllib.parse.urlencode(params, safe=",")
+    results: List[Optional[float]] = [None] * len(destination_strs)
+    data = await google_get(url)
+    if not data or data.get("status") != "OK":
+        return results
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(url)
-        data = resp.json()
-        if data.get("status") != "OK":
-            return None
-        element = data["rows"][0]["elements"][0]
-        if element.get("status") != "OK":
+        for i, element in enumerate(data["rows"][0]["elements"][:len(destination_strs)]):
+            if element.get("status") == "OK":
+                results[i] = element["distance"]["value"] / 1000.0
+    except (KeyError, IndexError, TypeError):
+        pass
+    return results
+
+
+class DistanceMatrixBatcher:
+    """
+    Micro-batches Distance Matrix lookups: lookups for the same origin arriving
+    within DISTANCE_BATCH_WINDOW_MS go out as one multi-destination request, and
+    concurrent lookups of the same origin/destination pair share one result.
+    """
+
+    def __init__(self, window_ms: float, max_destinations: int):
+        self.window = window_ms / 1000.0
+        self.max_destinations = max_destinations
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # the loop only keeps weak references to tasks
+        self._tasks: set = set()
+        self.requests = 0
+        self.lookups = 0
+
+    async def lookup(self, origin_str: str, origin_key: str, destination_str: str, destination_key: str) -> Optional[float]:
+        self.lookups += 1
+        key = (origin_key, destination_key)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._enqueue(origin_str, origin_key, destination_str, destination_key)
+        # shield: a caller giving up must not cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    def _enqueue(self, origin_str: str, origin_key: str, destination_str: str, destination_key: str):
+        batch = self._batches.get(origin_key)
+        if batch is None:
+            batch = self._batches[origin_key] = {"origin_str": origin_str, "destinations": {}}
+            batch["timer"] = asyncio.get_running_loop().call_later(self.window, self._flush, origin_key)
+        batch["destinations"][destination_key] = destination_str
+        if len(batch["destinations"]) >= self.max_destinations:
+            batch["timer"].cancel()
+            self._flush(origin_key)
+
+    def _flush(self, origin_key: str):
+        batch = self._batches.pop(origin_key, None)
+        if batch:
+            task = asyncio.create_task(self._run(origin_key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, origin_key: str, batch: Dict[str, Any]):
+        destination_keys = list(batch["destinations"])
+        self.requests += 1
+        try:
+            distances = await fetch_distance_matrix(batch["origin_str"], [batch["destinations"][k] for k in destination_keys])
+        except Exception:
+            distances = [None] * len(destination_keys)
+        for destination_key, distance_km in zip(destination_keys, distances):
+            future = self._inflight.pop((origin_key, destination_key), None)
+            if future is not None and not future.done():
+                future.set_result(distance_km)
+        for destination_key, distance_km in zip(destination_keys, distances):
+            if distance_km is not None:
+                try:
+                    await distance_cache.set(origin_key, destination_key, distance_km)
+                except Exception as e:
+                    log.warning("Could not cache distance", error=str(e))
+
+    async def stop(self):
+        """Cancel pending batches and requests; their waiters get None."""
+        for batch in self._batches.values():
+            batch["timer"].cancel()
+        self._batches.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for future in self._inflight.values():
+            if not future.done():
+                future.set_result(None)
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"lookups": self.lookups, "upstream_requests": self.requests, "inflight": len(self._inflight)}
+
+
+distance_batcher = DistanceMatrixBatcher(settings.DISTANCE_BATCH_WINDOW_MS, settings.DISTANCE_BATCH_MAX_DESTINATIONS)
+
+
+# --- Offline distance estimator (postal-code centroids + haversine) ---
+POSTAL_CENTROIDS_PATH = Path(__file__).resolve().parent.parent / "data" / "postal_centroids.csv"
+EARTH_RADIUS_KM = 6371.0088
+
+
+def load_postal_centroids(path: Path = POSTAL_CENTROIDS_PATH) -> Dict[str, Tuple[float, float]]:
+    centroids = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.DictReader(line for line in f if not line.startswith("#"))
+        for row in rows:
+            centroids[normalize_postal_code(row["postal_code"])] = (float(row["lat"]), float(row["lng"]))
+    return centroids
+
+
+def haversine_km(lat: float, lng: float, lats, lngs) -> List[float]:
+    """Great-circle distance from one point to many (vectorized with numpy when available)."""
+    if np is not None:
+        lat1, lng1 = np.radians(lat), np.radians(lng)
+        lat2, lng2 = np.radians(np.asarray(lats, dtype=float)), np.radians(np.asarray(lngs, dtype=float))
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))).tolist()
+
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    distances = []
+    for lat2, lng2 in zip(lats, lngs):
+        lat2, lng2 = math.radians(lat2), math.radians(lng2)
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a)))
+    return distances
+
+
+class LocalDistanceEstimator:
+    """
+    Road distance estimate without network calls:
+    haversine between origin and destination centroids times a road factor.
+    Origins use a cached geocode of the full address when we have one,
+    otherwise their postal-code centroid.
+    """
+
+    def __init__(self, centroids: Dict[str, Tuple[float, float]], road_factor: float):
+        self.centroids = centroids
+        self.road_factor = road_factor
+        self.origin_geocodes: Dict[str, Tuple[float, float]] = {}
+        self._geocoding: Dict[str, asyncio.Task] = {}
+
+    def load_origin_geocodes(self):
+        self.origin_geocodes.update(load_origin_geocodes())
+
+    def origin_coords(self, origin: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+        origin_key = normalize_address_str(build_address_str(origin))
+        if origin_key in self.origin_geocodes:
+            return self.origin_geocodes[origin_key]
+        return self.centroids.get(normalize_postal_code(origin.get("postal_code", "")))
+
+    def estimate_many(self, coords: Tuple[float, float], postal_codes: List[str]) -> List[Optional[float]]:
+        known = [(i, self.centroids[c]) for i, c in enumerate(map(normalize_postal_code, postal_codes))
+                 if c in self.centroids]
+        result: List[Optional[float]] = [None] * len(postal_codes)
+        if not known:
+            return result
+        distances = haversine_km(coords[0], coords[1], [p[0] for _, p in known], [p[1] for _, p in known])
+        for (i, _), km in zip(known, distances):
+            result[i] = round(km * self.road_factor, 3)
+        return result
+
+    def estimate_km(self, origin: Dict[str, Any], destination: Dict[str, Any]) -> Optional[float]:
+        coords = self.origin_coords(origin)
+        if coords is None:
             return None
-        meters = element["distance"]["value"]
-        return meters / 1000.0
-    except Exception:
-        return None
+        return self.estimate_many(coords, [destination.get("postal_code", "")])[0]
+
+    def schedule_origin_geocode(self, origin: Dict[str, Any]):
+        """Geocode a store origin in the background so later estimates use its exact location."""
+        origin_str = build_address_str(origin)
+        origin_key = normalize_address_str(origin_str)
+        if (not GOOGLE_MAPS_API_KEY or not origin_str or origin_key in self.origin_geocodes
+                or origin_key in self._geocoding):
+            return
+        task = asyncio.create_task(self._geocode(origin_str, origin_key))
+        self._geocoding[origin_key] = task
+        task.add_done_callback(lambda _: self._geocoding.pop(origin_key, None))
+
+    async def _geocode(self, origin_str: str, origin_key: str):
+        params = {"address": origin_str, "key": GOOGLE_MAPS_API_KEY}
+        url = f"{GOOGLE_MAPS_API_URL}/geocode/json?" + urllib.parse.urlencode(params, safe=",")
+        try:
+            data = await google_get(url)
+            if not data or data.get("status") != "OK":
+                return
+            location = data["results"][0]["geometry"]["location"]
+            coords = (float(location["lat"]), float(location["lng"]))
+            await async_db.save_origin_geocode(origin_key, coords[0], coords[1])
+            self.origin_geocodes[origin_key] = coords
+        except Exception as e:
+            log.warning("Origin geocode failed", origin=origin_str, error=str(e))
+
+    async def stop(self):
+        tasks = list(self._geocoding.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+local_estimator = LocalDistanceEstimator(load_postal_centroids(), settings.ROAD_DISTANCE_FACTOR)
+
+
+rate_grid.configure(local_estimator.centroids, fetch_distance_matrix)
+
+
+async def resolve_distance_km(origin: Dict[str, Any], destination: Dict[str, Any],
+                              store_id: Optional[str] = None) -> Tuple[Optional[float], str]:
+    """
+    Distance according to RATES_DISTANCE_MODE:
+    - google: Distance Matrix, local estimate if it fails
+    - local: local estimate only
+    - local_first: local estimate, Distance Matrix if the estimate isn't possible
+    In google/local_first mode the store's precomputed rate grid answers first.
+    Returns (distance_km, source) with source in {"grid", "google", "local", "none"}.
+    """
+    mode = settings.RATES_DISTANCE_MODE
+    if store_id and origin and rate_grid.enabled:
+        origin_str = build_address_str(origin)
+        if origin_str:
+            origin_key = normalize_address_str(origin_str)
+            distance_km = rate_grid.lookup(store_id, origin_key, destination.get("postal_code", ""))
+            if distance_km is not None:
+                return distance_km, "grid"
+            rate_grid.observe(store_id, origin_key, origin_str)
+
+    if mode != "google" and origin:
+        local_estimator.schedule_origin_geocode(origin)
+        distance_km = local_estimator.estimate_km(origin, destination)
+        if distance_km is not None:
+            return distance_km, "local"
+        if mode == "local":
+            return None, "none"
+
+    distance_km = await get_distance_km(origin, destination)
+    if distance_km is not None:
+        return distance_km, "google"
+
+    if mode == "google" and origin:
+        distance_km = local_estimator.estimate_km(origin, destination)
+        if distance_km is not None:
+            return distance_km, "local"
+    return None, "none"
+
+
+@router.get("/rates/cache", dependencies=[Depends(verify_api_key)])
+def distance_cache_stats():
+    """Hit/miss counters for the distance cache, batcher and rate grid, and the Google breaker state."""
+    return {**distance_cache.stats(), "batcher": distance_batcher.stats(), "grid": rate_grid.stats(),
+            "breaker": google_breaker.stats()}
 
 @router.post("/rates")
 async def calculate_rates(request: Request):
     """
     TiendaNube calls here to request rates.
     - First: fallback by ZIP code if no full addresses
-    - Then: calculate distance if origin/destination present
+    - Then: calculate distance if origin/destination present, within
+      RATES_DEADLINE_SECONDS (local estimate / ZIP code past it)
     - Return price according to tiers
     """
+    start = time.monotonic()
     payload = await request.json()
+    store_id = payload.get("store_id")
     origin = payload.get("origin", {}) or {}
     destination = payload.get("destination", {}) or {}
     postal_code = destination.get("postal_code", "")
     currency = payload.get("currency", "ARS")
 
-    price = None
-
     # --- Distance-based pricing if we have full addresses ---
-    distance_km = await get_distance_km(origin, destination)
-    print(f"[DEBUG] Destination: {destination}")
-    print(f"[INFO] Calculated distance: {distance_km} km")
-    if distance_km is not None:
-        if distance_km < 3.0:
-            price = PRICE_TIER_LT_3KM
-        elif 3.0 <= distance_km < 5.0:
-            price = PRICE_TIER_3_TO_5KM
-        elif 5.0 <= distance_km <= 10.0:
-            price = PRICE_TIER_5_TO_10KM
-    else:
-        if is_caba(postal_code):
-            price = PRICE_TIER_5_TO_10KM
-    
-    if price is None:
+    budget = max(0.0, settings.RATES_DEADLINE_SECONDS - (time.monotonic() - start))
+    try:
+        distance_km, source = await asyncio.wait_for(resolve_distance_km(origin, destination, store_id), budget)
+    except asyncio.TimeoutError:
+        # the Google lookup keeps going in the batcher and fills the cache for next time
+        RATES_DEADLINE_EXCEEDED.inc()
+        log.warning("Rates deadline exceeded, using fallback", store_id=store_id, deadline=settings.RATES_DEADLINE_SECONDS)
+        distance_km = local_estimator.estimate_km(origin, destination) if origin else None
+        source = "local" if distance_km is not None else "none"
+    log.debug("Calculated distance", store_id=store_id, destination=destination, distance_km=distance_km, source=source)
+    # Distance band if we have a distance, postal-code zone otherwise
+    quote = pricing_engine.quote(store_id, distance_km, postal_code)
+    if distance_km is None:
+        source = "zip" if quote is not None else "none"
+    RATES_DISTANCE_LOOKUPS.inc(source=source)
+    if quote is None:
         return {"rates": []}
 
     rate = {
         "name": "Pick'NShip: coordinamos dia y horario por whatsapp",
         "code": "picknship_dynamic",
-        "price": price,
-        "price_merchant": price,
+        "price": quote.price,
+        "price_merchant": quote.price,
         "currency": currency,
         "type": "ship",
         "phone_required": True,
         "id_required": False,
         "accepts_cod": False,
-        "reference": f"picknship_rate_{'lt_5' if distance_km and distance_km < 5.0 else '5_10' if distance_km and 5.0 <= distance_km < 10.0 else '10_20' if distance_km and 10.0 <= distance_km <= 20.0 else 'zip'}",
+        "reference": f"picknship_rate_{quote.reference}",
     }
 
     return {"rates": [rate]}
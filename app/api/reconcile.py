@@ -0,0 +1,38 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from app.core import async_db
+from app.core.security import verify_api_key
+from app.services.reconcile import reconcile_job
+
+router = APIRouter(prefix="/reconcile", dependencies=[Depends(verify_api_key)])
+
+
+class ReconcileRequest(BaseModel):
+    store_ids: Optional[List[str]] = None
+    since: Optional[str] = None
+    concurrency: Optional[int] = None
+    notify: bool = False
+
+
+@router.post("/", status_code=202)
+async def start_reconcile(body: Optional[ReconcileRequest] = None):
+    """
+    Start a background reconciliation run (all stores unless store_ids is given)
+    """
+    body = body or ReconcileRequest()
+    if await reconcile_job.start(**body.model_dump()) is None:
+        raise HTTPException(status_code=409, detail="Reconciliation already running")
+    return {"status": "started", "started_at": reconcile_job.started_at}
+
+
+@router.get("/")
+async def reconcile_status():
+    """
+    Current run state, last result and per-store checkpoints
+    """
+    return {
+        **await reconcile_job.status(),
+        "last_result": reconcile_job.last_result,
+        "checkpoints": await async_db.list_reconcile_checkpoints(),
+    }
@@ -1,12 +1,31 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.core.security import verify_api_key
-from app.core.db import list_stores
+from app.core.db import list_stores_page, iter_stores, decode_cursor
+from app.core.serialization import ndjson_lines
 
 router = APIRouter(prefix="/stores", dependencies=[Depends(verify_api_key)])
 
 @router.get("/")
-def get_stores():
+def get_stores(
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_tokens: bool = False,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
     """
     List all connected stores, including shipping method status
+    - JSON: one page (all stores without `limit`) and the next page cursor
+    - NDJSON: streams every store from `cursor` on (or up to `limit`)
     """
-    return {"stores": list_stores()}
+    try:
+        if cursor:
+            decode_cursor(cursor)
+        if format == "ndjson":
+            rows = iter_stores(include_tokens=include_tokens, limit=limit, cursor=cursor)
+            return StreamingResponse(ndjson_lines(rows), media_type="application/x-ndjson")
+        stores, next_cursor = list_stores_page(limit=limit, cursor=cursor, include_tokens=include_tokens)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"stores": stores, "next_cursor": next_cursor}
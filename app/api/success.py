@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
-from app.core.db import get_store
+from app.core import async_db
 from app.core.config import settings
 
 router = APIRouter()
@@ -11,7 +11,7 @@ async def success_page(request: Request, store_id: str | None = None):
     store_url = ""
 
     if store_id:
-        store = get_store(store_id)
+        store = await async_db.get_store(store_id)
         if store:
             store_url = store.get("domain", "")
 
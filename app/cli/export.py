@@ -0,0 +1,48 @@
+"""
+Export orders to CSV or Parquet (pyarrow needed), streamed from one
+consistent snapshot:
+
+    python -m app.cli.export --output orders.csv
+    python -m app.cli.export --format parquet --store 123 --from 2025-01-01 --to 2025-02-01 --output jan.parquet
+"""
+import argparse
+import sys
+from app.core.db import close_db
+from app.core.log import setup_logging, stop_logging
+from app.services.export import FORMATS, export_orders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export PickNShip orders")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--store", action="append", help="store id (repeatable, default: all stores)")
+    parser.add_argument("--from", dest="created_from", help="created_at >= (ISO 8601)")
+    parser.add_argument("--to", dest="created_to", help="created_at < (ISO 8601)")
+    parser.add_argument("--chunk-size", type=int, help="rows read and written per chunk")
+    parser.add_argument("--output", default="-", help="file path, or - for stdout (default)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    try:
+        stream = export_orders(args.format, store_ids=args.store, created_from=args.created_from,
+                               created_to=args.created_to, chunk_size=args.chunk_size)
+        out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            size = 0
+            for data in stream:
+                out.write(data)
+                size += len(data)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        close_db()
+        stop_logging()
+    print(f"wrote {size} bytes", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
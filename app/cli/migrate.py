@@ -0,0 +1,25 @@
+"""
+Apply pending schema migrations and print the schema version:
+
+    python -m app.cli.migrate
+
+The app also migrates on startup; running this first keeps DDL out of the
+workers' cold start.
+"""
+from app.core.db import init_db, close_db, schema_version
+from app.core.log import setup_logging, stop_logging
+
+
+def main(argv=None):
+    setup_logging()
+    try:
+        init_db()
+        print(f"schema version {schema_version()}")
+    finally:
+        close_db()
+        stop_logging()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+"""
+Backfill missed orders from the TiendaNube orders API:
+
+    python -m app.cli.reconcile                      # every store, since its checkpoint
+    python -m app.cli.reconcile --store 123 --since 2025-01-01T00:00:00-03:00
+"""
+import argparse
+import asyncio
+import json
+from app.core import async_db
+from app.core.db import init_db, close_db
+from app.core.http import http_clients
+from app.core.log import setup_logging, stop_logging
+from app.services.reconcile import reconcile_job
+
+
+async def _main(args) -> dict:
+    await http_clients.start()
+    try:
+        task = await reconcile_job.start(
+            store_ids=args.store or None,
+            since=args.since,
+            concurrency=args.concurrency,
+            notify=args.notify,
+        )
+        if task is None:
+            return {"error": "Reconciliation already running", "failed": []}
+        return await task
+    finally:
+        await http_clients.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile PickNShip orders against TiendaNube")
+    parser.add_argument("--store", action="append", help="store id (repeatable, default: all stores)")
+    parser.add_argument("--since", help="updated_at_min (ISO 8601), default: per-store checkpoint")
+    parser.add_argument("--concurrency", type=int, help="stores reconciled at once")
+    parser.add_argument("--notify", action="store_true", help="send Slack notifications for new/changed orders")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    init_db()
+    try:
+        summary = asyncio.run(_main(args))
+    finally:
+        async_db.shutdown()
+        close_db()
+        stop_logging()
+    print(json.dumps(summary, indent=2))
+    return 1 if summary.get("error") or summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+"""
+Replay archived webhook events through the order processing logic, with
+TiendaNube and Slack answered by in-process stand-ins so the orders fetched
+are exactly the archived ones:
+
+    python -m app.cli.replay --target /tmp/replay.db --archive /var/data/picknship.db
+    python -m app.cli.replay --target /tmp/replay.db --since 2025-05-01T00:00:00-03:00 --store 123
+
+Events for the same order are replayed in arrival order; different orders
+run in parallel batches. The archive is read (read-only) from --archive,
+default DB_PATH; writes go to --target, which may not be the live DB_PATH.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import httpx
+from app.core import async_db
+from app.core.config import settings
+from app.core.db import init_db, close_db, iter_archive, use_database
+from app.core.http import http_clients
+from app.core.log import setup_logging, stop_logging
+from app.services import order_sync
+from app.services.slack.channels import SLACK_CHANNELS
+
+Key = Tuple[str, str]
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def load_events(archive: Optional[str], since: Optional[float], until: Optional[float],
+                store_ids: Optional[List[str]], batch_size: int,
+                stats: Dict[str, int]) -> Iterator[List[Tuple[dict, dict]]]:
+    """
+    Stream archived webhooks as batches of (event, order body) pairs, each
+    event paired with the first order body fetched at or after it. An order
+    appears at most once per batch, so its events still run in arrival order.
+    Only events still waiting for their body are held in memory; those never
+    matched are counted in stats["missing"].
+    """
+    pending: Dict[Key, List[dict]] = defaultdict(list)
+    batch: List[Tuple[dict, dict]] = []
+    in_batch = set()
+    for record in iter_archive(since=since, until=until, store_ids=store_ids, path=archive):
+        key = (record["store_id"], record["order_id"])
+        if record["kind"] == "webhook":
+            pending[key].append(record)
+            continue
+        if record["kind"] != "order" or key not in pending:
+            continue
+        waiting = pending[key]
+        ready = [e for e in waiting if e["received_at"] <= record["received_at"]]
+        waiting[:] = [e for e in waiting if e["received_at"] > record["received_at"]]
+        if not waiting:
+            del pending[key]
+        for event in ready:
+            if key in in_batch or len(batch) >= batch_size:
+                yield batch
+                batch, in_batch = [], set()
+            batch.append((event, record["body"]))
+            in_batch.add(key)
+    if batch:
+        yield batch
+    stats["missing"] = sum(len(waiting) for waiting in pending.values())
+
+
+def _use_stand_ins(orders: Dict[str, dict]):
+    """
+    Answer TiendaNube and Slack calls in-process: order fetches return the
+    archived body, everything else succeeds (like the bench/stubs.py apps,
+    without the per-request ASGI routing cost).
+    """
+    def tiendanube(request: httpx.Request) -> httpx.Response:
+        parts = request.url.path.rstrip("/").split("/")
+        if request.method == "GET" and len(parts) >= 3 and parts[-2] == "orders":
+            body = orders.get(f"{parts[-3]}/{parts[-1]}")
+            if body is not None:
+                return httpx.Response(200, json=body)
+        return httpx.Response(404, json={"description": "Not archived"})
+
+    def slack(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text="ok")
+
+    http_clients.mount("tiendanube", httpx.MockTransport(tiendanube))
+    http_clients.mount("slack", httpx.MockTransport(slack))
+    for channel, url in SLACK_CHANNELS.items():
+        SLACK_CHANNELS[channel] = url or f"http://slack.stand-in/{channel}"
+
+
+async def _main(batches: Iterator[List[Tuple[dict, dict]]]) -> Dict:
+    orders: Dict[str, dict] = {}
+    _use_stand_ins(orders)
+    try:
+        return await replay(batches, orders)
+    finally:
+        await http_clients.close()
+
+
+async def replay(batches: Iterator[List[Tuple[dict, dict]]], orders: Dict[str, dict]) -> Dict:
+    """Process each batch's events concurrently; `orders` backs the stand-in for the current batch."""
+    stores = set()
+    keys = set()
+    statuses: Counter = Counter()
+    start = time.monotonic()
+    for batch in batches:
+        orders.clear()
+        for event, body in batch:
+            if event["store_id"] not in stores:
+                stores.add(event["store_id"])
+                if await async_db.get_store(event["store_id"]) is None:
+                    await async_db.save_store(event["store_id"], "replay", {})
+            keys.add((event["store_id"], event["order_id"]))
+            orders[f"{event['store_id']}/{event['order_id']}"] = body
+        results = await asyncio.gather(*(
+            order_sync.process_order_event(event["store_id"], event["order_id"], event["event"])
+            for event, _ in batch
+        ), return_exceptions=True)
+        for result in results:
+            statuses["error" if isinstance(result, BaseException) else result] += 1
+    duration = time.monotonic() - start
+    events = sum(statuses.values())
+    return {
+        "events": events,
+        "orders": len(keys),
+        "statuses": dict(statuses),
+        "duration_s": round(duration, 3),
+        "events_per_s": round(events / duration, 1) if duration else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay archived webhook events against local stand-ins")
+    parser.add_argument("--target", required=True, help="database file the replay writes to (not the live DB_PATH)")
+    parser.add_argument("--archive", help="database file holding the archive, opened read-only (default: DB_PATH)")
+    parser.add_argument("--since", help="received at or after (ISO 8601)")
+    parser.add_argument("--until", help="received before (ISO 8601)")
+    parser.add_argument("--store", action="append", help="store id (repeatable, default: all stores)")
+    parser.add_argument("--batch-size", type=int, default=200, help="events processed concurrently")
+    args = parser.parse_args(argv)
+    if os.path.exists(args.target) and os.path.samefile(args.target, settings.DB_PATH):
+        parser.error(f"--target must not be the live database ({settings.DB_PATH})")
+
+    # replayed traffic must not be archived again, rate limited or queued for Slack
+    settings.ARCHIVE_ENABLED = False
+    settings.TIENDANUBE_RATE_LIMIT_ENABLED = False
+    settings.SLACK_OUTBOX_ENABLED = False
+
+    setup_logging()
+    use_database(args.target)
+    init_db()
+    try:
+        stats: Dict[str, int] = {}
+        batches = load_events(args.archive or settings.DB_PATH, _timestamp(args.since), _timestamp(args.until),
+                              args.store, args.batch_size, stats)
+        summary = asyncio.run(_main(batches))
+        summary["skipped_without_order"] = stats.get("missing", 0)
+    finally:
+        async_db.shutdown()
+        close_db()
+        stop_logging()
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["statuses"].get("error") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
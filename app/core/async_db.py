@@ -0,0 +1,158 @@
+"""
+Async facade over app.core.db.
+Each call runs on a dedicated, bounded thread pool so SQLite I/O and
+lock waits never block the event loop.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from app.core import db
+from app.core.config import settings
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.DB_THREADS, thread_name_prefix="db")
+    return _executor
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a synchronous db function on the DB thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown():
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+async def save_store(store_id: str, access_token: str, store: Dict, shipping_created: bool = False) -> bool:
+    return await run_db(db.save_store, store_id, access_token, store, shipping_created)
+
+
+async def mark_shipping_created(store_id: str):
+    return await run_db(db.mark_shipping_created, store_id)
+
+
+async def update_store_info(store_id: str, store: Dict):
+    return await run_db(db.update_store_info, store_id, store)
+
+
+async def get_store(store_id: str) -> Optional[Dict]:
+    return await run_db(db.get_store, store_id)
+
+
+async def list_stores(include_tokens: bool = True) -> List[Dict]:
+    return await run_db(db.list_stores, include_tokens)
+
+
+async def save_order_if_new(order_data: dict) -> bool:
+    return await run_db(db.save_order_if_new, order_data)
+
+
+async def upsert_order(order_data: dict) -> Dict:
+    return await run_db(db.upsert_order, order_data)
+
+
+async def get_order(order_id: str, store_id: str) -> dict:
+    return await run_db(db.get_order, order_id, store_id)
+
+
+async def list_orders(limit: int = 100, **filters) -> List[Dict]:
+    return await run_db(db.list_orders, limit, **filters)
+
+
+async def get_cached_distance(origin: str, destination: str, max_age: float) -> Optional[float]:
+    return await run_db(db.get_cached_distance, origin, destination, max_age)
+
+
+async def save_cached_distance(origin: str, destination: str, distance_km: float):
+    return await run_db(db.save_cached_distance, origin, destination, distance_km)
+
+
+async def save_origin_geocode(origin: str, lat: float, lng: float):
+    return await run_db(db.save_origin_geocode, origin, lat, lng)
+
+
+async def enqueue_webhook_event(store_id: str, order_id: str, event: str, payload: dict) -> int:
+    return await run_db(db.enqueue_webhook_event, store_id, order_id, event, payload)
+
+
+async def claim_webhook_event(owner: str, lease_seconds: float) -> Optional[Dict]:
+    return await run_db(db.claim_webhook_event, owner, lease_seconds)
+
+
+async def renew_webhook_claim(event_id: int, owner: str) -> bool:
+    return await run_db(db.renew_webhook_claim, event_id, owner)
+
+
+async def complete_webhook_event(event_id: int, owner: str):
+    return await run_db(db.complete_webhook_event, event_id, owner)
+
+
+async def fail_webhook_event(event_id: int, owner: str, error: str, retry_at: Optional[float]):
+    return await run_db(db.fail_webhook_event, event_id, owner, error, retry_at)
+
+
+async def webhook_queue_stats() -> Dict[str, int]:
+    return await run_db(db.webhook_queue_stats)
+
+
+async def enqueue_notification(channel: str, kind: str, payload: dict,
+                               coalesce_key: Optional[str] = None, delay: float = 0.0) -> int:
+    return await run_db(db.enqueue_notification, channel, kind, payload, coalesce_key, delay)
+
+
+async def claim_notifications(owner: str, lease_seconds: float) -> List[Dict]:
+    return await run_db(db.claim_notifications, owner, lease_seconds)
+
+
+async def complete_notifications(ids: List[int], owner: str):
+    return await run_db(db.complete_notifications, ids, owner)
+
+
+async def fail_notifications(ids: List[int], owner: str, error: str, retry_at: Optional[float]):
+    return await run_db(db.fail_notifications, ids, owner, error, retry_at)
+
+
+async def upsert_orders(orders: List[dict]) -> List[Dict]:
+    return await run_db(db.upsert_orders, orders)
+
+
+async def get_reconcile_checkpoint(store_id: str) -> Optional[Dict]:
+    return await run_db(db.get_reconcile_checkpoint, store_id)
+
+
+async def save_reconcile_checkpoint(store_id: str, **fields):
+    return await run_db(db.save_reconcile_checkpoint, store_id, **fields)
+
+
+async def list_reconcile_checkpoints() -> List[Dict]:
+    return await run_db(db.list_reconcile_checkpoints)
+
+
+async def reset_onboarding(store_id: str, steps: Dict[str, str]):
+    return await run_db(db.reset_onboarding, store_id, steps)
+
+
+async def set_onboarding_step(store_id: str, step: str, status: str, error: Optional[str] = None):
+    return await run_db(db.set_onboarding_step, store_id, step, status, error)
+
+
+async def get_onboarding_steps(store_id: str) -> List[Dict]:
+    return await run_db(db.get_onboarding_steps, store_id)
+
+
+async def prune_archive(before: float) -> int:
+    return await run_db(db.prune_archive, before)
+
+
+async def archive_events(records: List[tuple]):
+    return await run_db(db.archive_events, records)
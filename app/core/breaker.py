@@ -0,0 +1,131 @@
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Tuple
+from app.core.log import get_logger
+from app.core.metrics import CIRCUIT_BREAKER_STATE, CIRCUIT_BREAKER_REJECTED
+
+log = get_logger(__name__)
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+# picknship_circuit_breaker_state values
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for one upstream.
+
+    closed: calls go through; outcomes of the last `window_seconds` are kept and
+    the breaker opens when at least `min_calls` were made and `failure_rate` of
+    them failed (errors, or calls slower than `slow_call_seconds`).
+    open: calls are rejected until `open_seconds` have passed.
+    half_open: up to `half_open_calls` probes go through; all succeeding closes
+    the breaker, any failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_rate: float, min_calls: int, window_seconds: float,
+                 open_seconds: float, half_open_calls: int, slow_call_seconds: float,
+                 enabled: bool = True, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.enabled = enabled
+        self._clock = clock
+        self._state = CLOSED
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.opened = 0
+        CIRCUIT_BREAKER_STATE.set(STATE_VALUES[CLOSED], upstream=name)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (in half_open, takes a probe slot)."""
+        if not self.enabled:
+            return True
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        CIRCUIT_BREAKER_REJECTED.inc(upstream=self.name)
+        return False
+
+    def rejecting(self) -> bool:
+        """True while open (counted as a rejection); unlike allow(), never takes a probe slot."""
+        if not self.enabled or self.state != OPEN:
+            return False
+        self.rejected += 1
+        CIRCUIT_BREAKER_REJECTED.inc(upstream=self.name)
+        return True
+
+    def release(self):
+        """An allowed call was abandoned before it finished (cancelled): free its probe slot."""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, ok: bool, duration: float = 0.0):
+        """Outcome of an allowed call."""
+        if not self.enabled:
+            return
+        ok = ok and duration < self.slow_call_seconds
+        state = self.state
+        if state == HALF_OPEN:
+            if not ok:
+                self._transition(OPEN)
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(CLOSED)
+        elif state == CLOSED:
+            now = self._clock()
+            self._calls.append((now, ok))
+            self._failures += not ok
+            self._prune(now)
+            if len(self._calls) >= self.min_calls and self._failures >= self.failure_rate * len(self._calls):
+                self._transition(OPEN)
+        # open: late results of calls made before it opened don't count
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            _, ok = self._calls.popleft()
+            self._failures -= not ok
+
+    def _transition(self, state: str):
+        previous, self._state = self._state, state
+        self._probes = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = self._clock()
+            self.opened += 1
+            log.warning("Circuit breaker open", upstream=self.name, previous=previous,
+                        calls=len(self._calls), failures=self._failures)
+        elif state == CLOSED:
+            log.info("Circuit breaker closed", upstream=self.name)
+        self._calls.clear()
+        self._failures = 0
+        CIRCUIT_BREAKER_STATE.set(STATE_VALUES[state], upstream=self.name)
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "enabled": self.enabled,
+            "window_calls": len(self._calls),
+            "window_failures": self._failures,
+            "rejected": self.rejected,
+            "opened": self.opened,
+        }
@@ -15,4 +15,133 @@ class Settings:
     SLACK_ORDERS_WEBHOOK_URL = os.getenv("SLACK_ORDERS_WEBHOOK_URL")
     API_KEY = os.getenv("API_KEY")
 
+    # Upstream base URLs (overridable for local stand-ins, see bench/)
+    TIENDANUBE_API_URL = os.getenv("TIENDANUBE_API_URL", "https://api.tiendanube.com/v1")
+    TIENDANUBE_TOKEN_URL = os.getenv("TIENDANUBE_TOKEN_URL", "https://www.tiendanube.com/apps/authorize/token")
+    GOOGLE_MAPS_API_URL = os.getenv("GOOGLE_MAPS_API_URL", "https://maps.googleapis.com/maps/api")
+    DB_PATH = os.getenv("DB_PATH", "/var/data/picknship.db")
+
+    # Distance cache for /rates (memory LRU + SQLite)
+    DISTANCE_CACHE_SIZE = int(os.getenv("DISTANCE_CACHE_SIZE", "5000"))
+    DISTANCE_CACHE_TTL_SECONDS = int(os.getenv("DISTANCE_CACHE_TTL_SECONDS", "3600"))
+    DISTANCE_CACHE_DB_TTL_SECONDS = int(os.getenv("DISTANCE_CACHE_DB_TTL_SECONDS", str(30 * 24 * 3600)))
+
+    # Shared outbound HTTP clients
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+    TIENDANUBE_TIMEOUT = float(os.getenv("TIENDANUBE_TIMEOUT", "20"))
+    GOOGLE_MAPS_TIMEOUT = float(os.getenv("GOOGLE_MAPS_TIMEOUT", "10"))
+    SLACK_TIMEOUT = float(os.getenv("SLACK_TIMEOUT", "10"))
+
+    # SQLite connection pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+    DB_WRITE_RETRIES = int(os.getenv("DB_WRITE_RETRIES", "5"))
+    DB_WRITE_RETRY_BASE_MS = float(os.getenv("DB_WRITE_RETRY_BASE_MS", "10"))
+    DB_THREADS = int(os.getenv("DB_THREADS", "4"))
+
+    # Webhook ingestion queue
+    WEBHOOK_QUEUE_ENABLED = os.getenv("WEBHOOK_QUEUE_ENABLED", "false").lower() == "true"
+    WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "2"))
+    WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "300"))
+    WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "1"))
+    WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "20"))
+    WEBHOOK_LEASE_SECONDS = float(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+    WEBHOOK_ERROR_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_ERROR_BACKOFF_MAX_SECONDS", "30"))
+
+    # Jobs run by one worker process at a time (Slack dispatcher, reconciliation), via a DB lease
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+
+    # Slack notification outbox
+    SLACK_OUTBOX_ENABLED = os.getenv("SLACK_OUTBOX_ENABLED", "false").lower() == "true"
+    SLACK_COALESCE_WINDOW_SECONDS = float(os.getenv("SLACK_COALESCE_WINDOW_SECONDS", "10"))
+    SLACK_RATE_PER_SECOND = float(os.getenv("SLACK_RATE_PER_SECOND", "1"))
+    SLACK_RATE_BURST = int(os.getenv("SLACK_RATE_BURST", "1"))
+    SLACK_MAX_ATTEMPTS = int(os.getenv("SLACK_MAX_ATTEMPTS", "6"))
+    SLACK_RETRY_BASE_SECONDS = float(os.getenv("SLACK_RETRY_BASE_SECONDS", "2"))
+    SLACK_OUTBOX_POLL_SECONDS = float(os.getenv("SLACK_OUTBOX_POLL_SECONDS", "1"))
+    # claimed rows not sent within this long are taken over (keep above SLACK_TIMEOUT)
+    SLACK_OUTBOX_LEASE_SECONDS = float(os.getenv("SLACK_OUTBOX_LEASE_SECONDS", "60"))
+
+    # In-process cache of store records (get_store)
+    STORE_CACHE_SIZE = int(os.getenv("STORE_CACHE_SIZE", "2048"))
+    STORE_CACHE_TTL_SECONDS = float(os.getenv("STORE_CACHE_TTL_SECONDS", "600"))
+    STORE_CACHE_INVALIDATION = os.getenv("STORE_CACHE_INVALIDATION", "data_version")  # data_version | none
+    STORE_CACHE_POLL_SECONDS = float(os.getenv("STORE_CACHE_POLL_SECONDS", "1"))
+
+    # /rates distance source: google | local | local_first
+    RATES_DISTANCE_MODE = os.getenv("RATES_DISTANCE_MODE", "google")
+    ROAD_DISTANCE_FACTOR = float(os.getenv("ROAD_DISTANCE_FACTOR", "1.3"))
+
+    # Distance Matrix micro-batching
+    DISTANCE_BATCH_WINDOW_MS = float(os.getenv("DISTANCE_BATCH_WINDOW_MS", "5"))
+    DISTANCE_BATCH_MAX_DESTINATIONS = int(os.getenv("DISTANCE_BATCH_MAX_DESTINATIONS", "25"))
+
+    # Precomputed per-store rate grid (origin -> service-area postal codes)
+    RATE_GRID_ENABLED = os.getenv("RATE_GRID_ENABLED", "false").lower() == "true"
+    RATE_GRID_MAX_ORIGINS_PER_STORE = int(os.getenv("RATE_GRID_MAX_ORIGINS_PER_STORE", "3"))
+    RATE_GRID_CONCURRENCY = int(os.getenv("RATE_GRID_CONCURRENCY", "4"))
+    RATE_GRID_REFRESH_SECONDS = float(os.getenv("RATE_GRID_REFRESH_SECONDS", str(7 * 24 * 3600)))
+    RATE_GRID_RELOAD_SECONDS = float(os.getenv("RATE_GRID_RELOAD_SECONDS", "60"))
+    RATE_GRID_BUILD_LEASE_SECONDS = float(os.getenv("RATE_GRID_BUILD_LEASE_SECONDS", "300"))
+
+    # /rates latency budget: past it, quote from the local estimate / ZIP zone
+    RATES_DEADLINE_SECONDS = float(os.getenv("RATES_DEADLINE_SECONDS", "2"))
+
+    # Distance Matrix circuit breaker (failure rate over a sliding window)
+    GOOGLE_BREAKER_ENABLED = os.getenv("GOOGLE_BREAKER_ENABLED", "true").lower() == "true"
+    GOOGLE_BREAKER_FAILURE_RATE = float(os.getenv("GOOGLE_BREAKER_FAILURE_RATE", "0.5"))
+    GOOGLE_BREAKER_MIN_CALLS = int(os.getenv("GOOGLE_BREAKER_MIN_CALLS", "10"))
+    GOOGLE_BREAKER_WINDOW_SECONDS = float(os.getenv("GOOGLE_BREAKER_WINDOW_SECONDS", "30"))
+    GOOGLE_BREAKER_OPEN_SECONDS = float(os.getenv("GOOGLE_BREAKER_OPEN_SECONDS", "30"))
+    GOOGLE_BREAKER_HALF_OPEN_CALLS = int(os.getenv("GOOGLE_BREAKER_HALF_OPEN_CALLS", "3"))
+    GOOGLE_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("GOOGLE_BREAKER_SLOW_CALL_SECONDS", "2"))
+
+    # Pricing engine hot reload
+    PRICING_RELOAD_SECONDS = float(os.getenv("PRICING_RELOAD_SECONDS", "5"))
+
+    # TiendaNube per-store rate limiting (leaky bucket, tuned from x-rate-limit-* headers)
+    TIENDANUBE_RATE_LIMIT_ENABLED = os.getenv("TIENDANUBE_RATE_LIMIT_ENABLED", "true").lower() == "true"
+    TIENDANUBE_RATE_LIMIT_BACKEND = os.getenv("TIENDANUBE_RATE_LIMIT_BACKEND", "memory")  # memory | sqlite
+    TIENDANUBE_RATE_LIMIT_CAPACITY = int(os.getenv("TIENDANUBE_RATE_LIMIT_CAPACITY", "40"))
+    TIENDANUBE_RATE_LIMIT_PER_SECOND = float(os.getenv("TIENDANUBE_RATE_LIMIT_PER_SECOND", "2"))
+    TIENDANUBE_MAX_429_RETRIES = int(os.getenv("TIENDANUBE_MAX_429_RETRIES", "5"))
+
+    # Orders reconciliation job
+    RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "8"))
+    RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "200"))
+    RECONCILE_LOOKBACK_DAYS = float(os.getenv("RECONCILE_LOOKBACK_DAYS", "30"))
+    RECONCILE_OVERLAP_SECONDS = float(os.getenv("RECONCILE_OVERLAP_SECONDS", "600"))
+    RECONCILE_PAGE_RETRIES = int(os.getenv("RECONCILE_PAGE_RETRIES", "3"))
+    RECONCILE_RETRY_BASE_SECONDS = float(os.getenv("RECONCILE_RETRY_BASE_SECONDS", "1"))
+
+    # Store onboarding (post-install setup runs in the background)
+    ONBOARDING_REDIRECT_WAIT_SECONDS = float(os.getenv("ONBOARDING_REDIRECT_WAIT_SECONDS", "2"))
+
+    # Raw event archive (webhook payloads + fetched orders, for replay)
+    # off by default: bodies hold customer names, addresses and phones
+    ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+    ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "30"))  # 0 = keep forever
+    ARCHIVE_PRUNE_SECONDS = float(os.getenv("ARCHIVE_PRUNE_SECONDS", "3600"))
+    ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "6"))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+    ARCHIVE_FLUSH_SECONDS = float(os.getenv("ARCHIVE_FLUSH_SECONDS", "1"))
+    ARCHIVE_QUEUE_SIZE = int(os.getenv("ARCHIVE_QUEUE_SIZE", "20000"))
+
+    # Orders export (CSV / Parquet)
+    EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+    # Logging
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_REDACT = os.getenv("LOG_REDACT", "true").lower() == "true"
+
 settings = Settings()
\ No newline at end of file
@@ -1,91 +1,370 @@
+import base64
+import hashlib
+import os
+import socket
 import sqlite3
 import threading
+import queue
+import random
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Any, Callable, Optional, List, Dict, Iterator, Tuple
 import json
+import re
+from functools import lru_cache
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.cache import TTLCache
+from app.core.serialization import dumps
+from app.core.metrics import DB_STATEMENT_SECONDS, DB_LOCK_WAIT_SECONDS, DB_LOCK_HELD_SECONDS
+from app.core.migrations import MIGRATIONS
+
+log = get_logger(__name__)
+
+DB_PATH = settings.DB_PATH
+
+
+class _TimedLock:
+    """threading.Lock recording wait and hold times for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired_at = time.perf_counter()
+            DB_LOCK_WAIT_SECONDS.observe(self._acquired_at - start)
+        return acquired
+
+    def release(self):
+        held = time.perf_counter() - self._acquired_at
+        self._lock.release()
+        DB_LOCK_HELD_SECONDS.observe(held)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+_lock = _TimedLock()
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+NOT\s+EXISTS)?|ON)\s+(?!ON\b)(\w+)", re.I)
+
+
+@lru_cache(maxsize=512)
+def _statement_labels(sql: str) -> Tuple[str, str]:
+    words = sql.split(None, 1)
+    operation = words[0].upper() if words else ""
+    match = _TABLE_RE.search(sql)
+    return operation, match.group(1) if match else ""
+
+
+def _observe_statement(sql: str, start: float):
+    operation, table = _statement_labels(sql)
+    DB_STATEMENT_SECONDS.observe(time.perf_counter() - start, operation=operation, table=table)
+
+
+class _TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_statement(sql, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_statement(sql, start)
+
+
+class _TimedConnection(sqlite3.Connection):
+    """Connection timing statements by type and table (conn.execute and cursors)."""
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_statement(sql, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_statement(sql, start)
 
-DB_PATH = "/var/data/picknship.db"
-_lock = threading.Lock()
 
 def _connect():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, timeout=settings.DB_BUSY_TIMEOUT_MS / 1000, factory=_TimedConnection
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={settings.DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{settings.DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={settings.DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
 
-def init_db():
-    with _lock:
-        conn = _connect()
-        c = conn.cursor()
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS stores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            store_id TEXT UNIQUE,
-            name TEXT,
-            access_token TEXT,
-            installed_at TEXT,
-            shipping_created INTEGER DEFAULT 0,
-            domain TEXT,
-            email TEXT
-        )
-        """)
-        c.execute("""
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id TEXT,
-            store_id TEXT,
-            customer_name TEXT,
-            customer_email TEXT,
-            customer_phone TEXT,
-            total REAL,
-            currency TEXT,
-            status TEXT,
-            shipping_method TEXT,
-            shipping_option TEXT,
-            shipping_address TEXT,
-            created_at TEXT,
-            updated_at TEXT,
-            UNIQUE(order_id, store_id)
-        )
-        """)
-        conn.commit()
-        conn.close()
 
-def save_store(store_id: str, access_token: str, store: Dict, shipping_created: bool = False):
-    with _lock:
-        conn = _connect()
-        c = conn.cursor()
-        now = datetime.now().isoformat()
-        c.execute("""
-        INSERT INTO stores (store_id, name, access_token, installed_at, shipping_created, domain, email)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(store_id) DO UPDATE SET
-          access_token = excluded.access_token,
-          name = excluded.name,
-          installed_at = excluded.installed_at,
-          shipping_created = excluded.shipping_created,
-          domain = excluded.domain,
-          email = excluded.email
-        """, (
-            str(store_id),
-            store.get("name", ""),
-            access_token,
-            now,
-            int(shipping_created),
-            store.get("domain", ""),
-            store.get("email", "")
-        ))
-        conn.commit()
-        conn.close()
+class _ConnectionPool:
+    """
+    Fixed-size pool of long-lived WAL connections.
+    Readers never wait on writers (WAL); writers go through `_write()`.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._guard = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._guard:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return _connect()
+            except Exception:
+                with self._guard:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._guard:
+                self._created -= 1
+
+
+_pool = _ConnectionPool(settings.DB_POOL_SIZE)
+
+
+@contextmanager
+def _connection():
+    conn = _pool.acquire()
+    try:
+        yield conn
+    finally:
+        _pool.release(conn)
+
+
+def _is_busy(e: sqlite3.OperationalError) -> bool:
+    message = str(e).lower()
+    return "locked" in message or "busy" in message
+
+
+def _begin_immediate(conn: sqlite3.Connection):
+    """BEGIN IMMEDIATE, retrying with backoff while another process holds the write lock."""
+    delay = settings.DB_WRITE_RETRY_BASE_MS / 1000
+    for attempt in range(settings.DB_WRITE_RETRIES + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt == settings.DB_WRITE_RETRIES:
+                raise
+            time.sleep(delay * (1 + random.random()))
+            delay = min(delay * 2, 1.0)
+
+
+@contextmanager
+def _write():
+    """
+    Write transaction that is safe across processes. `_lock` queues this
+    process's writers, and BEGIN IMMEDIATE takes SQLite's write lock up front,
+    so concurrent workers wait (busy_timeout plus retries) instead of failing
+    when they upgrade a read lock. Commits on exit and rolls back on error.
+    """
+    with _lock, _connection() as conn:
+        _begin_immediate(conn)
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        if conn.in_transaction:
+            conn.commit()
+
+
+def close_db():
+    """Close idle pooled connections (app shutdown)."""
+    _pool.close()
+    _store_invalidator.close()
+
+
+# --- Store records cache ---
+# Write-through from save_store/mark_shipping_created. Other processes' writes
+# are picked up by polling PRAGMA data_version and the `stores` row counter
+# in cache_versions (bumped by triggers); counter values produced by this
+# process's own writes are recorded so they don't clear the cache.
+_store_cache = TTLCache(maxsize=settings.STORE_CACHE_SIZE, ttl=settings.STORE_CACHE_TTL_SECONDS)
+_store_cache_generation = 0
+
+
+def _store_cache_write(store_id: str, store: Dict):
+    global _store_cache_generation
+    _store_cache_generation += 1
+    _store_cache.set(store_id, store)
+
+
+def _stores_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT version FROM cache_versions WHERE name = 'stores'").fetchone()
+    return row[0] if row else 0
+
+
+class _StoreCacheInvalidator:
+    def __init__(self, mode: str, interval: float):
+        self.mode = mode
+        self.interval = interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._guard = threading.Lock()
+        self._checked_at = 0.0
+        self._data_version = None
+        self._stores_version = None
+        self._local_versions: set = set()
+        self._local_lock = threading.Lock()
+
+    def record_local(self, before: int, after: int):
+        """
+        Counter values (before, after] came from a committed write of this
+        process (read inside its write transaction), already applied to the cache.
+        """
+        with self._local_lock:
+            self._local_versions.update(range(before + 1, after + 1))
+
+    def _only_local(self, old: int, new: int) -> bool:
+        with self._local_lock:
+            local = new > old and new - old <= len(self._local_versions) and all(
+                v in self._local_versions for v in range(old + 1, new + 1))
+            self._local_versions = {v for v in self._local_versions if v > new}
+        return local
+
+    def check(self):
+        if self.mode != "data_version":
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.interval or not self._guard.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            if self._conn is None:
+                self._conn = _connect()
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            stores_version = _stores_version(self._conn)
+            if (self._stores_version is not None and stores_version != self._stores_version
+                    and not self._only_local(self._stores_version, stores_version)):
+                _store_cache.clear()
+            self._stores_version = stores_version
+        except sqlite3.Error as e:
+            log.warning("Store cache invalidation check failed", error=str(e))
+            _store_cache.clear()
+        finally:
+            self._guard.release()
+
+    def close(self):
+        with self._guard:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store_invalidator = _StoreCacheInvalidator(settings.STORE_CACHE_INVALIDATION, settings.STORE_CACHE_POLL_SECONDS)
+
+_schema_ready = False
+
+
+def schema_version() -> int:
+    with _connection() as conn:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+        ).fetchone()
+        if not exists:
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def init_db():
+    """
+    Apply pending migrations (app.core.migrations). Run once at startup
+    (lifespan, CLIs). Safe with several workers starting together: an
+    up-to-date schema is detected with a plain read, and each migration
+    re-checks the version under the write lock, so only one worker applies it.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    latest = MIGRATIONS[-1][0]
+    if schema_version() < latest:
+        for version, name, apply in MIGRATIONS:
+            with _write() as conn:
+                c = conn.cursor()
+                c.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT,
+                    applied_at TEXT
+                )
+                """)
+                current = c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+                if version <= current:
+                    continue
+                apply(c)
+                c.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                          (version, name, datetime.now().isoformat()))
+                conn.commit()
+            log.info("Applied migration", version=version, name=name)
+    _schema_ready = True
 
 def save_store(store_id: str, access_token: str, store: Dict, shipping_created: bool = False) -> bool:
     """
     Guarda o actualiza una tienda.
     Devuelve True si es una tienda NUEVA, False si ya existía.
     """
-    with _lock:
-        conn = _connect()
+    with _write() as conn:
         c = conn.cursor()
 
         c.execute("SELECT 1 FROM stores WHERE store_id = ?", (str(store_id),))
         existed = c.fetchone() is not None
+        version = _stores_version(conn)
 
         now = datetime.now().isoformat()
 
@@ -109,31 +388,70 @@ def save_store(store_id: str, access_token: str, store: Dict, shipping_created:
             store.get("email", "")
         ))
 
+        new_version = _stores_version(conn)
         conn.commit()
-        conn.close()
+        _store_invalidator.record_local(version, new_version)
+        _store_cache_write(str(store_id), {
+            "store_id": str(store_id),
+            "name": store.get("name", ""),
+            "access_token": access_token,
+            "installed_at": now,
+            "shipping_created": bool(shipping_created),
+            "domain": store.get("domain", ""),
+            "email": store.get("email", "")
+        })
 
         return not existed
 
 def mark_shipping_created(store_id: str):
-    with _lock:
-        conn = _connect()
+    with _write() as conn:
         c = conn.cursor()
+        version = _stores_version(conn)
         c.execute("UPDATE stores SET shipping_created = 1 WHERE store_id = ?", (str(store_id),))
+        new_version = _stores_version(conn)
         conn.commit()
-        conn.close()
+        _store_invalidator.record_local(version, new_version)
+        cached = _store_cache.get(str(store_id))
+        if cached is not None:
+            _store_cache_write(str(store_id), {**cached, "shipping_created": True})
+
+def update_store_info(store_id: str, store: Dict):
+    """Update name/domain/email of an existing store, leaving token and flags alone."""
+    with _write() as conn:
+        version = _stores_version(conn)
+        conn.execute("UPDATE stores SET name = ?, domain = ?, email = ? WHERE store_id = ?", (
+            store.get("name", ""), store.get("domain", ""), store.get("email", ""), str(store_id),
+        ))
+        new_version = _stores_version(conn)
+        conn.commit()
+        _store_invalidator.record_local(version, new_version)
+        cached = _store_cache.get(str(store_id))
+        if cached is not None:
+            _store_cache_write(str(store_id), {
+                **cached,
+                "name": store.get("name", ""),
+                "domain": store.get("domain", ""),
+                "email": store.get("email", ""),
+            })
 
 def get_store(store_id: str) -> Optional[Dict]:
-    conn = _connect()
-    c = conn.cursor()
-    c.execute("""
-    SELECT store_id, name, access_token, installed_at, shipping_created, domain, email
-    FROM stores WHERE store_id = ?
-    """, (str(store_id),))
-    row = c.fetchone()
-    conn.close()
+    _store_invalidator.check()
+    store_id = str(store_id)
+    cached = _store_cache.get(store_id)
+    if cached is not None:
+        return dict(cached)
+
+    generation = _store_cache_generation
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+        SELECT store_id, name, access_token, installed_at, shipping_created, domain, email
+        FROM stores WHERE store_id = ?
+        """, (store_id,))
+        row = c.fetchone()
     if not row:
         return None
-    return {
+    store = {
         "store_id": row[0],
         "name": row[1],
         "access_token": row[2],
@@ -142,111 +460,240 @@ def get_store(store_id: str) -> Optional[Dict]:
         "domain": row[5],
         "email": row[6]
     }
+    # don't cache a row read concurrently with a write to it
+    if generation == _store_cache_generation:
+        _store_cache.set(store_id, store)
+    return dict(store)
 
-def list_stores() -> List[Dict]:
-    conn = _connect()
-    c = conn.cursor()
-    c.execute("""
-    SELECT store_id, name, domain, email, access_token, installed_at, shipping_created
-    FROM stores ORDER BY installed_at DESC
-    """)
-    rows = c.fetchall()
-    conn.close()
-    return [
-        {
+def list_stores_page(limit: Optional[int] = None, cursor: Optional[str] = None,
+                     include_tokens: bool = False) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Stores, most recently installed first, keyset-paginated on (installed_at, id).
+    Access tokens are only included when explicitly requested.
+    """
+    where = ""
+    params: list = []
+    if cursor:
+        installed_at, row_id = decode_cursor(cursor)
+        where = "WHERE (installed_at < ? OR (installed_at = ? AND id < ?))"
+        params.extend([installed_at, installed_at, row_id])
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+        SELECT store_id, name, domain, email, access_token, installed_at, shipping_created, id
+        FROM stores {where} ORDER BY installed_at DESC, id DESC
+        LIMIT ?
+        """, (*params, -1 if limit is None else limit + 1))
+        rows = c.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][5], rows[-1][7])
+
+    stores = []
+    for r in rows:
+        store = {
             "store_id": r[0],
             "name": r[1],
             "domain": r[2],
-            "email": r[3],     
-            "access_token": r[4],
+            "email": r[3],
             "installed_at": r[5],
             "shipping_created": bool(r[6])
-        } for r in rows
-    ]
+        }
+        if include_tokens:
+            store["access_token"] = r[4]
+        stores.append(store)
+    return stores, next_cursor
 
-def save_order_if_new(order_data: dict) -> bool:
+
+def list_stores(include_tokens: bool = True) -> List[Dict]:
+    return list_stores_page(include_tokens=include_tokens)[0]
+
+
+def iter_stores(chunk_size: int = 500, include_tokens: bool = False, limit: Optional[int] = None,
+                cursor: Optional[str] = None) -> Iterator[Dict]:
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows, cursor = list_stores_page(limit=size, cursor=cursor, include_tokens=include_tokens)
+        yield from rows
+        if remaining is not None:
+            remaining -= len(rows)
+        if cursor is None:
+            return
+
+# Fields compared between webhook deliveries (diffs, change log and content hash)
+ORDER_TRACKED_FIELDS = [
+    "customer_name", "customer_email", "customer_phone", "total", "currency", "status",
+    "shipping_method", "shipping_option", "shipping_address",
+]
+
+
+def _order_values(order_data: dict) -> Dict:
+    return {
+        "customer_name": order_data.get("customer_name", ""),
+        "customer_email": order_data.get("customer_email", ""),
+        "customer_phone": order_data.get("customer_phone", ""),
+        "total": float(order_data.get("total", 0.0)),
+        "currency": order_data.get("currency", "ARS"),
+        "status": order_data.get("status", ""),
+        "shipping_method": order_data.get("shipping_method", ""),
+        "shipping_option": order_data.get("shipping_option", ""),
+        "shipping_address": order_data.get("shipping_address", {}),
+    }
+
+
+def order_content_hash(values: Dict) -> str:
+    payload = json.dumps([values.get(k) for k in ORDER_TRACKED_FIELDS], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def upsert_order(order_data: dict) -> Dict:
     """
-    Save PickNShip order idempotently.
-    Returns True if it was a new order, False if already existed.
+    Insert or update a PickNShip order in a single transaction.
+    Returns {"is_new", "changed", "previous", "changes"} where `previous` are the
+    tracked values before the write and `changes` is {field: {"old", "new"}}.
+    Updates whose tracked fields hash to the stored content_hash are skipped.
     """
-    with _lock:
-        conn = _connect()
+    with _write() as conn:
+        result = _upsert_order(conn.cursor(), order_data, datetime.now().isoformat())
+        conn.commit()
+        return result
+
+
+def upsert_orders(orders: List[dict]) -> List[Dict]:
+    """Bulk upsert_order: all orders in one transaction, one result per order."""
+    if not orders:
+        return []
+    with _write() as conn:
         c = conn.cursor()
         now = datetime.now().isoformat()
+        results = [_upsert_order(c, order_data, now) for order_data in orders]
+        conn.commit()
+        return results
 
-        order_id = str(order_data["order_id"])
-        store_id = str(order_data["store_id"])
-
-        shipping_address = json.dumps(order_data.get("shipping_address", {}))
 
-        try:
-            c.execute("""
-            INSERT INTO orders (
-                order_id, store_id, customer_name, customer_email, customer_phone,
-                total, currency, status, shipping_method, shipping_option, shipping_address,
-                created_at, updated_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                order_id,
-                store_id,
-                order_data.get("customer_name", ""),
-                order_data.get("customer_email", ""),
-                order_data.get("customer_phone", ""),
-                float(order_data.get("total", 0.0)),
-                order_data.get("currency", "ARS"),
-                order_data.get("status", ""),
-                order_data.get("shipping_method", ""),
-                order_data.get("shipping_option", ""),
-                shipping_address,
-                order_data.get("created_at", now),
-                order_data.get("updated_at", now)
-            ))
-            conn.commit()
-            conn.close()
-            return True
-        except sqlite3.IntegrityError:
-            c.execute("""
-            UPDATE orders SET
-                customer_name = ?,
-                customer_email = ?,
-                customer_phone = ?,
-                total = ?,
-                currency = ?,
-                status = ?,
-                shipping_method = ?,
-                shipping_option = ?,
-                shipping_address = ?,
-                updated_at = ?
-            WHERE order_id = ? AND store_id = ?
-            """, (
-                order_data.get("customer_name", ""),
-                order_data.get("customer_email", ""),
-                order_data.get("customer_phone", ""),
-                float(order_data.get("total", 0.0)),
-                order_data.get("currency", "ARS"),
-                order_data.get("status", ""),
-                order_data.get("shipping_method", ""),
-                order_data.get("shipping_option", ""),
-                shipping_address,
-                order_data.get("updated_at", now),
-                order_id,
-                store_id
-            ))
-            conn.commit()
-            conn.close()
-            return False
-        
+def _upsert_order(c: sqlite3.Cursor, order_data: dict, now: str) -> Dict:
+    order_id = str(order_data["order_id"])
+    store_id = str(order_data["store_id"])
+    values = _order_values(order_data)
+    content_hash = order_content_hash(values)
+    shipping_address = json.dumps(values["shipping_address"])
 
-def get_order(order_id: str, store_id: str) -> dict:
-    conn = _connect()
-    c = conn.cursor()
     c.execute("""
         SELECT customer_name, customer_email, customer_phone, total, currency, status,
-               shipping_method, shipping_option, shipping_address, created_at, updated_at
+               shipping_method, shipping_option, shipping_address, content_hash
         FROM orders WHERE order_id = ? AND store_id = ?
-    """, (str(order_id), str(store_id)))
+    """, (order_id, store_id))
     row = c.fetchone()
-    conn.close()
+
+    if row is None:
+        c.execute("""
+        INSERT INTO orders (
+            order_id, store_id, customer_name, customer_email, customer_phone,
+            total, currency, status, shipping_method, shipping_option, shipping_address,
+            created_at, updated_at, content_hash
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            order_id,
+            store_id,
+            values["customer_name"],
+            values["customer_email"],
+            values["customer_phone"],
+            values["total"],
+            values["currency"],
+            values["status"],
+            values["shipping_method"],
+            values["shipping_option"],
+            shipping_address,
+            order_data.get("created_at") or now,
+            order_data.get("updated_at") or now,
+            content_hash
+        ))
+        return {"is_new": True, "changed": True, "previous": None, "changes": {}}
+
+    previous = dict(zip(ORDER_TRACKED_FIELDS, row[:9]))
+    previous["shipping_address"] = json.loads(previous["shipping_address"]) if previous["shipping_address"] else {}
+
+    if row[9] == content_hash:
+        return {"is_new": False, "changed": False, "previous": previous, "changes": {}}
+
+    changes = {
+        k: {"old": previous[k], "new": values[k]}
+        for k in ORDER_TRACKED_FIELDS
+        if previous[k] != values[k]
+    }
+
+    c.execute("""
+    UPDATE orders SET
+        customer_name = ?,
+        customer_email = ?,
+        customer_phone = ?,
+        total = ?,
+        currency = ?,
+        status = ?,
+        shipping_method = ?,
+        shipping_option = ?,
+        shipping_address = ?,
+        updated_at = ?,
+        content_hash = ?
+    WHERE order_id = ? AND store_id = ?
+    """, (
+        values["customer_name"],
+        values["customer_email"],
+        values["customer_phone"],
+        values["total"],
+        values["currency"],
+        values["status"],
+        values["shipping_method"],
+        values["shipping_option"],
+        shipping_address,
+        order_data.get("updated_at") or now,
+        content_hash,
+        order_id,
+        store_id
+    ))
+    c.executemany("""
+    INSERT INTO order_changes (store_id, order_id, field, old_value, new_value, changed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, [
+        (store_id, order_id, field, json.dumps(change["old"]), json.dumps(change["new"]), now)
+        for field, change in changes.items()
+    ])
+    return {"is_new": False, "changed": bool(changes), "previous": previous, "changes": changes}
+
+
+def save_order_if_new(order_data: dict) -> bool:
+    """
+    Save PickNShip order idempotently.
+    Returns True if it was a new order, False if already existed.
+    """
+    return upsert_order(order_data)["is_new"]
+
+
+def list_order_changes(order_id: str, store_id: str) -> List[Dict]:
+    with _connection() as conn:
+        rows = conn.execute("""
+            SELECT field, old_value, new_value, changed_at FROM order_changes
+            WHERE store_id = ? AND order_id = ?
+            ORDER BY id
+        """, (str(store_id), str(order_id))).fetchall()
+    return [
+        {"field": r[0], "old": json.loads(r[1]), "new": json.loads(r[2]), "changed_at": r[3]}
+        for r in rows
+    ]
+
+
+def get_order(order_id: str, store_id: str) -> dict:
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT customer_name, customer_email, customer_phone, total, currency, status,
+                   shipping_method, shipping_option, shipping_address, created_at, updated_at
+            FROM orders WHERE order_id = ? AND store_id = ?
+        """, (str(order_id), str(store_id)))
+        row = c.fetchone()
     if not row:
         return {}
     
@@ -265,19 +712,63 @@ def get_order(order_id: str, store_id: str) -> dict:
     }
 
 
-def list_orders() -> List[Dict]:
-    conn = _connect()
-    c = conn.cursor()
-    c.execute("""
-        SELECT order_id, store_id, customer_name, total, currency,
-               status, shipping_method, shipping_option,
-               shipping_address, created_at, updated_at
-        FROM orders
-        ORDER BY created_at DESC
-        LIMIT 100
-    """)
-    rows = c.fetchall()
-    conn.close()
+def encode_cursor(sort_value: Optional[str], row_id: int) -> str:
+    """Opaque keyset cursor for (sort column, id) pagination."""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int]:
+    """Inverse of encode_cursor; raises ValueError on malformed cursors."""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def list_orders_page(limit: int = 100, cursor: Optional[str] = None, store_id: Optional[str] = None,
+                     status: Optional[str] = None, created_from: Optional[str] = None,
+                     created_to: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of orders, newest first, keyset-paginated on (created_at, id).
+    Returns (orders, next_cursor); next_cursor is None on the last page.
+    """
+    where = []
+    params: list = []
+    if store_id:
+        where.append("store_id = ?")
+        params.append(str(store_id))
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if created_from:
+        where.append("created_at >= ?")
+        params.append(created_from)
+    if created_to:
+        where.append("created_at < ?")
+        params.append(created_to)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        where.append("(created_at < ? OR (created_at = ? AND id < ?))")
+        params.extend([created_at, created_at, row_id])
+
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT order_id, store_id, customer_name, total, currency,
+                   status, shipping_method, shipping_option,
+                   shipping_address, created_at, updated_at, id
+            FROM orders
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, (*params, limit + 1))
+        rows = c.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][9], rows[-1][11])
 
     return [
         {
@@ -294,4 +785,671 @@ def list_orders() -> List[Dict]:
             "updated_at": r[10],
         }
         for r in rows
-    ]
\ No newline at end of file
+    ], next_cursor
+
+
+def list_orders(limit: int = 100, **filters) -> List[Dict]:
+    return list_orders_page(limit=limit, **filters)[0]
+
+
+def iter_orders(chunk_size: int = 500, limit: Optional[int] = None, cursor: Optional[str] = None,
+                **filters) -> Iterator[Dict]:
+    """
+    Stream orders page by page without holding a connection between chunks.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        rows, cursor = list_orders_page(limit=size, cursor=cursor, **filters)
+        yield from rows
+        if remaining is not None:
+            remaining -= len(rows)
+        if cursor is None:
+            return
+
+
+EXPORT_ORDER_COLUMNS = [
+    "order_id", "store_id", "customer_name", "customer_email", "customer_phone", "total", "currency",
+    "status", "shipping_method", "shipping_option", "shipping_address", "created_at", "updated_at",
+]
+
+
+def iter_orders_snapshot(store_ids: Optional[List[str]] = None, created_from: Optional[str] = None,
+                         created_to: Optional[str] = None, chunk_size: int = 5000) -> Iterator[Tuple]:
+    """
+    Orders (EXPORT_ORDER_COLUMNS tuples, oldest first) from one consistent
+    snapshot: a single read transaction on a dedicated connection, fetched in
+    chunks. WAL readers don't block writers, and the pool isn't tied up.
+    """
+    where, params = [], []
+    if store_ids:
+        where.append(f"store_id IN ({', '.join('?' for _ in store_ids)})")
+        params.extend(str(s) for s in store_ids)
+    if created_from:
+        where.append("created_at >= ?")
+        params.append(created_from)
+    if created_to:
+        where.append("created_at < ?")
+        params.append(created_to)
+
+    conn = _connect()
+    try:
+        # a full scan through mmap would count the whole file in this process's RSS
+        conn.execute("PRAGMA mmap_size=0")
+        conn.execute("BEGIN")
+        c = conn.execute(f"""
+        SELECT {", ".join(EXPORT_ORDER_COLUMNS)} FROM orders
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY created_at, id
+        """, params)
+        while True:
+            rows = c.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        conn.close()
+
+
+def get_cached_distance(origin: str, destination: str, max_age: float) -> Optional[float]:
+    """
+    Return a cached distance (km) for a normalized origin/destination pair,
+    or None if missing or older than max_age seconds.
+    """
+    with _connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT distance_km, cached_at FROM distance_cache
+            WHERE origin = ? AND destination = ?
+        """, (origin, destination))
+        row = c.fetchone()
+    if not row or time.time() - row[1] > max_age:
+        return None
+    return row[0]
+
+
+def save_cached_distance(origin: str, destination: str, distance_km: float):
+    with _write() as conn:
+        c = conn.cursor()
+        c.execute("""
+        INSERT INTO distance_cache (origin, destination, distance_km, cached_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(origin, destination) DO UPDATE SET
+          distance_km = excluded.distance_km,
+          cached_at = excluded.cached_at
+        """, (origin, destination, distance_km, time.time()))
+        conn.commit()
+
+
+def get_cache_version(name: str) -> Optional[int]:
+    with _connection() as conn:
+        row = conn.execute("SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def load_pricing() -> Tuple[Optional[int], List[Tuple], List[Tuple]]:
+    """
+    Read all pricing bands and zones in one snapshot.
+    Returns (version, bands, zones); rows start with store_id (None = default).
+    """
+    with _connection() as conn:
+        conn.execute("BEGIN")
+        version = conn.execute("SELECT version FROM cache_versions WHERE name = 'pricing'").fetchone()
+        bands = conn.execute("""
+            SELECT store_id, min_km, max_km, max_inclusive, price, reference FROM pricing_bands
+        """).fetchall()
+        zones = conn.execute("""
+            SELECT store_id, postal_from, postal_to, price, reference FROM pricing_zones
+        """).fetchall()
+        conn.rollback()
+    return (
+        version[0] if version else None,
+        [(r[0], r[1], r[2], bool(r[3]), r[4], r[5]) for r in bands],
+        zones,
+    )
+
+
+def seed_pricing(bands: List[Tuple], zones: List[Tuple]):
+    """Write the default bands/zones, only if no pricing has ever been configured."""
+    with _write() as conn:
+        c = conn.cursor()
+        if c.execute("SELECT EXISTS(SELECT 1 FROM pricing_bands) OR EXISTS(SELECT 1 FROM pricing_zones)").fetchone()[0]:
+            return
+        c.executemany("""
+        INSERT INTO pricing_bands (store_id, min_km, max_km, max_inclusive, price, reference)
+        VALUES (NULL, ?, ?, ?, ?, ?)
+        """, [(lo, hi, int(inclusive), price, ref) for lo, hi, inclusive, price, ref in bands])
+        c.executemany("""
+        INSERT INTO pricing_zones (store_id, postal_from, postal_to, price, reference)
+        VALUES (NULL, ?, ?, ?, ?)
+        """, zones)
+        conn.commit()
+
+
+def replace_store_pricing(store_id: Optional[str], bands: List[Dict], zones: List[Dict]):
+    """
+    Replace the bands and zones of a store (None = defaults) in one transaction.
+    An empty list removes the overrides so the store falls back to the defaults.
+    """
+    store_id = str(store_id) if store_id is not None else None
+    with _write() as conn:
+        conn.execute("DELETE FROM pricing_bands WHERE store_id IS ?", (store_id,))
+        conn.execute("DELETE FROM pricing_zones WHERE store_id IS ?", (store_id,))
+        conn.executemany("""
+        INSERT INTO pricing_bands (store_id, min_km, max_km, max_inclusive, price, reference)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, [(store_id, b["min_km"], b["max_km"], int(b.get("max_inclusive", False)), b["price"], b["reference"])
+              for b in bands])
+        conn.executemany("""
+        INSERT INTO pricing_zones (store_id, postal_from, postal_to, price, reference)
+        VALUES (?, ?, ?, ?, ?)
+        """, [(store_id, int(z["postal_from"]), int(z.get("postal_to", z["postal_from"])), z["price"], z["reference"])
+              for z in zones])
+        conn.commit()
+
+
+def save_origin_geocode(origin: str, lat: float, lng: float):
+    with _write() as conn:
+        conn.execute("""
+        INSERT INTO origin_geocodes (origin, lat, lng, geocoded_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(origin) DO UPDATE SET lat = excluded.lat, lng = excluded.lng, geocoded_at = excluded.geocoded_at
+        """, (origin, lat, lng, datetime.now().isoformat()))
+        conn.commit()
+
+
+def load_origin_geocodes() -> Dict[str, Tuple[float, float]]:
+    with _connection() as conn:
+        rows = conn.execute("SELECT origin, lat, lng FROM origin_geocodes").fetchall()
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+
+def save_rate_grid_origin(store_id: str, origin_key: str, origin: str, max_origins: int) -> bool:
+    """
+    Remember a pickup origin of an installed store, unless the store already
+    has `max_origins`. Returns True if the origin is known (new or not).
+    """
+    store_id = str(store_id)
+    with _write() as conn:
+        conn.execute("""
+        INSERT OR IGNORE INTO rate_grid_origins (store_id, origin_key, origin)
+        SELECT ?, ?, ?
+        WHERE EXISTS (SELECT 1 FROM stores WHERE store_id = ?)
+          AND (SELECT COUNT(*) FROM rate_grid_origins WHERE store_id = ?) < ?
+        """, (store_id, origin_key, origin, store_id, store_id, max_origins))
+        known = conn.execute("""
+        SELECT 1 FROM rate_grid_origins WHERE store_id = ? AND origin_key = ?
+        """, (store_id, origin_key)).fetchone()
+        conn.commit()
+        return known is not None
+
+
+def list_rate_grid_origins(store_id: Optional[str] = None, built_before: Optional[float] = None) -> List[Dict]:
+    """
+    Known origins of installed stores, optionally for one store and/or only
+    those built before `built_before` (or never).
+    """
+    where, params = ["store_id IN (SELECT store_id FROM stores)"], []
+    if store_id is not None:
+        where.append("store_id = ?")
+        params.append(str(store_id))
+    if built_before is not None:
+        where.append("(built_at IS NULL OR built_at < ?)")
+        params.append(built_before)
+    with _connection() as conn:
+        rows = conn.execute(f"""
+        SELECT store_id, origin_key, origin, built_at FROM rate_grid_origins
+        WHERE {" AND ".join(where)}
+        """, params).fetchall()
+    return [{"store_id": r[0], "origin_key": r[1], "origin": r[2], "built_at": r[3]} for r in rows]
+
+
+def claim_rate_grid_build(store_id: str, origin_key: str, lease_seconds: float) -> bool:
+    """Take the build of one grid unless another worker is building it (lease not expired)."""
+    now = time.time()
+    with _write() as conn:
+        c = conn.execute("""
+        UPDATE rate_grid_origins SET building_at = ?
+        WHERE store_id = ? AND origin_key = ? AND (building_at IS NULL OR building_at < ?)
+        """, (now, str(store_id), origin_key, now - lease_seconds))
+        conn.commit()
+        return c.rowcount == 1
+
+
+def save_rate_grid(store_id: str, origin_key: str, distances: List[Tuple[str, float]]):
+    """Replace a grid's distances and release its build claim."""
+    with _write() as conn:
+        conn.execute("DELETE FROM rate_grid WHERE store_id = ? AND origin_key = ?", (str(store_id), origin_key))
+        conn.executemany("""
+        INSERT INTO rate_grid (store_id, origin_key, postal_code, distance_km) VALUES (?, ?, ?, ?)
+        """, [(str(store_id), origin_key, code, km) for code, km in distances])
+        conn.execute("""
+        UPDATE rate_grid_origins SET building_at = NULL, built_at = ?
+        WHERE store_id = ? AND origin_key = ?
+        """, (time.time(), str(store_id), origin_key))
+        conn.commit()
+
+
+def rate_grid_version() -> Optional[float]:
+    """Changes whenever any grid is rebuilt."""
+    with _connection() as conn:
+        return conn.execute("SELECT MAX(built_at) FROM rate_grid_origins").fetchone()[0]
+
+
+def load_rate_grids() -> List[Tuple[str, str, str, float]]:
+    with _connection() as conn:
+        return conn.execute("""
+        SELECT store_id, origin_key, postal_code, distance_km FROM rate_grid
+        WHERE store_id IN (SELECT store_id FROM stores)
+        ORDER BY store_id, origin_key
+        """).fetchall()
+
+
+def update_rate_limit_state(key: str, fn: Callable[[Optional[Tuple]], Tuple[Tuple, Any]]) -> Any:
+    """
+    Read-modify-write of a rate limiter bucket in one write transaction, so
+    workers sharing the DB see each other's reservations.
+    `fn(state | None) -> (new_state, result)`, state = (capacity, leak_rate, level, updated_at).
+    """
+    with _write() as conn:
+        row = conn.execute(
+            "SELECT capacity, leak_rate, level, updated_at FROM rate_limits WHERE key = ?", (key,)
+        ).fetchone()
+        state, result = fn(tuple(row) if row else None)
+        conn.execute("""
+        INSERT INTO rate_limits (key, capacity, leak_rate, level, updated_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET capacity = excluded.capacity, leak_rate = excluded.leak_rate,
+            level = excluded.level, updated_at = excluded.updated_at
+        """, (key, *state))
+        conn.commit()
+    return result
+
+
+def acquire_lease(name: str, owner: str, ttl: float) -> bool:
+    """
+    Take the named lease for `ttl` seconds, or extend it if `owner` already
+    holds it. Fails while another owner's lease hasn't expired.
+    """
+    now = time.time()
+    with _write() as conn:
+        conn.execute("""
+        INSERT INTO leases (name, owner, acquired_at, expires_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            owner = excluded.owner,
+            acquired_at = CASE WHEN leases.owner = excluded.owner THEN leases.acquired_at ELSE excluded.acquired_at END,
+            expires_at = excluded.expires_at
+        WHERE leases.owner = excluded.owner OR leases.expires_at < excluded.acquired_at
+        """, (name, owner, now, now + ttl))
+        row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+        conn.commit()
+    return row is not None and row[0] == owner
+
+
+def release_lease(name: str, owner: str):
+    with _write() as conn:
+        conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+        conn.commit()
+
+
+def get_lease(name: str) -> Optional[Dict]:
+    """The named lease if currently held (not expired), else None."""
+    with _connection() as conn:
+        row = conn.execute(
+            "SELECT owner, acquired_at, expires_at FROM leases WHERE name = ? AND expires_at >= ?",
+            (name, time.time()),
+        ).fetchone()
+    if not row:
+        return None
+    return {"owner": row[0], "acquired_at": row[1], "expires_at": row[2]}
+
+
+RECONCILE_CHECKPOINT_FIELDS = [
+    "watermark", "run_since", "run_started_at", "next_page", "status",
+    "orders_seen", "orders_saved", "last_error", "updated_at",
+]
+
+
+def get_reconcile_checkpoint(store_id: str) -> Optional[Dict]:
+    with _connection() as conn:
+        row = conn.execute(f"""
+        SELECT store_id, {", ".join(RECONCILE_CHECKPOINT_FIELDS)}
+        FROM reconcile_checkpoints WHERE store_id = ?
+        """, (str(store_id),)).fetchone()
+    return dict(zip(["store_id"] + RECONCILE_CHECKPOINT_FIELDS, row)) if row else None
+
+
+def list_reconcile_checkpoints() -> List[Dict]:
+    with _connection() as conn:
+        rows = conn.execute(f"""
+        SELECT store_id, {", ".join(RECONCILE_CHECKPOINT_FIELDS)}
+        FROM reconcile_checkpoints ORDER BY store_id
+        """).fetchall()
+    return [dict(zip(["store_id"] + RECONCILE_CHECKPOINT_FIELDS, row)) for row in rows]
+
+
+def save_reconcile_checkpoint(store_id: str, **fields):
+    """Insert or update the given checkpoint fields for a store."""
+    fields = {k: v for k, v in fields.items() if k in RECONCILE_CHECKPOINT_FIELDS}
+    fields["updated_at"] = datetime.now().isoformat()
+    columns = list(fields)
+    with _write() as conn:
+        conn.execute(f"""
+        INSERT INTO reconcile_checkpoints (store_id, {", ".join(columns)})
+        VALUES (?, {", ".join("?" for _ in columns)})
+        ON CONFLICT(store_id) DO UPDATE SET {", ".join(f"{k} = excluded.{k}" for k in columns)}
+        """, (str(store_id), *fields.values()))
+        conn.commit()
+
+
+def reset_onboarding(store_id: str, steps: Dict[str, str]):
+    """Start a fresh onboarding run: every step back to the given status, attempts cleared."""
+    now = datetime.now().isoformat()
+    with _write() as conn:
+        conn.execute("DELETE FROM onboarding_steps WHERE store_id = ?", (str(store_id),))
+        conn.executemany("""
+        INSERT INTO onboarding_steps (store_id, step, status, attempts, updated_at)
+        VALUES (?, ?, ?, 0, ?)
+        """, [(str(store_id), step, status, now) for step, status in steps.items()])
+        conn.commit()
+
+
+def set_onboarding_step(store_id: str, step: str, status: str, error: Optional[str] = None):
+    """Record a step transition; moving to 'running' counts an attempt."""
+    with _write() as conn:
+        conn.execute("""
+        INSERT INTO onboarding_steps (store_id, step, status, attempts, last_error, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(store_id, step) DO UPDATE SET
+            status = excluded.status,
+            attempts = attempts + excluded.attempts,
+            last_error = excluded.last_error,
+            updated_at = excluded.updated_at
+        """, (str(store_id), step, status, int(status == "running"), error, datetime.now().isoformat()))
+        conn.commit()
+
+
+def get_onboarding_steps(store_id: str) -> List[Dict]:
+    with _connection() as conn:
+        rows = conn.execute("""
+        SELECT step, status, attempts, last_error, updated_at
+        FROM onboarding_steps WHERE store_id = ?
+        """, (str(store_id),)).fetchall()
+    return [
+        {"step": r[0], "status": r[1], "attempts": r[2], "last_error": r[3], "updated_at": r[4]}
+        for r in rows
+    ]
+
+
+def archive_events(records: List[Tuple]):
+    """
+    Append (kind, store_id, order_id, event, received_at, body) records;
+    bodies are stored as zlib-compressed JSON.
+    """
+    level = settings.ARCHIVE_COMPRESSION_LEVEL
+    rows = [(*r[:5], zlib.compress(dumps(r[5]), level)) for r in records]
+    with _write() as conn:
+        conn.executemany("""
+        INSERT INTO event_archive (kind, store_id, order_id, event, received_at, body)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+
+
+def iter_archive(since: Optional[float] = None, until: Optional[float] = None,
+                 store_ids: Optional[List[str]] = None, path: Optional[str] = None,
+                 chunk_size: int = 5000) -> Iterator[Dict]:
+    """
+    Archived records in id (arrival) order, bodies decoded. `path` reads the
+    archive of another database file (opened read-only) instead of this one.
+    """
+    where, params = ["id > ?"], []
+    if since is not None:
+        where.append("received_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("received_at < ?")
+        params.append(until)
+    if store_ids:
+        where.append(f"store_id IN ({', '.join('?' for _ in store_ids)})")
+        params.extend(str(s) for s in store_ids)
+    sql = f"""
+    SELECT id, kind, store_id, order_id, event, received_at, body
+    FROM event_archive WHERE {" AND ".join(where)} ORDER BY id LIMIT ?
+    """
+
+    @contextmanager
+    def reader():
+        if path is None:
+            with _connection() as conn:
+                yield conn
+        else:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                yield conn
+            finally:
+                conn.close()
+
+    last_id = 0
+    while True:
+        with reader() as conn:
+            rows = conn.execute(sql, (last_id, *params, chunk_size)).fetchall()
+        for r in rows:
+            yield {
+                "id": r[0],
+                "kind": r[1],
+                "store_id": r[2],
+                "order_id": r[3],
+                "event": r[4],
+                "received_at": r[5],
+                "body": json.loads(zlib.decompress(r[6])),
+            }
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def prune_archive(before: float, batch_size: int = 5000) -> int:
+    """
+    Delete archived records received before `before` (epoch seconds), a batch
+    per write transaction so webhook writes aren't held up. Returns rows deleted.
+    """
+    deleted = 0
+    while True:
+        with _write() as conn:
+            c = conn.cursor()
+            c.execute("""
+            DELETE FROM event_archive WHERE id IN (
+                SELECT id FROM event_archive WHERE received_at < ? LIMIT ?
+            )
+            """, (before, batch_size))
+            conn.commit()
+        deleted += c.rowcount
+        if c.rowcount < batch_size:
+            return deleted
+
+
+def use_database(path: str):
+    """Point this process at another database file (CLIs), before it is used."""
+    global DB_PATH, _schema_ready
+    close_db()
+    _store_cache.clear()
+    DB_PATH = path
+    _schema_ready = False
+
+
+def enqueue_webhook_event(store_id: str, order_id: str, event: str, payload: dict) -> int:
+    with _write() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
+        c.execute("""
+        INSERT INTO webhook_queue (store_id, order_id, event, payload, status, attempts, next_attempt_at, created_at, updated_at)
+        VALUES (?, ?, ?, ?, 'pending', 0, ?, ?, ?)
+        """, (store_id, order_id, event, json.dumps(payload), time.time(), now, now))
+        conn.commit()
+        return c.lastrowid
+
+
+def claim_owner() -> str:
+    """Unique id for the rows claimed by one worker pool (host, pid and a random suffix)."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def claim_webhook_event(owner: str, lease_seconds: float) -> Optional[Dict]:
+    """
+    Atomically move the oldest ready event to 'processing', claimed by `owner`,
+    and return it. A 'processing' event whose claim wasn't renewed within
+    `lease_seconds` (its worker died) is taken over first.
+    Returns None if nothing is ready.
+    """
+    now = time.time()
+    with _write() as conn:
+        c = conn.cursor()
+        c.execute("""
+        UPDATE webhook_queue SET
+            status = 'processing', attempts = attempts + 1, claimed_by = ?, claimed_at = ?, updated_at = ?
+        WHERE id = COALESCE(
+            (SELECT id FROM webhook_queue
+             WHERE status = 'processing' AND COALESCE(claimed_at, 0) < ?
+             ORDER BY next_attempt_at, id
+             LIMIT 1),
+            (SELECT id FROM webhook_queue
+             WHERE status = 'pending' AND next_attempt_at <= ?
+             ORDER BY next_attempt_at, id
+             LIMIT 1)
+        )
+        RETURNING id, store_id, order_id, event, payload, attempts
+        """, (owner, now, datetime.now().isoformat(), now - lease_seconds, now))
+        row = c.fetchone()
+        conn.commit()
+    if not row:
+        return None
+    return {
+        "id": row[0],
+        "store_id": row[1],
+        "order_id": row[2],
+        "event": row[3],
+        "payload": json.loads(row[4]) if row[4] else {},
+        "attempts": row[5],
+    }
+
+
+def renew_webhook_claim(event_id: int, owner: str) -> bool:
+    """Heartbeat for an event being processed. False if `owner` no longer holds it."""
+    with _write() as conn:
+        c = conn.cursor()
+        c.execute("""
+        UPDATE webhook_queue SET claimed_at = ?
+        WHERE id = ? AND status = 'processing' AND claimed_by = ?
+        """, (time.time(), event_id, owner))
+        conn.commit()
+        return c.rowcount > 0
+
+
+def complete_webhook_event(event_id: int, owner: str):
+    with _write() as conn:
+        conn.execute("DELETE FROM webhook_queue WHERE id = ? AND claimed_by = ?", (event_id, owner))
+        conn.commit()
+
+
+def fail_webhook_event(event_id: int, owner: str, error: str, retry_at: Optional[float]):
+    """
+    Record a failed attempt. retry_at=None marks the event as dead.
+    """
+    with _write() as conn:
+        conn.execute("""
+        UPDATE webhook_queue SET
+            status = ?,
+            next_attempt_at = COALESCE(?, next_attempt_at),
+            last_error = ?,
+            claimed_by = NULL,
+            claimed_at = NULL,
+            updated_at = ?
+        WHERE id = ? AND claimed_by = ?
+        """, ("pending" if retry_at is not None else "dead", retry_at, error, datetime.now().isoformat(),
+              event_id, owner))
+        conn.commit()
+
+
+def webhook_queue_stats() -> Dict[str, int]:
+    with _connection() as conn:
+        rows = conn.execute("SELECT status, COUNT(*) FROM webhook_queue GROUP BY status").fetchall()
+    return {status: count for status, count in rows}
+
+
+def enqueue_notification(channel: str, kind: str, payload: dict,
+                         coalesce_key: Optional[str] = None, delay: float = 0.0) -> int:
+    with _write() as conn:
+        c = conn.cursor()
+        now = time.time()
+        c.execute("""
+        INSERT INTO notification_outbox (channel, kind, coalesce_key, payload, status, attempts, next_attempt_at, created_at)
+        VALUES (?, ?, ?, ?, 'pending', 0, ?, ?)
+        """, (channel, kind, coalesce_key, json.dumps(payload), now + delay, now))
+        conn.commit()
+        return c.lastrowid
+
+
+def claim_notifications(owner: str, lease_seconds: float) -> List[Dict]:
+    """
+    Claim the oldest ready notification plus every pending notification sharing
+    its coalesce_key, so they can be sent as a single message. Rows left
+    'processing' by a sender that claimed them more than `lease_seconds` ago
+    (it died) count as ready.
+    Returns the claimed rows oldest first, or [] if nothing is ready.
+    """
+    now = time.time()
+    expired = now - lease_seconds
+    with _write() as conn:
+        c = conn.cursor()
+        c.execute("""
+        SELECT id, coalesce_key FROM notification_outbox
+        WHERE (status = 'pending' AND next_attempt_at <= ?)
+           OR (status = 'processing' AND COALESCE(claimed_at, 0) < ?)
+        ORDER BY next_attempt_at, id
+        LIMIT 1
+        """, (now, expired))
+        head = c.fetchone()
+        if not head:
+            return []
+        c.execute("""
+        UPDATE notification_outbox SET status = 'processing', attempts = attempts + 1, claimed_by = ?, claimed_at = ?
+        WHERE id = ? OR (? IS NOT NULL AND coalesce_key = ? AND (
+            status = 'pending' OR (status = 'processing' AND COALESCE(claimed_at, 0) < ?)
+        ))
+        RETURNING id, channel, kind, payload, attempts, created_at
+        """, (owner, now, head[0], head[1], head[1], expired))
+        rows = c.fetchall()
+        conn.commit()
+    rows.sort(key=lambda r: r[0])
+    return [
+        {
+            "id": r[0],
+            "channel": r[1],
+            "kind": r[2],
+            "payload": json.loads(r[3]),
+            "attempts": r[4],
+            "created_at": r[5],
+        }
+        for r in rows
+    ]
+
+
+def complete_notifications(ids: List[int], owner: str):
+    with _write() as conn:
+        conn.executemany("DELETE FROM notification_outbox WHERE id = ? AND claimed_by = ?",
+                         [(i, owner) for i in ids])
+        conn.commit()
+
+
+def fail_notifications(ids: List[int], owner: str, error: str, retry_at: Optional[float]):
+    """Record a failed send. retry_at=None marks the notifications as dead."""
+    with _write() as conn:
+        conn.executemany("""
+        UPDATE notification_outbox SET
+            status = ?,
+            next_attempt_at = COALESCE(?, next_attempt_at),
+            last_error = ?,
+            claimed_by = NULL,
+            claimed_at = NULL
+        WHERE id = ? AND claimed_by = ?
+        """, [("pending" if retry_at is not None else "dead", retry_at, error, i, owner) for i in ids])
+        conn.commit()
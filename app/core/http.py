@@ -0,0 +1,86 @@
+import httpx
+import time
+from typing import Dict
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_REQUEST_SECONDS
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Per-upstream timeouts (seconds)
+UPSTREAM_TIMEOUTS = {
+    "tiendanube": settings.TIENDANUBE_TIMEOUT,
+    "google": settings.GOOGLE_MAPS_TIMEOUT,
+    "slack": settings.SLACK_TIMEOUT,
+}
+
+
+class _InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Records per-upstream call latency and status (or error type) for /metrics."""
+
+    def __init__(self, upstream: str, **kwargs):
+        super().__init__(**kwargs)
+        self.upstream = upstream
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await super().handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            UPSTREAM_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, upstream=self.upstream, method=request.method, status=status
+            )
+
+
+class HTTPClients:
+    """
+    Registry of shared keep-alive httpx clients, one pool per upstream.
+    Opened/closed from the FastAPI lifespan; falls back to lazily creating
+    the client when used outside the app (scripts, one-off jobs).
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        transport = _InstrumentedTransport(
+            name, limits=limits, http2=settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+        )
+        return httpx.AsyncClient(timeout=httpx.Timeout(UPSTREAM_TIMEOUTS[name]), transport=transport)
+
+    async def start(self):
+        for name in UPSTREAM_TIMEOUTS:
+            if name not in self._clients or self._clients[name].is_closed:
+                self._clients[name] = self._build(name)
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def mount(self, name: str, transport: httpx.AsyncBaseTransport):
+        """Serve `name` through `transport` from now on (replay, benchmarks)."""
+        self._clients[name] = httpx.AsyncClient(timeout=httpx.Timeout(UPSTREAM_TIMEOUTS[name]), transport=transport)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+
+http_clients = HTTPClients()
@@ -0,0 +1,36 @@
+import time
+from typing import Dict, Optional
+from app.core import async_db, db
+
+
+class Lease:
+    """
+    Named lease in the `leases` table, held by at most one process sharing
+    the DB (WORKERS=N, several instances). The holder renews it; if it dies,
+    another process takes over once `ttl` has passed.
+    """
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.owner = db.claim_owner()
+        self._renewed_at: Optional[float] = None
+
+    async def acquire(self) -> bool:
+        """Take or renew the lease. True if this process holds it."""
+        held = await async_db.run_db(db.acquire_lease, self.name, self.owner, self.ttl)
+        self._renewed_at = time.monotonic() if held else None
+        return held
+
+    async def keep(self) -> bool:
+        """acquire(), but at most every ttl/3 while held; cheap to call on every loop iteration."""
+        if self._renewed_at is not None and time.monotonic() - self._renewed_at < self.ttl / 3:
+            return True
+        return await self.acquire()
+
+    async def release(self):
+        self._renewed_at = None
+        await async_db.run_db(db.release_lease, self.name, self.owner)
+
+    async def holder(self) -> Optional[Dict]:
+        return await async_db.run_db(db.get_lease, self.name)
@@ -0,0 +1,168 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Any, Optional
+from app.core.config import settings
+from app.core.serialization import dumps
+
+# Keys whose values never reach the logs (tokens, customer data)
+REDACTED = "[REDACTED]"
+SENSITIVE_KEYS = {
+    "access_token", "token", "client_secret", "authorization", "api_key",
+    "customer", "customer_name", "customer_email", "customer_phone", "email", "phone", "identification",
+    "address", "shipping_address", "billing_address", "destination",
+    "contact_name", "contact_email", "contact_phone",
+}
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_BEARER_RE = re.compile(r"(?i)\b(bearer)\s+[\w.~+/-]+=*")
+
+_RESERVED = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+
+def redact(value: Any, key: Optional[str] = None) -> Any:
+    """Copy of `value` with sensitive keys (recursively) and inline emails/bearer tokens masked."""
+    if key is not None and key.lower() in SENSITIVE_KEYS and value not in (None, "", {}, []):
+        return REDACTED
+    if isinstance(value, dict):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return _BEARER_RE.sub(r"\1 " + REDACTED, _EMAIL_RE.sub(REDACTED, value))
+    return value
+
+
+class StructLogger(logging.LoggerAdapter):
+    """
+    Logger taking structured fields as keyword arguments:
+
+        log.info("Order saved", order_id=order_id, is_new=True)
+    """
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in _RESERVED}
+        if fields:
+            kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(logging.getLogger(name), {})
+
+
+class RedactionFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = redact(fields)
+        record.msg = redact(record.getMessage())
+        record.args = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps DEBUG records with probability `rate`; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        try:
+            return dumps(entry).decode()
+        except TypeError:
+            return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Non-blocking: records are dropped (and counted) when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting happens on the listener thread; only resolve what can't cross it
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _QueueHandler.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging():
+    """
+    Route the `app` loggers through a bounded queue to a stdout writer thread.
+    Idempotent; call stop_logging() on shutdown to flush.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    if settings.LOG_REDACT:
+        # runs on the listener thread, off the request path
+        output.addFilter(RedactionFilter())
+
+    handler = _QueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger("app")
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
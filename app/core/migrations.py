@@ -0,0 +1,276 @@
+"""
+Ordered schema migrations, applied by db.init_db().
+
+Each migration runs once, in its own write transaction, and is recorded in
+`schema_version`. Statements stay idempotent (IF NOT EXISTS, column checks)
+so databases created before versioning upgrade cleanly. Append new
+migrations at the end; never edit or renumber applied ones.
+"""
+import sqlite3
+from typing import Callable, List, Tuple
+
+
+def _initial_schema(c: sqlite3.Cursor):
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS stores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id TEXT UNIQUE,
+        name TEXT,
+        access_token TEXT,
+        installed_at TEXT,
+        shipping_created INTEGER DEFAULT 0,
+        domain TEXT,
+        email TEXT
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id TEXT,
+        store_id TEXT,
+        customer_name TEXT,
+        customer_email TEXT,
+        customer_phone TEXT,
+        total REAL,
+        currency TEXT,
+        status TEXT,
+        shipping_method TEXT,
+        shipping_option TEXT,
+        shipping_address TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        content_hash TEXT,
+        UNIQUE(order_id, store_id)
+    )
+    """)
+    columns = {r[1] for r in c.execute("PRAGMA table_info(orders)").fetchall()}
+    if "content_hash" not in columns:
+        c.execute("ALTER TABLE orders ADD COLUMN content_hash TEXT")
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS order_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id TEXT,
+        order_id TEXT,
+        field TEXT,
+        old_value TEXT,
+        new_value TEXT,
+        changed_at TEXT
+    )
+    """)
+
+    # Change counters for the in-process caches (bumped by triggers)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS cache_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    c.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('stores', 0)")
+    c.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('pricing', 0)")
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS pricing_bands (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id TEXT,
+        min_km REAL NOT NULL,
+        max_km REAL NOT NULL,
+        max_inclusive INTEGER DEFAULT 0,
+        price REAL NOT NULL,
+        reference TEXT NOT NULL
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS pricing_zones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id TEXT,
+        postal_from INTEGER NOT NULL,
+        postal_to INTEGER NOT NULL,
+        price REAL NOT NULL,
+        reference TEXT NOT NULL
+    )
+    """)
+    for table, name in (("stores", "stores"), ("pricing_bands", "pricing"), ("pricing_zones", "pricing")):
+        for op in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_version_{op.lower()} AFTER {op} ON {table}
+            BEGIN
+                UPDATE cache_versions SET version = version + 1 WHERE name = '{name}';
+            END
+            """)
+
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS distance_cache (
+        origin TEXT,
+        destination TEXT,
+        distance_km REAL,
+        cached_at REAL,
+        PRIMARY KEY (origin, destination)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS origin_geocodes (
+        origin TEXT PRIMARY KEY,
+        lat REAL,
+        lng REAL,
+        geocoded_at TEXT
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS webhook_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        store_id TEXT,
+        order_id TEXT,
+        event TEXT,
+        payload TEXT,
+        status TEXT DEFAULT 'pending',
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        created_at TEXT,
+        updated_at TEXT
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS notification_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT,
+        kind TEXT,
+        coalesce_key TEXT,
+        payload TEXT,
+        status TEXT DEFAULT 'pending',
+        attempts INTEGER DEFAULT 0,
+        next_attempt_at REAL,
+        last_error TEXT,
+        created_at REAL
+    )
+    """)
+    # Client-side rate limiter buckets shared between workers
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        capacity REAL,
+        leak_rate REAL,
+        level REAL,
+        updated_at REAL
+    )
+    """)
+    # Per-store progress of the orders reconciliation job
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS reconcile_checkpoints (
+        store_id TEXT PRIMARY KEY,
+        watermark TEXT,
+        run_since TEXT,
+        run_started_at TEXT,
+        next_page INTEGER DEFAULT 1,
+        status TEXT,
+        orders_seen INTEGER DEFAULT 0,
+        orders_saved INTEGER DEFAULT 0,
+        last_error TEXT,
+        updated_at TEXT
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS onboarding_steps (
+        store_id TEXT NOT NULL,
+        step TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        last_error TEXT,
+        updated_at TEXT,
+        PRIMARY KEY (store_id, step)
+    )
+    """)
+    # Append-only archive of raw webhook payloads and fetched orders (zlib JSON)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS event_archive (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        store_id TEXT,
+        order_id TEXT,
+        event TEXT,
+        received_at REAL NOT NULL,
+        body BLOB NOT NULL
+    )
+    """)
+
+
+def _query_indexes(c: sqlite3.Cursor):
+    # keyset pagination needs a non-NULL created_at
+    c.execute("UPDATE orders SET created_at = COALESCE(updated_at, '') WHERE created_at IS NULL")
+    # /orders listing: newest first, optionally by store and/or status
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_store_created ON orders (store_id, created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_orders_store_status_created ON orders (store_id, status, created_at, id)")
+    # /stores listing: newest installs first
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stores_installed ON stores (installed_at, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_order_changes_order ON order_changes (store_id, order_id)")
+    # queue claims: oldest ready row
+    c.execute("CREATE INDEX IF NOT EXISTS idx_webhook_queue_ready ON webhook_queue (status, next_attempt_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_ready ON notification_outbox (status, next_attempt_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notification_outbox_key ON notification_outbox (coalesce_key, status)")
+    # replay: by time window, optionally per store
+    c.execute("CREATE INDEX IF NOT EXISTS idx_event_archive_received ON event_archive (received_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_event_archive_store ON event_archive (store_id, received_at)")
+
+
+def _rate_grid(c: sqlite3.Cursor):
+    # Pickup origins seen per store, and their precomputed road distance per postal code
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS rate_grid_origins (
+        store_id TEXT NOT NULL,
+        origin_key TEXT NOT NULL,
+        origin TEXT NOT NULL,
+        built_at REAL,
+        building_at REAL,
+        PRIMARY KEY (store_id, origin_key)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS rate_grid (
+        store_id TEXT NOT NULL,
+        origin_key TEXT NOT NULL,
+        postal_code TEXT NOT NULL,
+        distance_km REAL NOT NULL,
+        PRIMARY KEY (store_id, origin_key, postal_code)
+    ) WITHOUT ROWID
+    """)
+
+
+def _webhook_queue_claims(c: sqlite3.Cursor):
+    # owner + heartbeat of 'processing' rows, so only expired claims are taken over
+    columns = {r[1] for r in c.execute("PRAGMA table_info(webhook_queue)").fetchall()}
+    if "claimed_by" not in columns:
+        c.execute("ALTER TABLE webhook_queue ADD COLUMN claimed_by TEXT")
+    if "claimed_at" not in columns:
+        c.execute("ALTER TABLE webhook_queue ADD COLUMN claimed_at REAL")
+
+
+def _notification_outbox_claims(c: sqlite3.Cursor):
+    columns = {r[1] for r in c.execute("PRAGMA table_info(notification_outbox)").fetchall()}
+    if "claimed_by" not in columns:
+        c.execute("ALTER TABLE notification_outbox ADD COLUMN claimed_by TEXT")
+    if "claimed_at" not in columns:
+        c.execute("ALTER TABLE notification_outbox ADD COLUMN claimed_at REAL")
+
+
+def _leases(c: sqlite3.Cursor):
+    # Named leases for jobs that must run in one worker process at a time
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        acquired_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+
+
+# (version, name, apply)
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "initial schema", _initial_schema),
+    (2, "query indexes", _query_indexes),
+    (3, "rate grid", _rate_grid),
+    (4, "webhook queue claims", _webhook_queue_claims),
+    (5, "notification outbox claims", _notification_outbox_claims),
+    (6, "leases", _leases),
+]
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple
+from app.core import async_db, db
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import RATE_LIMIT_WAIT_SECONDS, RATE_LIMIT_THROTTLED
+
+log = get_logger(__name__)
+
+# (capacity, leak_rate per second, level, updated_at)
+BucketState = Tuple[float, float, float, float]
+
+
+def _leaked(state: BucketState, now: float) -> BucketState:
+    capacity, rate, level, updated_at = state
+    return capacity, rate, max(0.0, level - max(0.0, now - updated_at) * rate), now
+
+
+def reserve(state: BucketState, now: float) -> Tuple[BucketState, float]:
+    """
+    Take one slot from a leaky bucket. Returns the new state and 0 when the
+    call may go now, or the seconds to wait before trying again.
+    """
+    capacity, rate, level, _ = state = _leaked(state, now)
+    if level + 1 <= capacity:
+        return (capacity, rate, level + 1, now), 0.0
+    return state, (level + 1 - capacity) / rate
+
+
+def merge(state: BucketState, now: float, capacity: float, rate: float, level: float) -> BucketState:
+    """
+    Fold in what the server reported. The local level is kept when higher:
+    responses arrive out of order and calls reserved since aren't counted yet.
+    """
+    _, _, local_level, _ = _leaked(state, now)
+    return capacity, rate, max(local_level, level), now
+
+
+def parse_headers(headers: Mapping[str, str]) -> Optional[Tuple[float, float, float]]:
+    """
+    x-rate-limit-limit/-remaining/-reset -> (capacity, leak rate, level).
+    Reset is the time in ms until the bucket is empty, so rate = level / reset.
+    """
+    try:
+        capacity = float(headers["x-rate-limit-limit"])
+        remaining = float(headers["x-rate-limit-remaining"])
+    except (KeyError, ValueError):
+        return None
+    level = max(0.0, capacity - remaining)
+    rate = settings.TIENDANUBE_RATE_LIMIT_PER_SECOND
+    try:
+        reset_s = float(headers.get("x-rate-limit-reset", "")) / 1000
+    except ValueError:
+        reset_s = 0.0
+    if level > 0 and reset_s > 0:
+        rate = level / reset_s
+    return capacity, rate, level
+
+
+class _MemoryBuckets:
+    """Bucket state for this process only."""
+
+    def __init__(self):
+        self._states: Dict[str, BucketState] = {}
+
+    async def apply(self, key: str, fn: Callable[[Optional[BucketState]], Tuple[BucketState, float]]) -> float:
+        self._states[key], result = fn(self._states.get(key))
+        return result
+
+
+class _SQLiteBuckets:
+    """Bucket state in the `rate_limits` table, shared by every worker using the DB."""
+
+    async def apply(self, key: str, fn: Callable[[Optional[BucketState]], Tuple[BucketState, float]]) -> float:
+        return await async_db.run_db(db.update_rate_limit_state, key, fn)
+
+
+class StoreRateLimiter:
+    """
+    Client-side leaky bucket per store, tuned from the x-rate-limit-* headers.
+    Calls over the quota wait (FIFO per store) instead of failing; a 429 fills
+    the bucket until the reported reset.
+    """
+
+    def __init__(self, backend: str = "memory"):
+        self._buckets = _SQLiteBuckets() if backend == "sqlite" else _MemoryBuckets()
+        self._queues: Dict[str, asyncio.Lock] = {}
+
+    def _default(self, now: float) -> BucketState:
+        return (float(settings.TIENDANUBE_RATE_LIMIT_CAPACITY), settings.TIENDANUBE_RATE_LIMIT_PER_SECOND, 0.0, now)
+
+    async def acquire(self, store_id: str):
+        key = str(store_id)
+        queue = self._queues.setdefault(key, asyncio.Lock())
+        start = time.perf_counter()
+        async with queue:
+            while True:
+                now = time.time()
+                wait = await self._buckets.apply(key, lambda s: reserve(s or self._default(now), now))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+        RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - start, upstream="tiendanube")
+
+    async def observe(self, store_id: str, headers: Mapping[str, str]):
+        reported = parse_headers(headers)
+        if reported is None:
+            return
+        now = time.time()
+        await self._buckets.apply(str(store_id), lambda s: (merge(s or self._default(now), now, *reported), 0.0))
+
+    async def throttled(self, store_id: str, headers: Mapping[str, str]):
+        """429: mark the bucket full until the server says it drains."""
+        RATE_LIMIT_THROTTLED.inc(upstream="tiendanube")
+        now = time.time()
+        reported = parse_headers(headers)
+        try:
+            retry_after = float(headers.get("retry-after", ""))
+        except ValueError:
+            retry_after = 0.0
+
+        def fill(state: Optional[BucketState]) -> Tuple[BucketState, float]:
+            state = state or self._default(now)
+            capacity, rate = reported[:2] if reported is not None else state[:2]
+            wait = max(retry_after, 1 / rate)
+            # level such that the next reserve() waits `wait` seconds
+            return merge(state, now, capacity, rate, capacity - 1 + wait * rate), wait
+
+        wait = await self._buckets.apply(str(store_id), fill)
+        log.warning("TiendaNube rate limit hit", store_id=store_id, retry_in=round(wait, 3))
+
+
+tiendanube_limiter = StoreRateLimiter(settings.TIENDANUBE_RATE_LIMIT_BACKEND)
@@ -0,0 +1,20 @@
+import json
+from typing import Any, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def ndjson_lines(rows: Iterable[Any]) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON."""
+    for row in rows:
+        yield dumps(row) + b"\n"
@@ -1,10 +1,60 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import auth, webhook, stores, rates, success, orders
+from app.api import auth, webhook, stores, rates, success, orders, pricing, metrics, reconcile
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from app.core.http import http_clients
+from app.core.db import init_db, close_db
+from app.core import async_db
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware
+from app.core.log import setup_logging, stop_logging
+from app.services.webhook_queue import webhook_workers
+from app.services.slack.outbox import slack_dispatcher
+from app.api.rates import local_estimator, distance_batcher
+from app.services.rate_grid import rate_grid
+from app.services.pricing import pricing_engine
+from app.services.reconcile import reconcile_job
+from app.services.onboarding import onboarding
+from app.services.archive import event_archive
 
 
-app = FastAPI(title="Pick'NShip API")
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    await async_db.run_db(init_db)
+    await http_clients.start()
+    await async_db.run_db(local_estimator.load_origin_geocodes)
+    await pricing_engine.start()
+    await rate_grid.start()
+    await event_archive.start()
+    if settings.WEBHOOK_QUEUE_ENABLED:
+        await webhook_workers.start()
+    if settings.SLACK_OUTBOX_ENABLED:
+        await slack_dispatcher.start()
+    try:
+        yield
+    finally:
+        await reconcile_job.stop()
+        await onboarding.stop()
+        await webhook_workers.stop()
+        await slack_dispatcher.stop()
+        await event_archive.stop()
+        await rate_grid.stop()
+        await distance_batcher.stop()
+        await local_estimator.stop()
+        await pricing_engine.stop()
+        await http_clients.close()
+        async_db.shutdown()
+        close_db()
+        stop_logging()
+
+
+app = FastAPI(title="Pick'NShip API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -17,6 +67,9 @@ app.include_router(webhook.router)
 app.include_router(stores.router)
 app.include_router(rates.router)
 app.include_router(orders.router)
+app.include_router(pricing.router)
+app.include_router(metrics.router)
+app.include_router(reconcile.router)
 
 @app.get("/")
 def home():
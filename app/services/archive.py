@@ -0,0 +1,92 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+from app.core import async_db
+from app.core.config import settings
+from app.core.log import get_logger
+from app.core.metrics import ARCHIVE_RECORDS
+
+log = get_logger(__name__)
+
+
+class EventArchive:
+    """
+    Buffers raw webhook payloads ("webhook") and fetched TiendaNube orders
+    ("order") and appends them to `event_archive` in batches, off the request
+    path. When the buffer is full new records are dropped (and counted).
+    Records older than ARCHIVE_RETENTION_DAYS are pruned every
+    ARCHIVE_PRUNE_SECONDS (also with the archive disabled, to clear old data).
+    """
+
+    def __init__(self):
+        self._buffer: List[Tuple] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._pruned_at = 0.0
+
+    def record(self, kind: str, store_id, order_id, event: Optional[str], body):
+        if not settings.ARCHIVE_ENABLED:
+            return
+        if len(self._buffer) >= settings.ARCHIVE_QUEUE_SIZE:
+            ARCHIVE_RECORDS.inc(kind=kind, result="dropped")
+            return
+        self._buffer.append((kind, str(store_id), str(order_id), event, time.time(), body))
+        if len(self._buffer) >= settings.ARCHIVE_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.ARCHIVE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            if time.monotonic() - self._pruned_at >= settings.ARCHIVE_PRUNE_SECONDS:
+                self._pruned_at = time.monotonic()
+                await self.prune()
+
+    async def prune(self) -> int:
+        if settings.ARCHIVE_RETENTION_DAYS <= 0:
+            return 0
+        try:
+            deleted = await async_db.prune_archive(time.time() - settings.ARCHIVE_RETENTION_DAYS * 86400)
+        except Exception as e:
+            log.warning("Archive pruning failed", error=str(e))
+            return 0
+        if deleted:
+            log.info("Pruned archived events", deleted=deleted, retention_days=settings.ARCHIVE_RETENTION_DAYS)
+        return deleted
+
+    async def flush(self):
+        while self._buffer:
+            batch = self._buffer[:settings.ARCHIVE_BATCH_SIZE]
+            del self._buffer[:len(batch)]
+            try:
+                await async_db.archive_events(batch)
+            except Exception as e:
+                log.warning("Archive write failed, records dropped", records=len(batch), error=str(e))
+                result = "dropped"
+            else:
+                result = "written"
+            for kind in ("webhook", "order"):
+                count = sum(1 for r in batch if r[0] == kind)
+                if count:
+                    ARCHIVE_RECORDS.inc(count, kind=kind, result=result)
+
+
+event_archive = EventArchive()
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.core.db import EXPORT_ORDER_COLUMNS, iter_orders_snapshot
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# TiendaNube shipping_address keys exported as shipping_address_<key> columns
+ADDRESS_FIELDS = ("name", "address", "number", "floor", "locality", "city", "province", "zipcode", "country", "phone")
+
+_ADDRESS_INDEX = EXPORT_ORDER_COLUMNS.index("shipping_address")
+COLUMNS = (
+    EXPORT_ORDER_COLUMNS[:_ADDRESS_INDEX]
+    + [f"shipping_address_{f}" for f in ADDRESS_FIELDS]
+    + EXPORT_ORDER_COLUMNS[_ADDRESS_INDEX + 1:]
+)
+
+
+def flatten(row: Tuple) -> List:
+    """Orders row -> export row, with the shipping_address JSON spread over columns."""
+    try:
+        address = json.loads(row[_ADDRESS_INDEX]) if row[_ADDRESS_INDEX] else {}
+    except ValueError:
+        address = {}
+    if not isinstance(address, dict):
+        address = {}
+    return [
+        *row[:_ADDRESS_INDEX],
+        *(address.get(f) for f in ADDRESS_FIELDS),
+        *row[_ADDRESS_INDEX + 1:],
+    ]
+
+
+def _chunks(rows: Iterable[Tuple], size: int) -> Iterator[List[List]]:
+    chunk = []
+    for row in rows:
+        chunk.append(flatten(row))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_stream(rows: Iterable[Tuple], chunk_size: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Sink:
+    """Write-only file object the Parquet writer fills and the stream drains."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _parquet_schema():
+    types = {"total": pa.float64()}
+    return pa.schema([(name, types.get(name, pa.string())) for name in COLUMNS])
+
+
+def parquet_stream(rows: Iterable[Tuple], chunk_size: int) -> Iterator[bytes]:
+    """One row group per chunk; bytes are yielded as each row group is written."""
+    schema = _parquet_schema()
+    sink = _Sink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.record_batch(
+                [pa.array([None if v is None else str(v) for v in col]) if field.type == pa.string()
+                 else pa.array(col, type=field.type)
+                 for field, col in zip(schema, columns)],
+                schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_orders(format: str = "csv", store_ids: Optional[List[str]] = None, created_from: Optional[str] = None,
+                  created_to: Optional[str] = None, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Orders matching the filters as a stream of CSV or Parquet bytes, read
+    from a single snapshot. Memory is bounded by `chunk_size` rows.
+    """
+    if format == "parquet" and not PARQUET_AVAILABLE:
+        raise ValueError("Parquet export needs pyarrow installed")
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = iter_orders_snapshot(store_ids=store_ids, created_from=created_from, created_to=created_to,
+                                chunk_size=chunk_size)
+    stream = parquet_stream if format == "parquet" else csv_stream
+    return stream(rows, chunk_size)
@@ -1,11 +1,24 @@
+from app.core import async_db
+from app.core.config import settings
 from app.services.slack.stores import notify_store_installed as slack_store_installed
 from app.services.slack import orders as slack_orders
+from app.services.slack.outbox import slack_dispatcher, order_key
 
 
 async def notify_new_store(store: dict):
     """
     Orquesta notificación de nueva tienda
     """
+    if settings.SLACK_OUTBOX_ENABLED:
+        await async_db.enqueue_notification("stores", "store_installed", {
+            "store_id": store["store_id"],
+            "store_name": store.get("name"),
+            "domain": store.get("domain"),
+            "email": store.get("email"),
+        })
+        slack_dispatcher.wake()
+        return
+
     await slack_store_installed(
         store_id=store["store_id"],
         store_name=store.get("name"),
@@ -14,7 +27,19 @@ async def notify_new_store(store: dict):
     )
 
 async def notify_order_created(order_data: dict):
+    if settings.SLACK_OUTBOX_ENABLED:
+        await async_db.enqueue_notification("orders", "order_created", order_data)
+        slack_dispatcher.wake()
+        return
     await slack_orders.notify_order_created(order_data)
 
 async def notify_order_updated(order_diff: dict):
-    await slack_orders.notify_order_updated(order_diff)
\ No newline at end of file
+    if settings.SLACK_OUTBOX_ENABLED:
+        # Updates to the same order within the window are sent as one message
+        await async_db.enqueue_notification(
+            "orders", "order_updated", order_diff,
+            coalesce_key=order_key(order_diff["store_id"], order_diff["order_id"]),
+            delay=settings.SLACK_COALESCE_WINDOW_SECONDS,
+        )
+        return
+    await slack_orders.notify_order_updated(order_diff)
@@ -0,0 +1,187 @@
+import asyncio
+from typing import Awaitable, Callable, Dict
+from app.services.rate_grid import rate_grid
+from app.core import async_db
+from app.core.log import get_logger
+from app.services import tiendanube
+from app.services.notifier import notify_new_store
+
+log = get_logger(__name__)
+
+# store_info, shipping_method, webhooks and rate_grid are independent and run
+# concurrently; notify waits for store_info (it needs the store name).
+# The store is marked shipping_created once shipping_method and webhooks are done.
+STEPS = ("store_info", "shipping_method", "webhooks", "rate_grid", "notify")
+FINISHED = ("done", "skipped")
+
+
+def store_data_from_info(store_info: Dict) -> Dict:
+    name = store_info.get("name") or {}
+    return {
+        "name": name.get("es") or name.get("en") or "",
+        "domain": store_info.get("url_with_protocol", ""),
+        "email": store_info.get("email", ""),
+    }
+
+
+class OnboardingPipeline:
+    """
+    Post-install setup per store, run in the background after the OAuth
+    redirect. Each step's status is stored in `onboarding_steps`, so a retry
+    only runs the steps that haven't finished.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._steps: Dict[str, Dict[str, asyncio.Task]] = {}
+        # set once a run has registered its step tasks in `_steps` (or ended)
+        self._registered: Dict[str, asyncio.Event] = {}
+
+    def running(self, store_id: str) -> bool:
+        task = self._tasks.get(str(store_id))
+        return task is not None and not task.done()
+
+    async def begin(self, store_id: str, access_token: str, is_new: bool) -> asyncio.Task:
+        """Fresh run after an install: every step pending (notify only for new stores)."""
+        steps = {step: "pending" for step in STEPS}
+        if not is_new:
+            steps["notify"] = "skipped"
+        await async_db.reset_onboarding(store_id, steps)
+        return self.start(store_id, access_token)
+
+    def start(self, store_id: str, access_token: str) -> asyncio.Task:
+        """Run the unfinished steps in the background; no-op if already running for the store."""
+        store_id = str(store_id)
+        if self.running(store_id):
+            return self._tasks[store_id]
+        self._registered[store_id] = asyncio.Event()
+        task = asyncio.create_task(self._run(store_id, access_token))
+        self._tasks[store_id] = task
+        task.add_done_callback(lambda t: self._forget(store_id, t))
+        return task
+
+    def _forget(self, store_id: str, task: asyncio.Task):
+        if self._tasks.get(store_id) is task:
+            self._tasks.pop(store_id, None)
+            self._steps.pop(store_id, None)
+            registered = self._registered.pop(store_id, None)
+            if registered is not None:
+                registered.set()
+
+    async def wait_step(self, store_id: str, step: str, timeout: float) -> bool:
+        """
+        Wait up to `timeout` for a step of the current run. True if it has
+        finished (or there is no run, or the run doesn't include the step).
+        """
+        store_id = str(store_id)
+        registered = self._registered.get(store_id)
+        if registered is None:
+            return True
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            await asyncio.wait_for(registered.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        task = self._steps.get(store_id, {}).get(step)
+        if task is None:
+            return True
+        done, _ = await asyncio.wait({task}, timeout=max(0.0, deadline - loop.time()))
+        return bool(done)
+
+    async def status(self, store_id: str) -> Dict:
+        steps = await async_db.get_onboarding_steps(store_id)
+        order = {step: i for i, step in enumerate(STEPS)}
+        steps.sort(key=lambda s: order.get(s["step"], len(order)))
+        return {
+            "store_id": str(store_id),
+            "running": self.running(store_id),
+            "complete": bool(steps) and all(s["status"] in FINISHED for s in steps),
+            "steps": steps,
+        }
+
+    async def _step(self, store_id: str, step: str, fn: Callable[[], Awaitable[None]]):
+        await async_db.set_onboarding_step(store_id, step, "running")
+        try:
+            await fn()
+        except Exception as e:
+            await async_db.set_onboarding_step(store_id, step, "failed", str(e) or type(e).__name__)
+            log.warning("Onboarding step failed", store_id=store_id, step=step, error=str(e))
+            raise
+        await async_db.set_onboarding_step(store_id, step, "done")
+
+    async def _run(self, store_id: str, access_token: str):
+        statuses = {s["step"]: s["status"] for s in await async_db.get_onboarding_steps(store_id)}
+
+        def todo(step: str) -> bool:
+            return statuses.get(step, "pending") not in FINISHED
+
+        async def store_info():
+            info = await tiendanube.get_store_info(store_id=store_id, access_token=access_token)
+            await async_db.update_store_info(store_id, store_data_from_info(info))
+
+        async def shipping_method():
+            await tiendanube.create_picknship_shipping_method(store_id=store_id, access_token=access_token)
+
+        async def webhooks():
+            await tiendanube.register_order_webhooks(store_id=store_id, access_token=access_token)
+
+        async def warm_rate_grid():
+            # rebuilds the grids of pickup origins seen before (reinstalls); new
+            # stores get theirs from the first /rates request
+            await rate_grid.warm_store(store_id)
+
+        async def notify():
+            # the store name comes from store_info; notify even if that step failed
+            if "store_info" in tasks:
+                await asyncio.gather(tasks["store_info"], return_exceptions=True)
+            store = await async_db.get_store(store_id) or {}
+            await notify_new_store({
+                "store_id": store_id,
+                "name": store.get("name", ""),
+                "domain": store.get("domain", ""),
+                "email": store.get("email", ""),
+            })
+
+        runners = {"store_info": store_info, "shipping_method": shipping_method,
+                   "webhooks": webhooks, "rate_grid": warm_rate_grid, "notify": notify}
+        tasks: Dict[str, asyncio.Task] = {}
+        for step in STEPS:
+            if todo(step):
+                tasks[step] = asyncio.create_task(self._step(store_id, step, runners[step]))
+        self._steps[store_id] = tasks
+        self._registered[store_id].set()
+        if not tasks:
+            return
+
+        try:
+            results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        setup_ok = all(not isinstance(results.get(step), BaseException)
+                       for step in ("shipping_method", "webhooks"))
+        if setup_ok and ("shipping_method" in tasks or "webhooks" in tasks):
+            await async_db.mark_shipping_created(store_id)
+        failed = [step for step, result in results.items() if isinstance(result, BaseException)]
+        if failed:
+            log.warning("Onboarding incomplete", store_id=store_id, failed=failed)
+        else:
+            log.info("Onboarding complete", store_id=store_id)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._steps.clear()
+        for registered in self._registered.values():
+            registered.set()
+        self._registered.clear()
+
+
+onboarding = OnboardingPipeline()
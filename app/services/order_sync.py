@@ -0,0 +1,129 @@
+import asyncio
+from typing import Dict, Tuple
+from app.core import async_db
+from app.core.log import get_logger
+from app.services.archive import event_archive
+from app.services.tiendanube import get_order, PICKNSHIP_NAME
+from app.services.notifier import notify_order_created, notify_order_updated
+
+log = get_logger(__name__)
+
+
+class _Flight:
+    """A fetch + write in progress for one order."""
+
+    __slots__ = ("future", "fetching", "stale")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        # the GET to TiendaNube has been sent
+        self.fetching = False
+        # a delivery arrived after the GET was sent, so it may announce a later update
+        self.stale = False
+
+
+# Single-flight: concurrent deliveries for the same order share one fetch + write.
+# Deliveries arriving before the GET goes out are covered by it; one arriving
+# while it's in flight gets a single trailing re-fetch, except order/created
+# (the order existed before any other event, so the GET already covers it).
+# Redeliveries after the write fetch again; upsert_order's content hash skips
+# the unchanged write.
+_inflight: Dict[Tuple[str, str], _Flight] = {}
+
+
+async def process_order_event(store_id: str, order_id: str, event: str = "order/created") -> str:
+    """
+    Fetch the full order from TiendaNube, persist it if it's a PickNShip order
+    and send notifications. Returns a short status string.
+    """
+    key = (str(store_id), str(order_id))
+    flight = _inflight.get(key)
+    if flight is not None:
+        if flight.fetching and event != "order/created":
+            flight.stale = True
+        return await asyncio.shield(flight.future)
+
+    future = asyncio.get_running_loop().create_future()
+    # retrieve the exception even when no other delivery joined
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    flight = _inflight[key] = _Flight(future)
+    try:
+        status = None
+        while status is None or flight.stale:
+            if status is not None:
+                log.info("Re-fetching order updated during fetch", store_id=store_id, order_id=order_id)
+            flight.fetching = flight.stale = False
+            status = await _process_order_event(store_id, order_id, event, flight)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
+    future.set_result(status)
+    return status
+
+
+def shipping_method_name(order: dict) -> str:
+    return order.get("shipping_carrier_name") or order.get("shipping_option") or ""
+
+
+def is_picknship_order(order: dict) -> bool:
+    return PICKNSHIP_NAME in shipping_method_name(order)
+
+
+def build_order_data(store_id: str, order_id: str, order: dict) -> dict:
+    """TiendaNube order -> row for the `orders` table."""
+    customer = order.get("customer") or {}
+    return {
+        "order_id": order_id,
+        "store_id": store_id,
+        "customer_name": customer.get("name", ""),
+        "customer_email": customer.get("email", ""),
+        "customer_phone": customer.get("phone", ""),
+        "total": float(order.get("total", 0.0)),
+        "currency": order.get("currency", "ARS"),
+        "status": order.get("status", ""),
+        "shipping_method": shipping_method_name(order),
+        "shipping_option": order.get("shipping_option_code") or "",
+        "shipping_address": order.get("shipping_address", {}),
+        "created_at": order.get("created_at"),
+        "updated_at": order.get("updated_at")
+    }
+
+
+async def _process_order_event(store_id: str, order_id: str, event: str, flight: _Flight) -> str:
+    store = await async_db.get_store(store_id)
+    if not store:
+        return "store_not_found"
+
+    access_token = store["access_token"]
+
+    # 1️⃣ Fetch full order
+    flight.fetching = True
+    order = await get_order(store_id=store_id, order_id=order_id, access_token=access_token)
+    log.debug("Fetched order", store_id=store_id, order_id=order_id, order=order)
+    event_archive.record("order", store_id, order_id, event, order)
+    if not is_picknship_order(order):
+        log.info("Ignored order: not PickNShip", store_id=store_id, order_id=order_id)
+        return "ignored"
+
+    # 2️⃣ Preparar datos para DB
+    order_data = build_order_data(store_id, order_id, order)
+    log.debug("Processed order data", order=order_data)
+    # 3️⃣ Guardar orden (el diff sale de la misma transacción)
+    result = await async_db.upsert_order(order_data)
+    log.info("Order saved", store_id=store_id, order_id=order_id, is_new=result["is_new"], changed=result["changed"])
+    # 4️⃣ Notificaciones
+    if result["is_new"]:
+        await notify_order_created(order_data)
+    elif result["changes"]:
+        order_diff = {
+            "order_id": order_id,
+            "store_id": store_id,
+            "changes": result["changes"]
+        }
+        await notify_order_updated(order_diff)
+    return "ok"
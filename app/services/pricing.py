@@ -0,0 +1,183 @@
+import asyncio
+import bisect
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app.core import db, async_db
+from app.core.config import settings
+from app.core.log import get_logger
+
+log = get_logger(__name__)
+
+# Seed pricing written to the DB on first start (store_id NULL = default for every store)
+DEFAULT_BANDS = [
+    # (min_km, max_km, max_inclusive, price ARS, reference)
+    (0.0, 3.0, False, 3000, "lt_3"),
+    (3.0, 5.0, False, 5000, "3_5"),
+    (5.0, 10.0, True, 10000, "5_10"),
+]
+DEFAULT_ZONES = [
+    # (postal_from, postal_to, price ARS, reference) - CABA
+    (1000, 1429, 10000, "zip"),
+]
+
+
+class Quote(NamedTuple):
+    price: float
+    reference: str
+
+
+def _quote(price: float, reference: str) -> Quote:
+    # keep whole-peso prices as ints in the rates response
+    return Quote(int(price) if float(price).is_integer() else price, reference)
+
+
+# CP4 with an optional CABA province letter and CPA suffix: 1426, C1426, C1426ABC
+_POSTAL_CODE = re.compile(r"C?(\d{4})(?:[A-Z]{3})?")
+
+
+def normalize_postal_code(postal_code: str) -> str:
+    """
+    'C1426ABC', 'c1426', ' 1426 ' -> '1426' (CPA/CP4 to CP4).
+    Other provinces' codes ('B1425') and malformed ones ('14260') -> ''.
+    """
+    if not postal_code:
+        return ""
+    match = _POSTAL_CODE.fullmatch(str(postal_code).strip().upper())
+    return match.group(1) if match else ""
+
+
+class _Bands:
+    """Distance bands sorted by min_km for bisect lookups."""
+
+    def __init__(self, rows: List[Tuple]):
+        rows = sorted(rows)
+        self.starts = [r[0] for r in rows]
+        self.rows = rows
+
+    def lookup(self, distance_km: float) -> Optional[Quote]:
+        i = bisect.bisect_right(self.starts, distance_km) - 1
+        if i < 0:
+            return None
+        min_km, max_km, inclusive, price, reference = self.rows[i]
+        if distance_km < max_km or (inclusive and distance_km == max_km):
+            return _quote(price, reference)
+        return None
+
+
+class _Zones:
+    """Postal-code ranges: exact codes in a hash map, wider ranges as sorted intervals."""
+
+    def __init__(self, rows: List[Tuple]):
+        self.exact: Dict[int, Quote] = {}
+        ranges = []
+        for postal_from, postal_to, price, reference in rows:
+            if postal_from == postal_to:
+                self.exact[postal_from] = _quote(price, reference)
+            else:
+                ranges.append((postal_from, postal_to, _quote(price, reference)))
+        ranges.sort()
+        self.starts = [r[0] for r in ranges]
+        self.ranges = ranges
+
+    def lookup(self, code: int) -> Optional[Quote]:
+        quote = self.exact.get(code)
+        if quote is not None:
+            return quote
+        i = bisect.bisect_right(self.starts, code) - 1
+        if i >= 0 and code <= self.ranges[i][1]:
+            return self.ranges[i][2]
+        return None
+
+
+class PricingEngine:
+    """
+    Distance bands and postal-code zones loaded from the DB and compiled into
+    lookup tables. Stores with their own bands/zones use them instead of the
+    defaults. Reloaded in the background when the `pricing` version changes.
+    """
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._bands: Dict[Optional[str], _Bands] = {}
+        self._zones: Dict[Optional[str], _Zones] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def reload(self):
+        db.seed_pricing(DEFAULT_BANDS, DEFAULT_ZONES)
+        version, bands, zones = db.load_pricing()
+        compiled_bands: Dict[Optional[str], list] = {}
+        for store_id, *row in bands:
+            compiled_bands.setdefault(store_id, []).append(tuple(row))
+        compiled_zones: Dict[Optional[str], list] = {}
+        for store_id, *row in zones:
+            compiled_zones.setdefault(store_id, []).append(tuple(row))
+        self._bands = {k: _Bands(v) for k, v in compiled_bands.items()}
+        self._zones = {k: _Zones(v) for k, v in compiled_zones.items()}
+        self.version = version
+
+    def quote_distance(self, store_id: Optional[str], distance_km: float) -> Optional[Quote]:
+        bands = self._bands.get(str(store_id)) if store_id else None
+        bands = bands or self._bands.get(None)
+        return bands.lookup(distance_km) if bands else None
+
+    def quote_postal_code(self, store_id: Optional[str], postal_code: str) -> Optional[Quote]:
+        code = normalize_postal_code(postal_code)
+        if not code.isdigit():
+            return None
+        zones = self._zones.get(str(store_id)) if store_id else None
+        zones = zones or self._zones.get(None)
+        return zones.lookup(int(code)) if zones else None
+
+    def describe(self, store_id: Optional[str]) -> Dict:
+        """Effective bands/zones for a store (None = defaults)."""
+        if self.version is None:
+            self.reload()
+        key = str(store_id) if store_id else None
+        bands = self._bands.get(key) or self._bands.get(None)
+        zones = self._zones.get(key) or self._zones.get(None)
+        return {
+            "version": self.version,
+            "overridden": key in self._bands or key in self._zones if key else False,
+            "bands": [
+                {"min_km": r[0], "max_km": r[1], "max_inclusive": r[2], "price": r[3], "reference": r[4]}
+                for r in (bands.rows if bands else [])
+            ],
+            "zones": [
+                {"postal_from": code, "postal_to": code, "price": q.price, "reference": q.reference}
+                for code, q in (zones.exact.items() if zones else [])
+            ] + [
+                {"postal_from": lo, "postal_to": hi, "price": q.price, "reference": q.reference}
+                for lo, hi, q in (zones.ranges if zones else [])
+            ],
+        }
+
+    def quote(self, store_id: Optional[str], distance_km: Optional[float], postal_code: str) -> Optional[Quote]:
+        if self.version is None:
+            self.reload()
+        if distance_km is not None:
+            return self.quote_distance(store_id, distance_km)
+        return self.quote_postal_code(store_id, postal_code)
+
+    async def start(self):
+        await async_db.run_db(self.reload)
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(settings.PRICING_RELOAD_SECONDS)
+            try:
+                version = await async_db.run_db(db.get_cache_version, "pricing")
+                if version != self.version:
+                    await async_db.run_db(self.reload)
+                    log.info("Reloaded pricing", version=self.version)
+            except Exception as e:
+                log.warning("Pricing reload failed", error=str(e))
+
+
+pricing_engine = PricingEngine()
@@ -0,0 +1,189 @@
+import asyncio
+import math
+import time
+from array import array
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from app.core import async_db, db
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.log import get_logger
+from app.services.pricing import normalize_postal_code
+
+log = get_logger(__name__)
+
+# (origin, destinations) -> km per destination, None where there's no route
+DistanceMatrix = Callable[[str, List[str]], Awaitable[List[Optional[float]]]]
+
+
+class RateGrid:
+    """
+    Precomputed Distance Matrix road distances from each store pickup origin
+    to every service-area postal code (the centroid list), one float32 array
+    per (store, origin) in memory. Origins are learned from /rates requests
+    for installed stores, at most RATE_GRID_MAX_ORIGINS_PER_STORE each;
+    grids are built in bounded-concurrency batches, rebuilt when stale and
+    reloaded when another worker rebuilds one.
+
+    The postal code centroids and the Distance Matrix call come from the
+    rates API through `configure()`; until then the grid stays disabled.
+    """
+
+    def __init__(self):
+        self.codes: List[str] = []
+        self.centroids: Dict[str, Tuple[float, float]] = {}
+        self.index: Dict[str, int] = {}
+        self._fetch_matrix: Optional[DistanceMatrix] = None
+        self._grids: Dict[Tuple[str, str], array] = {}
+        self._origins: Dict[str, Set[str]] = {}
+        # unknown stores and origins over the cap, not retried until they expire
+        self._rejected = TTLCache(maxsize=1024, ttl=settings.RATE_GRID_RELOAD_SECONDS)
+        self._building: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._version: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, centroids: Dict[str, Tuple[float, float]], fetch_matrix: DistanceMatrix):
+        self.codes = sorted(centroids)
+        self.centroids = centroids
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self._fetch_matrix = fetch_matrix
+
+    @property
+    def enabled(self) -> bool:
+        return (settings.RATE_GRID_ENABLED and settings.RATES_DISTANCE_MODE != "local"
+                and bool(settings.GOOGLE_MAPS_API_KEY) and self._fetch_matrix is not None)
+
+    def lookup(self, store_id: str, origin_key: str, postal_code: str) -> Optional[float]:
+        grid = self._grids.get((str(store_id), origin_key))
+        i = self.index.get(normalize_postal_code(postal_code))
+        if grid is None or i is None or math.isnan(grid[i]):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return grid[i]
+
+    def observe(self, store_id: str, origin_key: str, origin_str: str):
+        """Unknown origin: remember it and build its grid in the background."""
+        key = (str(store_id), origin_key)
+        origins = self._origins.get(key[0], ())
+        if (origin_key in origins or key in self._grids or len(origins) >= settings.RATE_GRID_MAX_ORIGINS_PER_STORE
+                or key[0] in self._rejected or key in self._rejected):
+            return
+        self._schedule(key, origin_str, remember=True)
+
+    def _schedule(self, key: Tuple[str, str], origin_str: str, remember: bool = False):
+        if key in self._building:
+            return
+        task = asyncio.create_task(self._build(key, origin_str, remember))
+        self._building[key] = task
+        task.add_done_callback(lambda _: self._building.pop(key, None))
+
+    async def _remember(self, key: Tuple[str, str], origin_str: str) -> bool:
+        store_id, origin_key = key
+        if await async_db.get_store(store_id) is None:
+            self._rejected.set(store_id, True)
+            return False
+        if not await async_db.run_db(db.save_rate_grid_origin, store_id, origin_key, origin_str,
+                                     settings.RATE_GRID_MAX_ORIGINS_PER_STORE):
+            self._rejected.set(key, True)
+            log.info("Rate grid origin not added: store at its origin limit", store_id=store_id, origin=origin_str)
+            return False
+        self._origins.setdefault(store_id, set()).add(origin_key)
+        return True
+
+    async def _build(self, key: Tuple[str, str], origin_str: str, remember: bool = False) -> bool:
+        store_id, origin_key = key
+        try:
+            if remember and not await self._remember(key, origin_str):
+                return False
+            if not await async_db.run_db(db.claim_rate_grid_build, store_id, origin_key,
+                                         settings.RATE_GRID_BUILD_LEASE_SECONDS):
+                return False
+            size = settings.DISTANCE_BATCH_MAX_DESTINATIONS
+            semaphore = asyncio.Semaphore(settings.RATE_GRID_CONCURRENCY)
+
+            async def batch(codes: List[str]):
+                async with semaphore:
+                    destinations = [f"{self.centroids[c][0]},{self.centroids[c][1]}" for c in codes]
+                    return zip(codes, await self._fetch_matrix(origin_str, destinations))
+
+            distances: List[Tuple[str, float]] = []
+            for results in await asyncio.gather(*(
+                batch(self.codes[i:i + size]) for i in range(0, len(self.codes), size)
+            )):
+                distances.extend((code, km) for code, km in results if km is not None)
+            if not distances:
+                # e.g. Google down: keep the claim so the retry waits for the lease to expire
+                log.warning("Rate grid build got no distances", store_id=store_id, origin=origin_str)
+                return False
+            await async_db.run_db(db.save_rate_grid, store_id, origin_key, distances)
+            self._grids[key] = self._compile(distances)
+            log.info("Built rate grid", store_id=store_id, origin=origin_str, postal_codes=len(distances))
+            return True
+        except Exception as e:
+            log.warning("Rate grid build failed", store_id=store_id, origin=origin_str, error=str(e))
+            return False
+
+    def _compile(self, distances) -> array:
+        grid = array("f", [math.nan]) * len(self.codes)
+        for code, km in distances:
+            i = self.index.get(code)
+            if i is not None:
+                grid[i] = km
+        return grid
+
+    def load(self):
+        """Load every grid from the DB (startup, and when another worker rebuilt one)."""
+        version = db.rate_grid_version()
+        origins: Dict[str, Set[str]] = {}
+        for origin in db.list_rate_grid_origins():
+            origins.setdefault(origin["store_id"], set()).add(origin["origin_key"])
+        rows: Dict[Tuple[str, str], list] = {}
+        for store_id, origin_key, code, km in db.load_rate_grids():
+            rows.setdefault((store_id, origin_key), []).append((code, km))
+        self._grids = {key: self._compile(distances) for key, distances in rows.items()}
+        self._origins = origins
+        self._version = version
+
+    async def warm_store(self, store_id: str) -> int:
+        """Rebuild every known origin of a store now (after install). Returns grids built."""
+        if not self.enabled:
+            return 0
+        origins = await async_db.run_db(db.list_rate_grid_origins, store_id)
+        built = await asyncio.gather(*(
+            self._build((o["store_id"], o["origin_key"]), o["origin"]) for o in origins
+        ))
+        return sum(built)
+
+    async def start(self):
+        if not self.enabled:
+            return
+        await async_db.run_db(self.load)
+        self._task = asyncio.create_task(self._refresh())
+
+    async def stop(self):
+        tasks = [t for t in (self._task, *self._building.values()) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _refresh(self):
+        while True:
+            await asyncio.sleep(settings.RATE_GRID_RELOAD_SECONDS)
+            try:
+                if await async_db.run_db(db.rate_grid_version) != self._version:
+                    await async_db.run_db(self.load)
+                stale = await async_db.run_db(
+                    db.list_rate_grid_origins, built_before=time.time() - settings.RATE_GRID_REFRESH_SECONDS)
+                for origin in stale:
+                    self._schedule((origin["store_id"], origin["origin_key"]), origin["origin"])
+            except Exception as e:
+                log.warning("Rate grid refresh failed", error=str(e))
+
+    def stats(self) -> Dict[str, int]:
+        return {"grids": len(self._grids), "hits": self.hits, "misses": self.misses, "building": len(self._building)}
+
+
+rate_grid = RateGrid()
@@ -0,0 +1,217 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from app.core import async_db
+from app.core.config import settings
+from app.core.leases import Lease
+from app.core.log import get_logger
+from app.services.tiendanube import list_orders
+from app.services.order_sync import build_order_data, is_picknship_order
+from app.services.notifier import notify_order_created, notify_order_updated
+
+log = get_logger(__name__)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def default_since(checkpoint: Optional[Dict]) -> str:
+    """Last completed watermark minus the overlap window, or the lookback window for new stores."""
+    if checkpoint and checkpoint.get("watermark"):
+        watermark = datetime.fromisoformat(checkpoint["watermark"])
+        return (watermark - timedelta(seconds=settings.RECONCILE_OVERLAP_SECONDS)).isoformat()
+    return (_now() - timedelta(days=settings.RECONCILE_LOOKBACK_DAYS)).isoformat()
+
+
+async def _save_page(store_id: str, orders: List[dict], notify: bool, next_page: int, seen: int, saved: int) -> int:
+    """Bulk upsert one page and advance the checkpoint. Returns orders inserted or changed."""
+    results = await async_db.upsert_orders(orders)
+    changed = sum(1 for r in results if r["changed"])
+    await async_db.save_reconcile_checkpoint(
+        store_id, next_page=next_page, orders_seen=seen, orders_saved=saved + changed,
+    )
+    if notify:
+        for order_data, result in zip(orders, results):
+            if result["is_new"]:
+                await notify_order_created(order_data)
+            elif result["changes"]:
+                await notify_order_updated({
+                    "order_id": order_data["order_id"],
+                    "store_id": store_id,
+                    "changes": result["changes"],
+                })
+    return changed
+
+
+async def _fetch_page(store: Dict, page: int, since: str) -> List[dict]:
+    """list_orders with a few retries; transient upstream errors shouldn't fail the store."""
+    for attempt in range(settings.RECONCILE_PAGE_RETRIES + 1):
+        try:
+            return await list_orders(str(store["store_id"]), store["access_token"], page=page,
+                                     per_page=settings.RECONCILE_PAGE_SIZE, updated_at_min=since)
+        except Exception as e:
+            if attempt == settings.RECONCILE_PAGE_RETRIES:
+                raise
+            delay = settings.RECONCILE_RETRY_BASE_SECONDS * (2 ** attempt)
+            log.warning("Orders page fetch failed, retrying", store_id=store["store_id"], page=page,
+                        retry_in=delay, error=str(e))
+            await asyncio.sleep(delay)
+
+
+async def reconcile_store(store: Dict, since: Optional[str] = None, notify: bool = False) -> Dict:
+    """
+    Page through a store's orders updated since `since` (default: from its
+    checkpoint) and upsert the PickNShip ones, one transaction per page.
+    An interrupted or failed run resumes from the page it stopped at.
+    Writing page N overlaps with fetching page N+1.
+    """
+    store_id = str(store["store_id"])
+    per_page = settings.RECONCILE_PAGE_SIZE
+    checkpoint = await async_db.get_reconcile_checkpoint(store_id)
+
+    if since is None and checkpoint and checkpoint["status"] in ("running", "failed") and checkpoint["run_since"]:
+        since = checkpoint["run_since"]
+        started_at = checkpoint["run_started_at"]
+        page = checkpoint["next_page"] or 1
+        seen, saved = checkpoint["orders_seen"] or 0, checkpoint["orders_saved"] or 0
+        log.info("Resuming reconciliation", store_id=store_id, since=since, page=page)
+    else:
+        since = since or default_since(checkpoint)
+        started_at = _now().isoformat()
+        page, seen, saved = 1, 0, 0
+
+    await async_db.save_reconcile_checkpoint(
+        store_id, run_since=since, run_started_at=started_at, next_page=page,
+        status="running", orders_seen=seen, orders_saved=saved, last_error=None,
+    )
+
+    pending: Optional[asyncio.Task] = None
+    try:
+        while True:
+            orders = await _fetch_page(store, page, since)
+            if pending is not None:
+                saved += await pending
+                pending = None
+            if not orders:
+                break
+            seen += len(orders)
+            batch = [build_order_data(store_id, str(o["id"]), o) for o in orders if is_picknship_order(o)]
+            pending = asyncio.create_task(_save_page(store_id, batch, notify, page + 1, seen, saved))
+            if len(orders) < per_page:
+                saved += await pending
+                pending = None
+                break
+            page += 1
+    except BaseException as e:
+        if pending is not None:
+            # let the page already fetched finish writing (it advances the checkpoint)
+            await asyncio.gather(pending, return_exceptions=True)
+        await async_db.save_reconcile_checkpoint(store_id, status="failed", last_error=str(e) or type(e).__name__)
+        raise
+
+    await async_db.save_reconcile_checkpoint(
+        store_id, watermark=started_at, next_page=1, status="done", orders_seen=seen, orders_saved=saved,
+    )
+    log.info("Reconciled store", store_id=store_id, since=since, orders_seen=seen, orders_saved=saved)
+    return {"store_id": store_id, "since": since, "orders_seen": seen, "orders_saved": saved}
+
+
+async def reconcile_all(store_ids: Optional[Iterable[str]] = None, since: Optional[str] = None,
+                        concurrency: Optional[int] = None, notify: bool = False) -> Dict:
+    """Reconcile every store (or `store_ids`), `concurrency` stores at a time."""
+    start = time.monotonic()
+    stores = await async_db.list_stores(include_tokens=True)
+    if store_ids is not None:
+        wanted = {str(s) for s in store_ids}
+        stores = [s for s in stores if str(s["store_id"]) in wanted]
+    semaphore = asyncio.Semaphore(concurrency or settings.RECONCILE_CONCURRENCY)
+
+    async def run(store):
+        async with semaphore:
+            return await reconcile_store(store, since=since, notify=notify)
+
+    results = await asyncio.gather(*(run(s) for s in stores), return_exceptions=True)
+    done = [r for r in results if isinstance(r, dict)]
+    failed = [
+        {"store_id": str(s["store_id"]), "error": str(r) or type(r).__name__}
+        for s, r in zip(stores, results) if not isinstance(r, dict)
+    ]
+    for failure in failed:
+        log.warning("Store reconciliation failed", **failure)
+    return {
+        "stores": len(stores),
+        "orders_seen": sum(r["orders_seen"] for r in done),
+        "orders_saved": sum(r["orders_saved"] for r in done),
+        "failed": failed,
+        "duration_s": round(time.monotonic() - start, 3),
+    }
+
+
+class ReconcileJob:
+    """
+    Single background reconciliation run started from the admin endpoint or
+    the CLI. The "reconcile" lease keeps it to one run across every process
+    sharing the DB.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._lease = Lease("reconcile", settings.JOB_LEASE_SECONDS)
+        self.started_at: Optional[str] = None
+        self.last_result: Optional[Dict] = None
+
+    @property
+    def running(self) -> bool:
+        """A run is in progress in this process."""
+        return self._task is not None and not self._task.done()
+
+    async def status(self) -> Dict:
+        """Run state across processes (from the lease)."""
+        lease = await self._lease.holder()
+        started_at = self.started_at
+        if lease is not None and not self.running:
+            started_at = datetime.fromtimestamp(lease["acquired_at"], timezone.utc).replace(microsecond=0).isoformat()
+        return {"running": lease is not None or self.running, "started_at": started_at}
+
+    async def start(self, **kwargs) -> Optional[asyncio.Task]:
+        """Start a run in the background. None if one is already running (here or in another process)."""
+        if self.running or not await self._lease.acquire():
+            return None
+        self.started_at = _now().isoformat()
+        self._task = asyncio.create_task(self._run(**kwargs))
+        return self._task
+
+    async def _keep_lease(self):
+        while True:
+            await asyncio.sleep(self._lease.ttl / 3)
+            try:
+                if not await self._lease.acquire():
+                    log.warning("Lost the reconcile lease")
+            except Exception as e:
+                log.warning("Could not renew the reconcile lease", error=str(e))
+
+    async def _run(self, **kwargs) -> Dict:
+        keeper = asyncio.create_task(self._keep_lease())
+        try:
+            self.last_result = await reconcile_all(**kwargs)
+        except Exception as e:
+            log.error("Reconciliation run failed", error=str(e))
+            self.last_result = {"error": str(e)}
+        finally:
+            keeper.cancel()
+            try:
+                await self._lease.release()
+            except Exception as e:
+                log.warning("Could not release the reconcile lease", error=str(e))
+        return self.last_result
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+reconcile_job = ReconcileJob()
@@ -1,8 +1,11 @@
-import httpx
+from app.core.http import http_clients
+from app.core.log import get_logger
+
+log = get_logger(__name__)
 
 async def send_slack_message(webhook_url: str, payload: dict):
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        resp = await client.post(webhook_url, json=payload)
-        print(f"[SLACK] Response status: {resp.status_code}, text: {resp.text}")
-        if resp.status_code not in (200, 201):
-            raise Exception(f"Slack error: {resp.text}")
+    client = http_clients.get("slack")
+    resp = await client.post(webhook_url, json=payload)
+    log.debug("Slack response", status=resp.status_code, text=resp.text)
+    if resp.status_code not in (200, 201):
+        raise Exception(f"Slack error: {resp.text}")
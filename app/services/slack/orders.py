@@ -1,5 +1,5 @@
-import json
 from datetime import datetime
+from typing import List, Optional
 import pytz
 from app.services.slack.client import send_slack_message
 from app.services.slack.channels import SLACK_CHANNELS
@@ -27,10 +27,14 @@ def format_address(address: dict) -> str:
     return ", ".join([p for p in parts if p]).strip() or "—"
 
 
-async def notify_order_created(order_data: dict):
+def _format_date(when: Optional[datetime] = None) -> str:
     argentina_tz = pytz.timezone("America/Argentina/Buenos_Aires")
-    now_argentina = datetime.utcnow().astimezone(argentina_tz)
-    formatted_date = now_argentina.strftime("%d/%m/%Y %H:%M:%S")
+    now_argentina = (when or datetime.utcnow()).astimezone(argentina_tz)
+    return now_argentina.strftime("%d/%m/%Y %H:%M:%S")
+
+
+def build_order_created_payload(order_data: dict, when: Optional[datetime] = None) -> dict:
+    formatted_date = _format_date(when)
 
     shipping_address_str = format_address(order_data.get("shipping_address", {}))
 
@@ -56,19 +60,14 @@ async def notify_order_created(order_data: dict):
         }
     ]
 
-    payload = {
+    return {
         "text": f"Nueva orden PickNShip: {order_data['order_id']}",
         "blocks": blocks
     }
 
 
-    await send_slack_message(SLACK_CHANNELS["orders"], payload)
-
-
-async def notify_order_updated(order_diff: dict):
-    argentina_tz = pytz.timezone("America/Argentina/Buenos_Aires")
-    now_argentina = datetime.utcnow().astimezone(argentina_tz)
-    formatted_date = now_argentina.strftime("%d/%m/%Y %H:%M:%S")
+def build_order_updated_payload(order_diff: dict, when: Optional[datetime] = None) -> dict:
+    formatted_date = _format_date(when)
 
     changes_lines = []
     for field, change in order_diff.get("changes", {}).items():
@@ -95,10 +94,35 @@ async def notify_order_updated(order_diff: dict):
         }
     ]
 
-    payload = {
+    return {
         "text": f"Orden actualizada PickNShip: {order_diff['order_id']}",
         "blocks": blocks
     }
 
-    await send_slack_message(SLACK_CHANNELS["orders"], payload)
+
+def merge_order_diffs(diffs: List[dict]) -> dict:
+    """
+    Coalesce several diffs of the same order (oldest first) into one:
+    keeps the first "old" and the last "new" of each field, dropping no-op fields.
+    """
+    changes = {}
+    for diff in diffs:
+        for field, change in diff.get("changes", {}).items():
+            if field in changes:
+                changes[field]["new"] = change.get("new")
+            else:
+                changes[field] = {"old": change.get("old"), "new": change.get("new")}
+    return {
+        "order_id": diffs[-1]["order_id"],
+        "store_id": diffs[-1]["store_id"],
+        "changes": {k: v for k, v in changes.items() if v["old"] != v["new"]},
+    }
+
+
+async def notify_order_created(order_data: dict):
+    await send_slack_message(SLACK_CHANNELS["orders"], build_order_created_payload(order_data))
+
+
+async def notify_order_updated(order_diff: dict):
+    await send_slack_message(SLACK_CHANNELS["orders"], build_order_updated_payload(order_diff))
 
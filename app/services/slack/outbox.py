@@ -0,0 +1,164 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.core import async_db, db
+from app.core.config import settings
+from app.core.leases import Lease
+from app.core.log import get_logger
+from app.services.slack.client import send_slack_message
+from app.services.slack.channels import SLACK_CHANNELS
+from app.services.slack.orders import build_order_created_payload, build_order_updated_payload, merge_order_diffs
+from app.services.slack.stores import build_store_installed_payload
+
+log = get_logger(__name__)
+
+
+class TokenBucket:
+    """Simple async token bucket: `rate` tokens per second, up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def order_key(store_id, order_id) -> str:
+    return f"order:{store_id}:{order_id}"
+
+
+def build_payload(kind: str, items: List[dict]) -> Optional[dict]:
+    """
+    Render the Slack message for a batch of outbox rows of the same kind.
+    Returns None when coalescing leaves nothing to say.
+    """
+    when = datetime.fromtimestamp(items[-1]["created_at"], tz=timezone.utc)
+    if kind == "order_created":
+        return build_order_created_payload(items[-1]["payload"], when=when)
+    if kind == "order_updated":
+        order_diff = merge_order_diffs([item["payload"] for item in items])
+        if not order_diff["changes"]:
+            return None
+        return build_order_updated_payload(order_diff, when=when)
+    if kind == "store_installed":
+        return build_store_installed_payload(when=when, **items[-1]["payload"])
+    raise ValueError(f"Unknown notification kind: {kind}")
+
+
+class SlackDispatcher:
+    """
+    Background sender for the `notification_outbox` table.
+    Coalesces rows sharing a coalesce_key, rate limits per channel and
+    retries failed sends with exponential backoff. Claimed rows carry this
+    dispatcher's owner id; rows of a sender that died are taken over after
+    SLACK_OUTBOX_LEASE_SECONDS.
+
+    Only the process holding the "slack_dispatcher" lease sends, so the
+    per-channel rate limit holds with several worker processes.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._stopping = False
+        self.owner = db.claim_owner()
+        self._lease = Lease("slack_dispatcher", settings.JOB_LEASE_SECONDS)
+
+    def _bucket(self, channel: str) -> TokenBucket:
+        if channel not in self._buckets:
+            self._buckets[channel] = TokenBucket(settings.SLACK_RATE_PER_SECOND, settings.SLACK_RATE_BURST)
+        return self._buckets[channel]
+
+    async def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self.owner = db.claim_owner()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        self._stopped.set()
+        self._wakeup.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=settings.WEBHOOK_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            self._task = None
+        try:
+            await self._lease.release()
+        except Exception as e:
+            log.warning("Could not release the Slack dispatcher lease", error=str(e))
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _pause(self, delay: float):
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        errors = 0
+        while not self._stopping:
+            try:
+                if not await self._lease.keep():
+                    # another worker process is sending
+                    await self._pause(self._lease.ttl / 3)
+                    continue
+                items = await async_db.claim_notifications(self.owner, settings.SLACK_OUTBOX_LEASE_SECONDS)
+                if items:
+                    await self._dispatch(items)
+                errors = 0
+            except Exception as e:
+                # a DB error must not stop delivery; claimed rows are retried once their lease expires
+                errors += 1
+                delay = min(settings.SLACK_OUTBOX_POLL_SECONDS * (2 ** (errors - 1)),
+                            settings.SLACK_OUTBOX_LEASE_SECONDS)
+                log.error("Slack dispatcher error, backing off", retry_in=delay, error=str(e))
+                await self._pause(delay)
+                continue
+            if not items:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.SLACK_OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _dispatch(self, items: List[dict]):
+        ids = [item["id"] for item in items]
+        channel = items[0]["channel"]
+        try:
+            payload = build_payload(items[0]["kind"], items)
+            if payload is not None:
+                await self._bucket(channel).acquire()
+                await send_slack_message(SLACK_CHANNELS[channel], payload)
+        except Exception as e:
+            attempts = max(item["attempts"] for item in items)
+            if attempts >= settings.SLACK_MAX_ATTEMPTS:
+                log.error("Dropping notifications", ids=ids, attempts=attempts, error=str(e))
+                await async_db.fail_notifications(ids, self.owner, str(e), None)
+            else:
+                delay = settings.SLACK_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+                log.warning("Slack send failed, retrying", ids=ids, retry_in=delay, error=str(e))
+                await async_db.fail_notifications(ids, self.owner, str(e), time.time() + delay)
+            return
+        await async_db.complete_notifications(ids, self.owner)
+
+
+slack_dispatcher = SlackDispatcher()
@@ -1,13 +1,15 @@
 from datetime import datetime
+from typing import Optional
 import pytz
 from app.services.slack.client import send_slack_message
 from app.services.slack.channels import SLACK_CHANNELS
 
-async def notify_store_installed(store_id, store_name=None, domain=None, email=None):
+def build_store_installed_payload(store_id, store_name=None, domain=None, email=None,
+                                  when: Optional[datetime] = None) -> dict:
     tz = pytz.timezone("America/Argentina/Buenos_Aires")
-    now = datetime.now(tz).strftime("%d/%m/%Y %H:%M:%S")
+    now = (when or datetime.now(tz)).astimezone(tz).strftime("%d/%m/%Y %H:%M:%S")
 
-    payload = {
+    return {
         "text": "Nueva tienda conectada a PickNShip",
         "blocks": [
             {
@@ -27,4 +29,7 @@ async def notify_store_installed(store_id, store_name=None, domain=None, email=N
         ]
     }
 
+
+async def notify_store_installed(store_id, store_name=None, domain=None, email=None):
+    payload = build_store_installed_payload(store_id, store_name=store_name, domain=domain, email=email)
     await send_slack_message(SLACK_CHANNELS["stores"], payload)
@@ -1,9 +1,34 @@
+import asyncio
 import httpx
 from fastapi import HTTPException
 from app.core.config import settings
-from typing import Dict, Any
+from app.core.log import get_logger
+from app.core.http import http_clients
+from app.core.ratelimit import tiendanube_limiter
+from typing import Dict, Any, List, Optional
+
+log = get_logger(__name__)
 
 PICKNSHIP_NAME = "Pick'NShip: coordinamos dia y horario por whatsapp"
+TIENDANUBE_API_URL = settings.TIENDANUBE_API_URL
+
+
+async def _request(store_id, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Store-scoped API call through the per-store rate limiter: waits for quota
+    instead of failing, and waits out 429s (up to TIENDANUBE_MAX_429_RETRIES).
+    """
+    client = http_clients.get("tiendanube")
+    if not settings.TIENDANUBE_RATE_LIMIT_ENABLED:
+        return await client.request(method, url, **kwargs)
+    for _ in range(settings.TIENDANUBE_MAX_429_RETRIES + 1):
+        await tiendanube_limiter.acquire(store_id)
+        resp = await client.request(method, url, **kwargs)
+        if resp.status_code != 429:
+            await tiendanube_limiter.observe(store_id, resp.headers)
+            return resp
+        await tiendanube_limiter.throttled(store_id, resp.headers)
+    return resp
 
 async def create_picknship_shipping_method(store_id: int, access_token: str) -> Dict[str, Any]:
     """
@@ -18,62 +43,61 @@ async def create_picknship_shipping_method(store_id: int, access_token: str) ->
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        # 1️⃣ Fetch existing shippings
-        try:
-            resp = await client.get(f"https://api.tiendanube.com/v1/{store_id}/shipping_carriers", headers=headers)
-            if resp.status_code == 404:
-                shippings = []  # no shippings yet
-            elif resp.status_code != 200:
-                raise HTTPException(
-                    status_code=resp.status_code,
-                    detail=f"Failed to fetch existing shippings: {resp.text}"
-                )
-            else:
-                shippings = resp.json()
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=500, detail=f"Error connecting to TiendaNube: {str(e)}")
-
-        # 2️⃣ Check if Pick'NShip already exists
-        for shipping in shippings:
-            if shipping.get("name") == PICKNSHIP_NAME:
-                print(f"[INFO] Pick'NShip shipping already exists for store {store_id}")
-                return shipping
-
-        # 3️⃣ Create Pick'NShip shipping
-        payload = {
-            "name": PICKNSHIP_NAME,
-            "callback_url": f"{settings.BACKEND_URL}/rates",
-            "types": "ship"
-        }
-
-        try:
-            create_resp = await client.post(f"https://api.tiendanube.com/v1/{store_id}/shipping_carriers",
-                                            headers=headers,
-                                            json=payload)
-            
-            # Create carrier options (code must match the one used in rates)
-            if create_resp.status_code in (200, 201):
-                shipping_id = create_resp.json().get("id")
-                options_payload = {
-                    "code": "picknship_dynamic",
-                    "name": "picknship_dynamic"
-                }
-                await client.post(f"https://api.tiendanube.com/v1/{store_id}/shipping_carriers/{shipping_id}/options",
-                                 headers=headers,
-                                 json=options_payload)
-                
-        except httpx.RequestError as e:
-            raise HTTPException(status_code=500, detail=f"Error creating shipping: {str(e)}")
-
-        if create_resp.status_code not in (200, 201):
+    # 1️⃣ Fetch existing shippings
+    try:
+        resp = await _request(store_id, "GET", f"{TIENDANUBE_API_URL}/{store_id}/shipping_carriers", headers=headers)
+        if resp.status_code == 404:
+            shippings = []  # no shippings yet
+        elif resp.status_code != 200:
             raise HTTPException(
-                status_code=create_resp.status_code,
-                detail=f"Failed to create PickNShip shipping: {create_resp.text}"
+                status_code=resp.status_code,
+                detail=f"Failed to fetch existing shippings: {resp.text}"
             )
+        else:
+            shippings = resp.json()
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Error connecting to TiendaNube: {str(e)}")
+
+    # 2️⃣ Check if Pick'NShip already exists
+    for shipping in shippings:
+        if shipping.get("name") == PICKNSHIP_NAME:
+            log.info("PickNShip shipping already exists", store_id=store_id)
+            return shipping
+
+    # 3️⃣ Create Pick'NShip shipping
+    payload = {
+        "name": PICKNSHIP_NAME,
+        "callback_url": f"{settings.BACKEND_URL}/rates",
+        "types": "ship"
+    }
 
-        print(f"[INFO] Pick'NShip shipping created for store {store_id}")
-        return create_resp.json()
+    try:
+        create_resp = await _request(store_id, "POST", f"{TIENDANUBE_API_URL}/{store_id}/shipping_carriers",
+                                     headers=headers,
+                                     json=payload)
+        
+        # Create carrier options (code must match the one used in rates)
+        if create_resp.status_code in (200, 201):
+            shipping_id = create_resp.json().get("id")
+            options_payload = {
+                "code": "picknship_dynamic",
+                "name": "picknship_dynamic"
+            }
+            await _request(store_id, "POST", f"{TIENDANUBE_API_URL}/{store_id}/shipping_carriers/{shipping_id}/options",
+                           headers=headers,
+                           json=options_payload)
+            
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=500, detail=f"Error creating shipping: {str(e)}")
+
+    if create_resp.status_code not in (200, 201):
+        raise HTTPException(
+            status_code=create_resp.status_code,
+            detail=f"Failed to create PickNShip shipping: {create_resp.text}"
+        )
+
+    log.info("PickNShip shipping created", store_id=store_id)
+    return create_resp.json()
     
 
 async def get_store_info(store_id: int, access_token: str) -> Dict[str, Any]:
@@ -88,13 +112,12 @@ async def get_store_info(store_id: int, access_token: str) -> Dict[str, Any]:
         "Content-Type": "application/json"
     }
 
-    url = f"https://api.tiendanube.com/v1/{store_id}/store"
+    url = f"{TIENDANUBE_API_URL}/{store_id}/store"
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        try:
-            resp = await client.get(url, headers=headers)
-        except httpx.RequestError as e:
-            raise Exception(f"Error connecting to TiendaNube API: {str(e)}")
+    try:
+        resp = await _request(store_id, "GET", url, headers=headers)
+    except httpx.RequestError as e:
+        raise Exception(f"Error connecting to TiendaNube API: {str(e)}")
 
     if resp.status_code != 200:
         raise Exception(f"Failed to fetch store info: {resp.text}")
@@ -102,6 +125,10 @@ async def get_store_info(store_id: int, access_token: str) -> Dict[str, Any]:
     return resp.json()
 
 async def register_order_webhooks(store_id: str, access_token: str):
+    """
+    Register the order/created and order/updated webhooks.
+    Idempotent: webhooks already registered for our URL are left alone.
+    """
     headers = {
         "Authentication": f"bearer {access_token}",
         "Content-Type": "application/json"
@@ -112,13 +139,29 @@ async def register_order_webhooks(store_id: str, access_token: str):
         {"event": "order/updated", "url": f"{settings.BACKEND_URL}/webhook/orders"},
     ]
 
-    async with httpx.AsyncClient() as client:
-        for payload in payloads:
-            resp = await client.post(f"https://api.tiendanube.com/v1/{store_id}/webhooks",
-                                     headers=headers, json=payload)
-            if resp.status_code not in (200, 201):
-                raise Exception(f"Failed to register webhook: {resp.text}")
-    
+    # 1️⃣ Fetch existing webhooks
+    resp = await _request(store_id, "GET", f"{TIENDANUBE_API_URL}/{store_id}/webhooks", headers=headers)
+    if resp.status_code == 404:
+        existing = []
+    elif resp.status_code != 200:
+        raise Exception(f"Failed to fetch existing webhooks: {resp.text}")
+    else:
+        existing = resp.json()
+    registered = {(w.get("event"), w.get("url")) for w in existing}
+    payloads = [p for p in payloads if (p["event"], p["url"]) not in registered]
+    if not payloads:
+        log.info("Order webhooks already registered", store_id=store_id)
+        return
+
+    async def register(payload):
+        resp = await _request(store_id, "POST", f"{TIENDANUBE_API_URL}/{store_id}/webhooks",
+                              headers=headers, json=payload)
+        if resp.status_code not in (200, 201):
+            raise Exception(f"Failed to register webhook: {resp.text}")
+
+    # 2️⃣ Create the missing ones (independent: run them concurrently)
+    await asyncio.gather(*(register(p) for p in payloads))
+
 
 async def get_order(store_id: int, order_id: int, access_token: str) -> Dict[str, Any]:
     headers = {
@@ -127,13 +170,38 @@ async def get_order(store_id: int, order_id: int, access_token: str) -> Dict[str
         "Content-Type": "application/json"
     }
 
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        resp = await client.get(
-            f"https://api.tiendanube.com/v1/{store_id}/orders/{order_id}",
-            headers=headers
-        )
+    resp = await _request(
+        store_id, "GET",
+        f"{TIENDANUBE_API_URL}/{store_id}/orders/{order_id}",
+        headers=headers
+    )
 
     if resp.status_code != 200:
         raise Exception(f"Failed to fetch order {order_id}: {resp.text}")
 
-    return resp.json()
\ No newline at end of file
+    return resp.json()
+
+async def list_orders(store_id: str, access_token: str, page: int = 1, per_page: int = 200,
+                      updated_at_min: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    One page of a store's orders (newest first), optionally only those updated
+    since `updated_at_min` (ISO 8601). Returns [] past the last page.
+    """
+    headers = {
+        "Authentication": f"bearer {access_token}",
+        "User-Agent": f"Pick'NShip ({settings.PICKNSHIP_EMAIL})",
+        "Content-Type": "application/json"
+    }
+    params = {"page": page, "per_page": per_page}
+    if updated_at_min:
+        params["updated_at_min"] = updated_at_min
+
+    resp = await _request(store_id, "GET", f"{TIENDANUBE_API_URL}/{store_id}/orders", headers=headers, params=params)
+
+    # TiendaNube answers 404 ("Last page is N") past the last page
+    if resp.status_code == 404:
+        return []
+    if resp.status_code != 200:
+        raise Exception(f"Failed to list orders for store {store_id} (page {page}): {resp.text}")
+
+    return resp.json()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from typing import List
+from app.core import async_db, db
+from app.core.config import settings
+from app.core.log import get_logger
+from app.services.order_sync import process_order_event
+
+log = get_logger(__name__)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff for the given attempt number (1-based)."""
+    return min(settings.WEBHOOK_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), settings.WEBHOOK_RETRY_MAX_SECONDS)
+
+
+def error_backoff(errors: int) -> float:
+    """Pause after `errors` consecutive worker loop failures (e.g. database is locked)."""
+    return min(settings.WEBHOOK_POLL_SECONDS * (2 ** (errors - 1)), settings.WEBHOOK_ERROR_BACKOFF_MAX_SECONDS)
+
+
+class WebhookWorkerPool:
+    """
+    Pool of async workers draining the SQLite `webhook_queue` table.
+    Claimed events carry this pool's owner id and are renewed while being
+    processed, so several processes can share the queue; events of a worker
+    that died are taken over once their claim is WEBHOOK_LEASE_SECONDS old.
+    On stop, workers finish the event they're on and exit.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.owner = db.claim_owner()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self.owner = db.claim_owner()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.size)]
+
+    async def stop(self):
+        self._stopping = True
+        self._stopped.set()
+        self._wakeup.set()
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=settings.WEBHOOK_DRAIN_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        self._wakeup.set()
+
+    async def _worker(self, worker_id: int):
+        errors = 0
+        while not self._stopping:
+            try:
+                item = await async_db.claim_webhook_event(self.owner, settings.WEBHOOK_LEASE_SECONDS)
+                if item is not None:
+                    await self._handle(item)
+                errors = 0
+            except Exception as e:
+                # a DB error must not end the worker; the claimed event is retried once its lease expires
+                errors += 1
+                delay = error_backoff(errors)
+                log.error("Webhook worker error, backing off", worker=worker_id, retry_in=delay, error=str(e))
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.WEBHOOK_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _renew(self, event_id: int):
+        """Keep the claim on an event alive while it is processed."""
+        while True:
+            await asyncio.sleep(settings.WEBHOOK_LEASE_SECONDS / 3)
+            try:
+                if not await async_db.renew_webhook_claim(event_id, self.owner):
+                    log.warning("Lost claim on webhook event", event_id=event_id)
+                    return
+            except Exception as e:
+                log.warning("Could not renew webhook event claim", event_id=event_id, error=str(e))
+
+    async def _handle(self, item: dict):
+        renewer = asyncio.create_task(self._renew(item["id"]))
+        try:
+            status = await process_order_event(
+                store_id=item["store_id"],
+                order_id=item["order_id"],
+                event=item["event"],
+            )
+        except Exception as e:
+            attempts = item["attempts"]
+            if attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                log.error("Webhook event failed permanently", event_id=item["id"], attempts=attempts, error=str(e))
+                await async_db.fail_webhook_event(item["id"], self.owner, str(e), None)
+            else:
+                delay = retry_delay(attempts)
+                log.warning("Webhook event failed, retrying", event_id=item["id"], attempts=attempts, retry_in=delay, error=str(e))
+                await async_db.fail_webhook_event(item["id"], self.owner, str(e), time.time() + delay)
+            return
+        finally:
+            renewer.cancel()
+
+        log.info("Webhook event processed", event_id=item["id"], status=status)
+        await async_db.complete_webhook_event(item["id"], self.owner)
+
+
+webhook_workers = WebhookWorkerPool(settings.WEBHOOK_WORKERS)
@@ -0,0 +1,39 @@
+"""
+Compare two bench.run reports:
+
+    python -m bench.compare baseline.json candidate.json
+"""
+import json
+import sys
+
+METRICS = [
+    ("throughput_rps", lambda s: s["throughput_rps"], True),
+    ("p50_ms", lambda s: s["latency_ms"]["p50"], False),
+    ("p95_ms", lambda s: s["latency_ms"]["p95"], False),
+    ("p99_ms", lambda s: s["latency_ms"]["p99"], False),
+    ("errors", lambda s: s["errors"], False),
+]
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        raise SystemExit("usage: python -m bench.compare BASELINE.json CANDIDATE.json")
+    with open(argv[0]) as f:
+        base = json.load(f)
+    with open(argv[1]) as f:
+        new = json.load(f)
+
+    print(f"baseline {base['meta']['git_commit']} -> candidate {new['meta']['git_commit']}")
+    for scenario in sorted(set(base["scenarios"]) & set(new["scenarios"])):
+        print(f"\n[{scenario}]")
+        for name, get, higher_is_better in METRICS:
+            a, b = get(base["scenarios"][scenario]), get(new["scenarios"][scenario])
+            change = ((b - a) / a * 100) if a else 0.0
+            better = (change > 0) == higher_is_better if change else None
+            mark = "" if better is None else (" (better)" if better else " (worse)")
+            print(f"  {name:>15}: {a:>10} -> {b:>10}  {change:+.1f}%{mark}")
+
+
+if __name__ == "__main__":
+    main()
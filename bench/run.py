@@ -0,0 +1,287 @@
+"""
+Load scenarios against the app served locally with stand-in upstreams.
+
+    python -m bench.run --scenarios rates,webhooks,orders --requests 2000 --concurrency 50 \
+        --output bench_output.json
+
+Each scenario reports throughput and p50/p95/p99 latency plus a latency
+histogram as JSON, so runs can be compared between commits with bench.compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from bench.stubs import (
+    LeakyBucketLimits, ServerThread, Upstream, make_google_app, make_slack_app, make_tiendanube_app,
+)
+
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(latencies_ms: List[float], errors: int, duration_s: float) -> Dict:
+    values = sorted(latencies_ms)
+    histogram = {f"le_{b}": 0 for b in HISTOGRAM_BOUNDS_MS}
+    histogram["le_inf"] = 0
+    for v in values:
+        for b in HISTOGRAM_BOUNDS_MS:
+            if v <= b:
+                histogram[f"le_{b}"] += 1
+                break
+        else:
+            histogram["le_inf"] += 1
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "duration_s": round(duration_s, 3),
+        "throughput_rps": round(len(values) / duration_s, 2) if duration_s else 0.0,
+        "latency_ms": {
+            "mean": round(sum(values) / len(values), 3) if values else 0.0,
+            "p50": round(percentile(values, 50), 3),
+            "p95": round(percentile(values, 95), 3),
+            "p99": round(percentile(values, 99), 3),
+            "max": round(values[-1], 3) if values else 0.0,
+        },
+        "histogram_ms": histogram,
+    }
+
+
+async def run_load(requests: List[Callable[[], Awaitable[httpx.Response]]], concurrency: int) -> Dict:
+    """Run request factories with bounded concurrency; non-2xx responses count as errors."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(make_request):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                resp = await make_request()
+                if resp.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(r) for r in requests))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+# --- Scenarios ---
+
+def rates_requests(client: httpx.AsyncClient, n: int, store_ids: List[str], rng: random.Random):
+    from app.api.rates import local_estimator
+    postal_codes = sorted(local_estimator.centroids)
+    streets = ["Av. Corrientes", "Av. Santa Fe", "Av. Rivadavia", "Scalabrini Ortiz", "Av. Cabildo", "Thames"]
+
+    def make(i):
+        store_id = rng.choice(store_ids)
+        payload = {
+            "store_id": store_id,
+            "currency": "ARS",
+            "origin": {"address": "Av. Córdoba", "number": str(1000 + int(store_id)), "city": "CABA",
+                       "postal_code": "1414", "country": "AR"},
+            "destination": {"address": rng.choice(streets), "number": str(rng.randint(1, 40) * 100),
+                            "city": "CABA", "postal_code": rng.choice(postal_codes), "country": "AR"},
+        }
+        return lambda: client.post("/rates", json=payload)
+
+    return [make(i) for i in range(n)]
+
+
+def webhook_requests(client: httpx.AsyncClient, n: int, store_ids: List[str], rng: random.Random):
+    """Bursts: created + updated for every order, plus ~10% redeliveries."""
+    requests = []
+    order_id = 0
+    while len(requests) < n:
+        order_id += 1
+        store_id = rng.choice(store_ids)
+        events = ["order/created", "order/updated"]
+        if rng.random() < 0.1:
+            events.append("order/updated")
+        for event in events:
+            body = {"store_id": store_id, "id": order_id, "event": event}
+            requests.append(lambda body=body: client.post("/webhook/orders", json=body))
+    return requests[:n]
+
+
+def orders_requests(client: httpx.AsyncClient, n: int, api_key: str, page_size: int):
+    headers = {"Authorization": f"Bearer {api_key}"}
+    cursors: List[str] = []
+
+    async def page():
+        params = {"limit": page_size}
+        if cursors:
+            params["cursor"] = cursors.pop()
+        resp = await client.get("/orders/", params=params, headers=headers)
+        if resp.headers.get("x-next-cursor"):
+            cursors.append(resp.headers["x-next-cursor"])
+        return resp
+
+    return [page for _ in range(n)]
+
+
+def seed_orders(count: int, store_ids: List[str]):
+    from app.core import db
+    from bench.stubs import fake_order
+    for i in range(count):
+        store_id = store_ids[i % len(store_ids)]
+        order = fake_order(store_id, str(900000 + i))
+        db.upsert_order({
+            "order_id": order["id"], "store_id": store_id, "customer_name": order["customer"]["name"],
+            "total": order["total"], "status": order["status"], "shipping_method": order["shipping_option"],
+            "shipping_address": order["shipping_address"],
+            "created_at": f"2025-01-{1 + i % 28:02d}T{i % 24:02d}:00:00", "updated_at": order["updated_at"],
+        })
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def parse_env(pairs: List[str]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pick'NShip load benchmarks")
+    parser.add_argument("--scenarios", default="rates,webhooks,orders")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--seed-orders", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--tiendanube-latency-ms", type=float, default=50)
+    parser.add_argument("--google-latency-ms", type=float, default=80)
+    parser.add_argument("--slack-latency-ms", type=float, default=30)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--tiendanube-error-rate", type=float, default=0.0)
+    parser.add_argument("--google-error-rate", type=float, default=0.0)
+    parser.add_argument("--slack-error-rate", type=float, default=0.0)
+    parser.add_argument("--tiendanube-rate-limit", help="per-store leaky bucket CAPACITY:PER_SECOND (e.g. 40:2)")
+    parser.add_argument("--env", action="append", default=[], help="extra app setting KEY=VALUE (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args(argv)
+
+    upstreams = {
+        "tiendanube": Upstream(args.tiendanube_latency_ms, args.jitter_ms, args.tiendanube_error_rate, args.seed),
+        "google": Upstream(args.google_latency_ms, args.jitter_ms, args.google_error_rate, args.seed),
+        "slack": Upstream(args.slack_latency_ms, args.jitter_ms, args.slack_error_rate, args.seed),
+    }
+    tn_limits = None
+    if args.tiendanube_rate_limit:
+        capacity, per_second = args.tiendanube_rate_limit.split(":")
+        tn_limits = LeakyBucketLimits(int(capacity), float(per_second))
+    tiendanube = ServerThread(make_tiendanube_app(upstreams["tiendanube"], limits=tn_limits)).start()
+    google = ServerThread(make_google_app(upstreams["google"])).start()
+    slack = ServerThread(make_slack_app(upstreams["slack"])).start()
+
+    workdir = tempfile.mkdtemp(prefix="picknship-bench-")
+    api_key = "bench"
+    app_env = {
+        "DB_PATH": os.path.join(workdir, "bench.db"),
+        "API_KEY": api_key,
+        "GOOGLE_MAPS_API_KEY": "bench",
+        "TIENDANUBE_API_URL": f"{tiendanube.url}/v1",
+        "TIENDANUBE_TOKEN_URL": f"{tiendanube.url}/apps/authorize/token",
+        "GOOGLE_MAPS_API_URL": f"{google.url}/maps/api",
+        "SLACK_ORDERS_WEBHOOK_URL": f"{slack.url}/orders",
+        "SLACK_STORES_WEBHOOK_URL": f"{slack.url}/stores",
+        "BACKEND_URL": "http://127.0.0.1",
+        "LOG_LEVEL": "WARNING",
+        **parse_env(args.env),
+    }
+    # settings are read at import time, so configure the environment first
+    os.environ.update(app_env)
+    from app.core import db
+    from app.main import app
+
+    db.init_db()
+    store_ids = [str(1000 + i) for i in range(args.stores)]
+    for store_id in store_ids:
+        db.save_store(store_id, "bench-token", {"name": f"Tienda {store_id}", "domain": "", "email": ""}, True)
+
+    server = ServerThread(app).start()
+    rng = random.Random(args.seed)
+    results = {}
+
+    async def run():
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=server.url, limits=limits, timeout=60) as client:
+            for scenario in args.scenarios.split(","):
+                for upstream in upstreams.values():
+                    upstream.calls = upstream.errors = 0
+                if scenario == "rates":
+                    warmup = rates_requests(client, args.warmup, store_ids, rng)
+                    requests = rates_requests(client, args.requests, store_ids, rng)
+                elif scenario == "webhooks":
+                    warmup = []
+                    requests = webhook_requests(client, args.requests, store_ids, rng)
+                elif scenario == "orders":
+                    await asyncio.to_thread(seed_orders, args.seed_orders, store_ids)
+                    warmup = orders_requests(client, args.warmup, api_key, args.page_size)
+                    requests = orders_requests(client, args.requests, api_key, args.page_size)
+                else:
+                    raise SystemExit(f"Unknown scenario: {scenario}")
+                await run_load(warmup, args.concurrency)
+                summary = await run_load(requests, args.concurrency)
+                summary["upstream_calls"] = {name: u.calls for name, u in upstreams.items()}
+                summary["upstream_errors"] = {name: u.errors for name, u in upstreams.items()}
+                if tn_limits is not None:
+                    summary["tiendanube_429s"] = tn_limits.rejected
+                results[scenario] = summary
+                print(f"{scenario:>10}: {summary['throughput_rps']:>9} req/s  "
+                      f"p50={summary['latency_ms']['p50']}ms p95={summary['latency_ms']['p95']}ms "
+                      f"p99={summary['latency_ms']['p99']}ms errors={summary['errors']}")
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
+        for stub in (tiendanube, google, slack):
+            stub.stop()
+
+    report = {
+        "meta": {
+            "git_commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "scenarios": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
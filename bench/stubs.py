@@ -0,0 +1,247 @@
+"""
+Local ASGI stand-ins for the upstreams (Tiendanube API, Google Maps, Slack
+webhooks), each with configurable latency and error rate, plus a helper to
+serve any ASGI app from a background thread.
+"""
+import asyncio
+import hashlib
+import random
+import socket
+import threading
+import time
+from typing import Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+PICKNSHIP_NAME = "Pick'NShip: coordinamos dia y horario por whatsapp"
+
+
+class Upstream:
+    """Latency/error behaviour of a stand-in (latency in ms, error_rate in 0..1)."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+
+    async def delay(self) -> bool:
+        """Sleep the configured latency; returns True if this call should fail."""
+        self.calls += 1
+        latency = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000.0)
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+
+def fake_order(store_id: str, order_id: str) -> Dict:
+    """Deterministic PickNShip order, so repeated fetches return identical bodies."""
+    n = int(hashlib.sha1(f"{store_id}:{order_id}".encode()).hexdigest()[:8], 16)
+    return {
+        "id": int(order_id) if str(order_id).isdigit() else order_id,
+        "store_id": store_id,
+        "shipping_option": PICKNSHIP_NAME,
+        "shipping_option_code": "picknship_dynamic",
+        "customer": {"name": f"Cliente {n % 1000}", "email": f"cliente{n % 1000}@example.com", "phone": "1100000000"},
+        "total": str(1000 + n % 50000),
+        "currency": "ARS",
+        "status": "open",
+        "shipping_address": {"address": "Av. Corrientes", "number": str(n % 5000), "city": "CABA", "zipcode": "1414"},
+        "created_at": "2025-01-01T12:00:00+0000",
+        "updated_at": "2025-01-01T12:00:00+0000",
+    }
+
+
+class LeakyBucketLimits:
+    """Per-store leaky bucket like Tiendanube's (capacity 40, 2 req/s by default)."""
+
+    def __init__(self, capacity: int = 40, per_second: float = 2.0):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.levels: Dict[str, tuple] = {}
+        self.rejected = 0
+
+    def hit(self, store_id: str):
+        """Returns (allowed, headers)."""
+        now = time.monotonic()
+        level, updated_at = self.levels.get(store_id, (0.0, now))
+        level = max(0.0, level - (now - updated_at) * self.per_second)
+        allowed = level + 1 <= self.capacity
+        if allowed:
+            level += 1
+        else:
+            self.rejected += 1
+        self.levels[store_id] = (level, now)
+        headers = {
+            "x-rate-limit-limit": str(self.capacity),
+            "x-rate-limit-remaining": str(int(self.capacity - level)),
+            "x-rate-limit-reset": str(int(level / self.per_second * 1000)),
+        }
+        return allowed, headers
+
+
+def make_tiendanube_app(upstream: Upstream, orders: Optional[Dict[str, Dict]] = None,
+                        order_pages: int = 1, limits: Optional[LeakyBucketLimits] = None) -> FastAPI:
+    """
+    Tiendanube API stand-in. `orders` maps "store_id/order_id" to a fixed body
+    (e.g. archived orders); anything else gets a synthetic PickNShip order.
+    Order listings return `order_pages` full pages. With `limits`, store calls
+    are rate limited (x-rate-limit-* headers, 429 when over).
+    """
+    app = FastAPI()
+    app.state.upstream = upstream
+    app.state.limits = limits
+    orders = orders if orders is not None else {}
+
+    if limits is not None:
+        @app.middleware("http")
+        async def rate_limit(request: Request, call_next):
+            parts = request.url.path.split("/")
+            if len(parts) < 3 or parts[1] != "v1":
+                return await call_next(request)
+            allowed, headers = limits.hit(parts[2])
+            if not allowed:
+                return JSONResponse({"description": "Too Many Requests"}, status_code=429, headers=headers)
+            response = await call_next(request)
+            response.headers.update(headers)
+            return response
+
+    @app.get("/v1/{store_id}/orders/{order_id}")
+    async def get_order(store_id: str, order_id: str):
+        if await upstream.delay():
+            return JSONResponse({"description": "stand-in error"}, status_code=500)
+        return orders.get(f"{store_id}/{order_id}") or fake_order(store_id, order_id)
+
+    @app.get("/v1/{store_id}/orders")
+    async def list_orders(store_id: str, page: int = 1, per_page: int = 30):
+        if await upstream.delay():
+            return JSONResponse({"description": "stand-in error"}, status_code=500)
+        if page > order_pages:
+            return JSONResponse({"code": 404, "description": f"Last page is {order_pages}"}, status_code=404)
+        return [fake_order(store_id, str(page * 1000 + i)) for i in range(per_page)]
+
+    @app.get("/v1/{store_id}/store")
+    async def get_store(store_id: str):
+        if await upstream.delay():
+            return JSONResponse({"description": "stand-in error"}, status_code=500)
+        return {"id": store_id, "name": {"es": f"Tienda {store_id}"}, "url_with_protocol": f"https://{store_id}.example", "email": "store@example.com"}
+
+    @app.get("/v1/{store_id}/shipping_carriers")
+    async def list_carriers(store_id: str):
+        await upstream.delay()
+        return []
+
+    @app.post("/v1/{store_id}/shipping_carriers")
+    async def create_carrier(store_id: str):
+        await upstream.delay()
+        return JSONResponse({"id": 1, "name": PICKNSHIP_NAME}, status_code=201)
+
+    @app.post("/v1/{store_id}/shipping_carriers/{carrier_id}/options")
+    async def create_option(store_id: str, carrier_id: str):
+        await upstream.delay()
+        return JSONResponse({"id": 1}, status_code=201)
+
+    webhooks: Dict[str, list] = {}
+
+    @app.get("/v1/{store_id}/webhooks")
+    async def list_webhooks(store_id: str):
+        await upstream.delay()
+        return webhooks.get(store_id, [])
+
+    @app.post("/v1/{store_id}/webhooks")
+    async def create_webhook(store_id: str, request: Request):
+        await upstream.delay()
+        body = await request.json()
+        hooks = webhooks.setdefault(store_id, [])
+        hooks.append({"id": len(hooks) + 1, "event": body.get("event"), "url": body.get("url")})
+        return JSONResponse(hooks[-1], status_code=201)
+
+    @app.post("/apps/authorize/token")
+    async def token(request: Request):
+        await upstream.delay()
+        return {"access_token": "bench-token", "user_id": 1}
+
+    return app
+
+
+def make_google_app(upstream: Upstream) -> FastAPI:
+    """Google Maps stand-in: deterministic 1-15 km distances and geocodes."""
+    app = FastAPI()
+    app.state.upstream = upstream
+
+    def meters(origin: str, destination: str) -> int:
+        n = int(hashlib.sha1(f"{origin}|{destination}".encode()).hexdigest()[:8], 16)
+        return 1000 + n % 14000
+
+    @app.get("/maps/api/distancematrix/json")
+    async def distance_matrix(origins: str, destinations: str):
+        if await upstream.delay():
+            return {"status": "UNKNOWN_ERROR", "rows": []}
+        elements = [
+            {"status": "OK", "distance": {"value": meters(origins, d), "text": ""}}
+            for d in destinations.split("|")
+        ]
+        return {"status": "OK", "rows": [{"elements": elements}]}
+
+    @app.get("/maps/api/geocode/json")
+    async def geocode(address: str):
+        if await upstream.delay():
+            return {"status": "UNKNOWN_ERROR", "results": []}
+        n = int(hashlib.sha1(address.encode()).hexdigest()[:8], 16)
+        lat, lng = -34.60 - (n % 100) / 1000, -58.38 - (n // 100 % 100) / 1000
+        return {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]}
+
+    return app
+
+
+def make_slack_app(upstream: Upstream) -> FastAPI:
+    """Slack incoming-webhook stand-in (any path)."""
+    app = FastAPI()
+    app.state.upstream = upstream
+
+    @app.post("/{path:path}")
+    async def post_message(path: str):
+        if await upstream.delay():
+            return PlainTextResponse("rate_limited", status_code=429)
+        return PlainTextResponse("ok")
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerThread:
+    """Serve an ASGI app with uvicorn from a daemon thread."""
+
+    def __init__(self, app, port: Optional[int] = None):
+        self.port = port or free_port()
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "ServerThread":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
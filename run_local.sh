@@ -1,2 +1,15 @@
 #!/bin/bash
-uvicorn app.main:app --reload --port 8000
+# WORKERS=N runs N uvicorn worker processes against the same SQLite DB
+# (no --reload); writers coordinate through SQLite's write lock. Queue rows
+# are claimed with leases, and the Slack dispatcher / reconciliation run in
+# one worker at a time (`leases` table).
+WORKERS=${WORKERS:-1}
+PORT=${PORT:-8000}
+
+if [ "$WORKERS" -gt 1 ]; then
+    # share each store's TiendaNube quota across workers
+    export TIENDANUBE_RATE_LIMIT_BACKEND=${TIENDANUBE_RATE_LIMIT_BACKEND:-sqlite}
+    exec uvicorn app.main:app --workers "$WORKERS" --port "$PORT"
+fi
+
+uvicorn app.main:app --reload --port "$PORT"
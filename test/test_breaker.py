@@ -0,0 +1,147 @@
+from app.core.breaker import CircuitBreaker, CLOSED, HALF_OPEN, OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **kwargs):
+    params = dict(failure_rate=0.5, min_calls=4, window_seconds=10, open_seconds=30,
+                  half_open_calls=1, slow_call_seconds=2)
+    params.update(kwargs)
+    return CircuitBreaker("test", clock=clock, **params)
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.min_calls):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker(Clock())
+    for _ in range(3):
+        breaker.record(False)
+    assert breaker.state == CLOSED
+
+
+def test_opens_at_failure_rate():
+    breaker = make_breaker(Clock())
+    breaker.record(True)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.opened == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = make_breaker(Clock())
+    for _ in range(4):
+        breaker.record(True, duration=5)
+    assert breaker.state == OPEN
+
+
+def test_old_failures_leave_the_window():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 11
+    breaker.record(False)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_calls"] == 1
+
+
+def test_open_rejects_until_open_seconds():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    assert not breaker.allow()
+    assert breaker.rejecting()
+    assert breaker.rejected == 2
+    clock.now += 29
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_allows_a_single_probe():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    assert not breaker.allow()
+    # rejecting() never takes or consumes the probe slot
+    assert not breaker.rejecting()
+    assert breaker.rejected == 1
+
+
+def test_successful_probe_closes():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+    assert not breaker.allow()
+
+
+def test_released_probe_frees_the_slot():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_all_probes_must_succeed():
+    clock = Clock()
+    breaker = make_breaker(clock, half_open_calls=2)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == HALF_OPEN
+    breaker.record(True)
+    assert breaker.state == CLOSED
+
+
+def test_late_results_while_open_are_ignored():
+    clock = Clock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    breaker.record(True)
+    assert breaker.state == OPEN
+
+
+def test_disabled_always_allows():
+    breaker = make_breaker(Clock(), enabled=False)
+    for _ in range(10):
+        breaker.record(False)
+    assert breaker.allow()
+    assert not breaker.rejecting()
+    assert breaker.state == CLOSED
@@ -0,0 +1,82 @@
+import pytest
+from app.core import db
+
+
+@pytest.fixture
+def database(tmp_path):
+    live = db.DB_PATH
+    db.use_database(str(tmp_path / "orders.db"))
+    db.init_db()
+    yield db
+    db.use_database(live)
+
+
+def order(**overrides):
+    data = {
+        "order_id": "100",
+        "store_id": "1",
+        "customer_name": "Ana",
+        "customer_email": "ana@example.com",
+        "customer_phone": "1155550000",
+        "total": 1500.0,
+        "currency": "ARS",
+        "status": "open",
+        "shipping_method": "picknship",
+        "shipping_option": "Pick'NShip",
+        "shipping_address": {"address": "Av. Corrientes", "number": "1234", "zipcode": "1043"},
+    }
+    data.update(overrides)
+    return data
+
+
+def test_first_upsert_is_new(database):
+    result = database.upsert_order(order())
+    assert result == {"is_new": True, "changed": True, "previous": None, "changes": {}}
+
+
+def test_same_content_is_skipped(database):
+    database.upsert_order(order())
+    result = database.upsert_order(order(updated_at="2025-05-02T10:00:00"))
+    assert result["is_new"] is False
+    assert result["changed"] is False
+    assert result["changes"] == {}
+    assert database.list_order_changes("100", "1") == []
+
+
+def test_untracked_fields_do_not_change_the_hash():
+    values = db._order_values(order())
+    assert db.order_content_hash(values) == db.order_content_hash(db._order_values(order(note="gift")))
+    assert db.order_content_hash(values) != db.order_content_hash(db._order_values(order(status="closed")))
+
+
+def test_changes_are_diffed_and_logged(database):
+    database.upsert_order(order())
+    address = {"address": "Av. Corrientes", "number": "1250", "zipcode": "1043"}
+    result = database.upsert_order(order(status="closed", shipping_address=address))
+    assert result["changed"] is True
+    assert result["previous"]["status"] == "open"
+    assert result["changes"] == {
+        "status": {"old": "open", "new": "closed"},
+        "shipping_address": {"old": order()["shipping_address"], "new": address},
+    }
+    logged = {c["field"]: (c["old"], c["new"]) for c in database.list_order_changes("100", "1")}
+    assert logged == {"status": ("open", "closed"), "shipping_address": (order()["shipping_address"], address)}
+
+
+def test_change_then_revert_logs_both(database):
+    database.upsert_order(order())
+    database.upsert_order(order(total=2000.0))
+    result = database.upsert_order(order())
+    assert result["changes"] == {"total": {"old": 2000.0, "new": 1500.0}}
+    assert [c["new"] for c in database.list_order_changes("100", "1")] == [2000.0, 1500.0]
+
+
+def test_orders_are_per_store(database):
+    database.upsert_order(order())
+    assert database.upsert_order(order(store_id="2"))["is_new"] is True
+
+
+def test_bulk_upsert_matches_single(database):
+    results = database.upsert_orders([order(), order(order_id="101"), order(status="closed")])
+    assert [r["is_new"] for r in results] == [True, True, False]
+    assert results[2]["changes"] == {"status": {"old": "open", "new": "closed"}}
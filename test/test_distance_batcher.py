@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from app.api import rates
+from app.api.rates import DistanceMatrixBatcher
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    sent = []
+
+    async def fetch_distance_matrix(origin_str, destination_strs):
+        sent.append((origin_str, list(destination_strs)))
+        await asyncio.sleep(0)
+        return [float(len(d)) for d in destination_strs]
+
+    async def cache_set(origin_key, destination_key, distance_km):
+        pass
+
+    monkeypatch.setattr(rates, "fetch_distance_matrix", fetch_distance_matrix)
+    monkeypatch.setattr(rates.distance_cache, "set", cache_set)
+    return sent
+
+
+def lookups(batcher, origin, destinations):
+    return [batcher.lookup(origin, origin.lower(), d, d.lower()) for d in destinations]
+
+
+def test_same_origin_is_coalesced(requests):
+    batcher = DistanceMatrixBatcher(window_ms=5, max_destinations=25)
+
+    async def run():
+        return await asyncio.gather(*lookups(batcher, "Origin", ["a", "bb", "ccc"]))
+
+    assert asyncio.run(run()) == [1.0, 2.0, 3.0]
+    assert requests == [("Origin", ["a", "bb", "ccc"])]
+    assert batcher.stats() == {"lookups": 3, "upstream_requests": 1, "inflight": 0}
+
+
+def test_origins_are_batched_separately(requests):
+    batcher = DistanceMatrixBatcher(window_ms=5, max_destinations=25)
+
+    async def run():
+        return await asyncio.gather(*lookups(batcher, "A", ["x"]), *lookups(batcher, "B", ["y"]))
+
+    asyncio.run(run())
+    assert sorted(requests) == [("A", ["x"]), ("B", ["y"])]
+
+
+def test_concurrent_lookups_of_a_pair_share_one_destination(requests):
+    batcher = DistanceMatrixBatcher(window_ms=5, max_destinations=25)
+
+    async def run():
+        return await asyncio.gather(*lookups(batcher, "Origin", ["dd", "dd", "dd"]))
+
+    assert asyncio.run(run()) == [2.0, 2.0, 2.0]
+    assert requests == [("Origin", ["dd"])]
+
+
+def test_full_batch_is_split_at_max_destinations(requests):
+    batcher = DistanceMatrixBatcher(window_ms=200, max_destinations=25)
+    destinations = [f"d{i}" for i in range(30)]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(*lookups(batcher, "Origin", destinations))
+        return results, loop.time() - start
+
+    results, elapsed = asyncio.run(run())
+    assert [len(d) for _, d in requests] == [25, 5]
+    assert [d for _, batch in requests for d in batch] == destinations
+    assert results == [float(len(d)) for d in destinations]
+    # the first 25 go out at once; only the remainder waits for the window
+    assert elapsed >= 0.15
+
+
+def test_failed_request_resolves_to_none(requests, monkeypatch):
+    async def failing(origin_str, destination_strs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(rates, "fetch_distance_matrix", failing)
+    batcher = DistanceMatrixBatcher(window_ms=5, max_destinations=25)
+
+    async def run():
+        return await asyncio.gather(*lookups(batcher, "Origin", ["a", "b"]))
+
+    assert asyncio.run(run()) == [None, None]
+    assert batcher.stats()["inflight"] == 0
+
+
+def test_batch_tasks_are_held_until_done(requests):
+    batcher = DistanceMatrixBatcher(window_ms=5, max_destinations=1)
+
+    async def run():
+        pending = asyncio.ensure_future(asyncio.gather(*lookups(batcher, "Origin", ["a"])))
+        await asyncio.sleep(0)
+        held = len(batcher._tasks)
+        await pending
+        return held
+
+    assert asyncio.run(run()) == 1
+
+
+def test_stop_resolves_waiters(requests, monkeypatch):
+    async def hanging(origin_str, destination_strs):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(rates, "fetch_distance_matrix", hanging)
+    batcher = DistanceMatrixBatcher(window_ms=5, max_destinations=25)
+
+    async def run():
+        waiters = asyncio.gather(*lookups(batcher, "Origin", ["a", "b"]))
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await waiters
+
+    assert asyncio.run(run()) == [None, None]
+    assert batcher.stats()["inflight"] == 0
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from app.core import async_db, db
+from app.services import onboarding as onboarding_module
+from app.services.onboarding import OnboardingPipeline
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    live = db.DB_PATH
+    db.use_database(str(tmp_path / "onboarding.db"))
+    db.init_db()
+    db.save_store("1", "token", {"name": "", "domain": "", "email": ""})
+
+    async def noop(**kwargs):
+        pass
+
+    async def notify(store):
+        pass
+
+    monkeypatch.setattr(onboarding_module.tiendanube, "create_picknship_shipping_method", noop)
+    monkeypatch.setattr(onboarding_module.tiendanube, "register_order_webhooks", noop)
+    monkeypatch.setattr(onboarding_module, "notify_new_store", notify)
+    yield OnboardingPipeline()
+    async_db.shutdown()
+    db.use_database(live)
+
+
+def slow_store_info(monkeypatch, seconds):
+    async def get_store_info(store_id, access_token):
+        await asyncio.sleep(seconds)
+        return {"name": {"es": "Tienda"}, "url_with_protocol": "https://tienda.example", "email": "a@b.c"}
+
+    monkeypatch.setattr(onboarding_module.tiendanube, "get_store_info", get_store_info)
+
+
+def test_redirect_waits_for_store_info(pipeline, monkeypatch):
+    slow_store_info(monkeypatch, 0.2)
+
+    async def run():
+        await pipeline.begin("1", "token", is_new=True)
+        finished = await pipeline.wait_step("1", "store_info", 5)
+        store = await async_db.get_store("1")
+        await pipeline.stop()
+        return finished, store
+
+    finished, store = asyncio.run(run())
+    assert finished is True
+    assert store["domain"] == "https://tienda.example"
+
+
+def test_redirect_wait_times_out(pipeline, monkeypatch):
+    slow_store_info(monkeypatch, 5)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        await pipeline.begin("1", "token", is_new=True)
+        start = loop.time()
+        finished = await pipeline.wait_step("1", "store_info", 0.2)
+        elapsed = loop.time() - start
+        await pipeline.stop()
+        return finished, elapsed
+
+    finished, elapsed = asyncio.run(run())
+    assert finished is False
+    assert 0.15 <= elapsed < 1
+
+
+def test_wait_without_a_run_returns_at_once(pipeline):
+    assert asyncio.run(pipeline.wait_step("1", "store_info", 5)) is True
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from app.services import order_sync
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """TiendaNube GETs counted, each held until the test releases it."""
+    state = {"fetches": 0, "writes": 0, "release": None, "started": None}
+
+    async def get_store(store_id):
+        await asyncio.sleep(0)  # DB thread pool hop
+        return {"store_id": store_id, "access_token": "token"}
+
+    async def get_order(store_id, order_id, access_token):
+        state["fetches"] += 1
+        state["started"].set()
+        await state["release"].wait()
+        return {"id": order_id, "shipping_carrier_name": order_sync.PICKNSHIP_NAME, "status": "open",
+                "updated_at": f"v{state['fetches']}"}
+
+    async def upsert_order(order_data):
+        state["writes"] += 1
+        return {"is_new": state["writes"] == 1, "changed": True, "previous": None, "changes": {}}
+
+    async def notify(data):
+        pass
+
+    monkeypatch.setattr(order_sync.async_db, "get_store", get_store)
+    monkeypatch.setattr(order_sync.async_db, "upsert_order", upsert_order)
+    monkeypatch.setattr(order_sync, "get_order", get_order)
+    monkeypatch.setattr(order_sync, "notify_order_created", notify)
+    monkeypatch.setattr(order_sync, "notify_order_updated", notify)
+    monkeypatch.setattr(order_sync.event_archive, "record", lambda *args: None)
+    return state
+
+
+def _reset(state):
+    state["release"] = asyncio.Event()
+    state["started"] = asyncio.Event()
+
+
+def test_pair_before_the_fetch_shares_one_get(upstream):
+    async def run():
+        _reset(upstream)
+        created = asyncio.create_task(order_sync.process_order_event("1", "10", "order/created"))
+        updated = asyncio.create_task(order_sync.process_order_event("1", "10", "order/updated"))
+        await upstream["started"].wait()
+        upstream["release"].set()
+        return await asyncio.gather(created, updated)
+
+    assert asyncio.run(run()) == ["ok", "ok"]
+    assert upstream["fetches"] == 1
+    assert upstream["writes"] == 1
+
+
+def test_delivery_during_the_fetch_gets_one_trailing_get(upstream):
+    async def run():
+        _reset(upstream)
+        created = asyncio.create_task(order_sync.process_order_event("1", "10", "order/created"))
+        await upstream["started"].wait()
+        joiners = [asyncio.create_task(order_sync.process_order_event("1", "10", "order/updated"))
+                   for _ in range(3)]
+        await asyncio.sleep(0)
+        upstream["release"].set()
+        return await asyncio.gather(created, *joiners)
+
+    assert asyncio.run(run()) == ["ok"] * 4
+    assert upstream["fetches"] == 2
+    assert upstream["writes"] == 2
+
+
+def test_created_during_the_fetch_needs_no_trailing_get(upstream):
+    async def run():
+        _reset(upstream)
+        updated = asyncio.create_task(order_sync.process_order_event("1", "10", "order/updated"))
+        await upstream["started"].wait()
+        created = asyncio.create_task(order_sync.process_order_event("1", "10", "order/created"))
+        await asyncio.sleep(0)
+        upstream["release"].set()
+        return await asyncio.gather(updated, created)
+
+    assert asyncio.run(run()) == ["ok", "ok"]
+    assert upstream["fetches"] == 1
+
+
+def test_redelivery_after_the_write_fetches_again(upstream):
+    async def run():
+        _reset(upstream)
+        upstream["release"].set()
+        await order_sync.process_order_event("1", "10", "order/created")
+        await order_sync.process_order_event("1", "10", "order/created")
+
+    asyncio.run(run())
+    assert upstream["fetches"] == 2
+    assert order_sync._inflight == {}
+
+
+def test_orders_do_not_share_flights(upstream):
+    async def run():
+        _reset(upstream)
+        upstream["release"].set()
+        await asyncio.gather(order_sync.process_order_event("1", "10"), order_sync.process_order_event("1", "11"))
+
+    asyncio.run(run())
+    assert upstream["fetches"] == 2
@@ -0,0 +1,66 @@
+import pytest
+from app.services.pricing import DEFAULT_BANDS, DEFAULT_ZONES, _Bands, _Zones, normalize_postal_code
+
+
+@pytest.mark.parametrize("distance_km, reference", [
+    (0.0, "lt_3"),
+    (2.999, "lt_3"),
+    (3.0, "3_5"),
+    (4.999, "3_5"),
+    (5.0, "5_10"),
+    (10.0, "5_10"),
+    (10.001, None),
+    (-0.1, None),
+])
+def test_band_boundaries(distance_km, reference):
+    quote = _Bands(DEFAULT_BANDS).lookup(distance_km)
+    assert (quote.reference if quote else None) == reference
+
+
+def test_band_gap_has_no_price():
+    bands = _Bands([(0.0, 3.0, False, 100, "a"), (5.0, 8.0, False, 200, "b")])
+    assert bands.lookup(4.0) is None
+    assert bands.lookup(5.0).reference == "b"
+
+
+def test_band_prices_are_ints_when_whole():
+    bands = _Bands([(0.0, 3.0, False, 3000.0, "a"), (3.0, 5.0, False, 3500.5, "b")])
+    assert bands.lookup(1).price == 3000 and isinstance(bands.lookup(1).price, int)
+    assert bands.lookup(4).price == 3500.5
+
+
+@pytest.mark.parametrize("code, reference", [(999, None), (1000, "zip"), (1429, "zip"), (1430, None)])
+def test_zone_boundaries(code, reference):
+    quote = _Zones(DEFAULT_ZONES).lookup(code)
+    assert (quote.reference if quote else None) == reference
+
+
+def test_exact_zone_wins_over_range():
+    zones = _Zones([(1000, 1429, 100, "range"), (1426, 1426, 50, "exact")])
+    assert zones.lookup(1426).reference == "exact"
+    assert zones.lookup(1425).reference == "range"
+    assert zones.lookup(1427).reference == "range"
+
+
+def test_zone_between_ranges():
+    zones = _Zones([(1000, 1099, 100, "a"), (1200, 1299, 200, "b")])
+    assert zones.lookup(1150) is None
+    assert zones.lookup(1099).reference == "a"
+    assert zones.lookup(1200).reference == "b"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1426", "1426"),
+    ("C1426", "1426"),
+    ("c1426abc", "1426"),
+    (" C1426ABC ", "1426"),
+    ("B1425", ""),
+    ("14260", ""),
+    ("142", ""),
+    ("C1426AB", ""),
+    ("", ""),
+    (None, ""),
+    (1426, "1426"),
+])
+def test_normalize_postal_code(raw, expected):
+    assert normalize_postal_code(raw) == expected
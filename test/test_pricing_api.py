@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import pricing
+from app.core import async_db, db
+from app.core.config import settings
+from app.services.pricing import pricing_engine
+
+BAND = {"min_km": 0, "max_km": 5, "price": 4000, "reference": "lt_5"}
+ZONE = {"postal_from": 1000, "postal_to": 1429, "price": 9000, "reference": "zip"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    live = db.DB_PATH
+    db.use_database(str(tmp_path / "pricing.db"))
+    db.init_db()
+    pricing_engine.reload()
+    monkeypatch.setattr(settings, "API_KEY", "secret")
+    app = FastAPI()
+    app.include_router(pricing.router)
+    yield TestClient(app, headers={"Authorization": "Bearer secret"})
+    async_db.shutdown()
+    db.use_database(live)
+    pricing_engine.version = None
+
+
+@pytest.mark.parametrize("body", [
+    {"bands": [], "zones": []},
+    {"bands": [BAND], "zones": []},
+    {"bands": [], "zones": [ZONE]},
+])
+def test_default_pricing_cannot_be_emptied(client, body):
+    assert client.put("/pricing/default", json=body).status_code == 422
+    assert pricing_engine.quote("42", 2.0, "") is not None
+
+
+def test_default_pricing_can_be_replaced(client):
+    response = client.put("/pricing/default", json={"bands": [BAND], "zones": [ZONE]})
+    assert response.status_code == 200
+    assert pricing_engine.quote("42", 2.0, "").reference == "lt_5"
+
+
+def test_empty_store_override_restores_the_defaults(client):
+    assert client.put("/pricing/42", json={"bands": [dict(BAND, price=1)], "zones": []}).status_code == 200
+    assert pricing_engine.quote("42", 2.0, "").price == 1
+    response = client.put("/pricing/42", json={"bands": [], "zones": []})
+    assert response.status_code == 200
+    assert response.json()["overridden"] is False
+    assert pricing_engine.quote("42", 2.0, "").reference == "lt_3"
+
+
+@pytest.mark.parametrize("band", [
+    dict(BAND, min_km=6),
+    dict(BAND, price=-1),
+])
+def test_invalid_bands_are_rejected(client, band):
+    assert client.put("/pricing/42", json={"bands": [band], "zones": []}).status_code == 422
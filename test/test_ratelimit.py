@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.core.ratelimit import StoreRateLimiter, merge, parse_headers, reserve
+
+
+def test_reserve_until_full():
+    state = (2.0, 1.0, 0.0, 100.0)
+    state, wait = reserve(state, 100.0)
+    assert wait == 0
+    state, wait = reserve(state, 100.0)
+    assert wait == 0
+    state, wait = reserve(state, 100.0)
+    assert wait == pytest.approx(1.0)
+    assert state[2] == 2.0
+
+
+def test_reserve_after_leak():
+    state = (2.0, 2.0, 2.0, 100.0)
+    _, wait = reserve(state, 100.25)
+    assert wait == pytest.approx(0.25)
+    state, wait = reserve(state, 100.5)
+    assert wait == 0
+    assert state[2] == pytest.approx(2.0)
+
+
+def test_merge_keeps_the_higher_level():
+    state = (40.0, 2.0, 10.0, 100.0)
+    assert merge(state, 100.0, 40, 2, 4) == (40, 2, 10.0, 100.0)
+    assert merge(state, 100.0, 40, 2, 30) == (40, 2, 30, 100.0)
+    # the local level leaks before comparing
+    assert merge(state, 104.0, 40, 2, 3) == (40, 2, 3, 104.0)
+
+
+def test_merge_takes_the_server_capacity_and_rate():
+    capacity, rate, _, _ = merge((40.0, 2.0, 0.0, 100.0), 100.0, 80, 4, 0)
+    assert (capacity, rate) == (80, 4)
+
+
+def test_parse_headers():
+    headers = {"x-rate-limit-limit": "40", "x-rate-limit-remaining": "30", "x-rate-limit-reset": "5000"}
+    assert parse_headers(headers) == (40.0, 2.0, 10.0)
+
+
+def test_parse_headers_without_reset_uses_the_default_rate():
+    headers = {"x-rate-limit-limit": "40", "x-rate-limit-remaining": "40"}
+    assert parse_headers(headers) == (40.0, settings.TIENDANUBE_RATE_LIMIT_PER_SECOND, 0.0)
+
+
+@pytest.mark.parametrize("headers", [{}, {"x-rate-limit-limit": "40"}, {"x-rate-limit-limit": "x", "x-rate-limit-remaining": "1"}])
+def test_parse_headers_missing_or_invalid(headers):
+    assert parse_headers(headers) is None
+
+
+def _wait(limiter, store_id, now):
+    return asyncio.run(limiter._buckets.apply(store_id, lambda s: reserve(s or limiter._default(now), now)))
+
+
+def test_throttled_waits_retry_after(monkeypatch):
+    monkeypatch.setattr("app.core.ratelimit.time.time", lambda: 100.0)
+    limiter = StoreRateLimiter("memory")
+    headers = {"x-rate-limit-limit": "40", "x-rate-limit-remaining": "0", "x-rate-limit-reset": "20000",
+               "retry-after": "3"}
+    asyncio.run(limiter.throttled("1", headers))
+    assert _wait(limiter, "1", 100.0) == pytest.approx(3.0)
+    assert _wait(limiter, "1", 103.0) == 0
+
+
+def test_throttled_without_retry_after_waits_one_slot(monkeypatch):
+    monkeypatch.setattr("app.core.ratelimit.time.time", lambda: 100.0)
+    limiter = StoreRateLimiter("memory")
+    asyncio.run(limiter.throttled("1", {"x-rate-limit-limit": "40", "x-rate-limit-remaining": "0",
+                                        "x-rate-limit-reset": "10000"}))
+    # 40 calls drain in 10 s: one slot frees every 0.25 s
+    assert _wait(limiter, "1", 100.0) == pytest.approx(0.25)
+
+
+def test_throttled_is_per_store(monkeypatch):
+    monkeypatch.setattr("app.core.ratelimit.time.time", lambda: 100.0)
+    limiter = StoreRateLimiter("memory")
+    asyncio.run(limiter.throttled("1", {"retry-after": "5"}))
+    assert _wait(limiter, "2", 100.0) == 0
+
+
+def test_acquire_waits_when_full(monkeypatch):
+    clock = [100.0]
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr("app.core.ratelimit.time.time", lambda: clock[0])
+    monkeypatch.setattr("app.core.ratelimit.asyncio.sleep", sleep)
+    monkeypatch.setattr(settings, "TIENDANUBE_RATE_LIMIT_CAPACITY", 2)
+    monkeypatch.setattr(settings, "TIENDANUBE_RATE_LIMIT_PER_SECOND", 4.0)
+    limiter = StoreRateLimiter("memory")
+
+    async def three():
+        for _ in range(3):
+            await limiter.acquire("1")
+
+    asyncio.run(three())
+    assert slept == [pytest.approx(0.25)]
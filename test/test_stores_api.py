@@ -0,0 +1,47 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import stores
+from app.core import db
+from app.core.config import settings
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    live = db.DB_PATH
+    db.use_database(str(tmp_path / "stores.db"))
+    db.init_db()
+    for i in range(5):
+        db.save_store(str(i), f"token{i}", {"name": f"Store {i}", "domain": "", "email": ""})
+    monkeypatch.setattr(settings, "API_KEY", "secret")
+    app = FastAPI()
+    app.include_router(stores.router)
+    yield TestClient(app, headers={"Authorization": "Bearer secret"})
+    db.use_database(live)
+
+
+def ndjson_ids(response):
+    return [json.loads(line)["store_id"] for line in response.text.splitlines()]
+
+
+def test_ndjson_pages_like_json(client):
+    page = client.get("/stores/", params={"limit": 2}).json()
+    ids = [s["store_id"] for s in page["stores"]]
+    streamed = client.get("/stores/", params={"limit": 2, "format": "ndjson"})
+    assert ndjson_ids(streamed) == ids
+
+    rest = client.get("/stores/", params={"cursor": page["next_cursor"]}).json()
+    streamed = client.get("/stores/", params={"cursor": page["next_cursor"], "format": "ndjson"})
+    assert ndjson_ids(streamed) == [s["store_id"] for s in rest["stores"]]
+    assert len(ids) + len(rest["stores"]) == 5
+
+
+def test_ndjson_rejects_an_invalid_cursor(client):
+    assert client.get("/stores/", params={"cursor": "nope", "format": "ndjson"}).status_code == 400
+
+
+def test_ndjson_without_tokens_by_default(client):
+    rows = [json.loads(line) for line in client.get("/stores/", params={"format": "ndjson"}).text.splitlines()]
+    assert len(rows) == 5
+    assert all("access_token" not in row for row in rows)